@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+try:  # NumPy is optional; only the analytics endpoints need it.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from .config import Settings
+from .models import (
+    AnalyticsColumn,
+    AnalyticsDataset,
+    AnalyticsGroup,
+    AnalyticsOutlier,
+    AnalyticsReport,
+    EquipmentItem,
+)
+from .repository import EquipmentRepository, MonsterRepository, _Repository
+
+NUMBER = "number"
+CATEGORY = "category"
+
+DEFAULT_PERCENTILES = (10.0, 50.0, 90.0)
+DEFAULT_BINS = 10
+#: Tukey's fence multiplier: outliers lie more than this many IQRs outside the quartiles.
+DEFAULT_FENCE = 1.5
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """Raised when NumPy is not installed."""
+
+
+@dataclass(frozen=True)
+class _Column:
+    name: str
+    kind: str
+    get: Callable[[Any], Any]
+
+
+def _price(field: str) -> Callable[[EquipmentItem], Any]:
+    return lambda item: getattr(item.price, field) if item.price is not None else None
+
+
+_EQUIPMENT_COLUMNS = (
+    _Column("slot", CATEGORY, lambda item: item.slot),
+    _Column("base_quality", CATEGORY, lambda item: item.base_quality),
+    _Column("required_tier", NUMBER, lambda item: item.required_tier),
+    _Column("exclusive", CATEGORY, lambda item: item.exclusive),
+    _Column("base_main.type", CATEGORY, lambda item: item.base_main.type),
+    _Column("base_main.value", NUMBER, lambda item: item.base_main.value),
+    _Column("substats", NUMBER, lambda item: len(item.substats or [])),
+    _Column("price.buy", NUMBER, _price("buy")),
+    _Column("price.sell", NUMBER, _price("sell")),
+)
+
+_MONSTER_COLUMNS = (
+    _Column("realmTier", NUMBER, lambda item: item.realmTier),
+    _Column("specialization", CATEGORY, lambda item: item.specialization),
+    _Column("rank", CATEGORY, lambda item: getattr(item, "rank", None)),
+    _Column("hp", NUMBER, lambda item: item.hp),
+    _Column("bp", NUMBER, lambda item: item.bp),
+    _Column("rewards.gold", NUMBER, lambda item: item.rewards.get("gold")),
+)
+
+DATASETS: Dict[str, Tuple[Type[_Repository], Tuple[_Column, ...]]] = {
+    "equipment": (EquipmentRepository, _EQUIPMENT_COLUMNS),
+    "monsters": (MonsterRepository, _MONSTER_COLUMNS),
+}
+
+
+class ColumnarSnapshot:
+    """Struct-of-arrays copy of a collection.
+
+    Number columns are float arrays with NaN for missing values; category
+    columns are string arrays with ``""`` for missing values.
+    """
+
+    def __init__(self, columns: Sequence[_Column], items: List[Any]):
+        self.kinds = {column.name: column.kind for column in columns}
+        self.ids = np.array([item.id for item in items], dtype=object)
+        self.columns: Dict[str, Any] = {}
+        for column in columns:
+            values = [column.get(item) for item in items]
+            if column.kind == NUMBER:
+                self.columns[column.name] = np.array(
+                    [math.nan if value is None else value for value in values], dtype=float
+                )
+            else:
+                self.columns[column.name] = np.array(
+                    ["" if value is None else str(value) for value in values], dtype=str
+                )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, name: str, kind: Optional[str] = None) -> Any:
+        if name not in self.columns:
+            raise ValueError(f"Unknown column {name!r}")
+        if kind is not None and self.kinds[name] != kind:
+            raise ValueError(f"Column {name!r} is not a {kind} column")
+        return self.columns[name]
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise AnalyticsUnavailable("Analytics need NumPy; install the 'analytics' extra")
+
+
+def snapshot(settings: Settings, dataset: str) -> ColumnarSnapshot:
+    """Columnar copy of ``dataset``, rebuilt only when its data changes.
+
+    Raises ``KeyError`` for an unknown dataset.
+    """
+    _require_numpy()
+    repository_cls, columns = DATASETS[dataset]
+    repository = repository_cls.from_settings(settings)
+    return repository.derived("columns", lambda items: ColumnarSnapshot(columns, items))
+
+
+def describe(settings: Settings) -> List[AnalyticsDataset]:
+    return [
+        AnalyticsDataset(
+            name=name,
+            rows=len(snapshot(settings, name)),
+            columns=[AnalyticsColumn(name=column.name, kind=column.kind) for column in columns],
+        )
+        for name, (_, columns) in DATASETS.items()
+    ]
+
+
+def _plain(value: Any) -> Any:
+    """JSON-friendly group key value."""
+    if isinstance(value, str):
+        return str(value) or None
+    value = float(value)
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _group_codes(keys: List[Any], rows: int) -> Tuple[Any, List[Tuple[Any, ...]]]:
+    """Group number of every row, and each group's key values, in sorted key order."""
+    if not keys:
+        return np.zeros(rows, dtype=np.int64), [()]
+    uniques, inverses = zip(*(np.unique(key, return_inverse=True) for key in keys))
+    sizes = tuple(len(unique) for unique in uniques)
+    combined = np.ravel_multi_index([inverse.ravel() for inverse in inverses], sizes)
+    groups, codes = np.unique(combined, return_inverse=True)
+    positions = np.unravel_index(groups, sizes)
+    labels = [
+        tuple(unique[position[group]] for unique, position in zip(uniques, positions))
+        for group in range(len(groups))
+    ]
+    return codes.ravel(), labels
+
+
+def aggregate(
+    data: ColumnarSnapshot,
+    dataset: str,
+    metric: str,
+    group_by: Sequence[str] = (),
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    bins: int = DEFAULT_BINS,
+    fence: float = DEFAULT_FENCE,
+) -> AnalyticsReport:
+    """Vectorized group-by statistics of the number column ``metric``.
+
+    Rows are grouped by the combination of ``group_by`` columns. Every
+    group gets count, mean, min, max, the requested percentiles (linear
+    interpolation, as ``numpy.percentile``) and a histogram over bins
+    shared by all groups. Rows beyond ``fence`` interquartile ranges from
+    their group's quartiles are reported as outliers. Raises
+    ``ValueError`` for unknown columns or a non-number metric.
+    """
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100")
+    values = data.column(metric, NUMBER)
+    keys = [data.column(name) for name in group_by]
+    present = ~np.isnan(values)
+    values, ids = values[present], data.ids[present]
+    report = AnalyticsReport(
+        dataset=dataset,
+        metric=metric,
+        groupBy=list(group_by),
+        missing=int((~present).sum()),
+        binEdges=[],
+        groups=[],
+        outliers=[],
+    )
+    if not len(values):
+        return report
+
+    codes, labels = _group_codes([key[present] for key in keys], len(values))
+    count = np.bincount(codes, minlength=len(labels))
+    total = np.bincount(codes, weights=values, minlength=len(labels))
+    low = np.full(len(labels), np.inf)
+    high = np.full(len(labels), -np.inf)
+    np.minimum.at(low, codes, values)
+    np.maximum.at(high, codes, values)
+
+    # Sorting by (group, value) makes each group a contiguous sorted run
+    ordered = values[np.lexsort((values, codes))]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+    def quantile(q: float) -> Any:
+        position = starts + (count - 1) * q
+        below = np.floor(position).astype(np.int64)
+        above = np.ceil(position).astype(np.int64)
+        return ordered[below] + (ordered[above] - ordered[below]) * (position - below)
+
+    edges = np.histogram_bin_edges(values, bins=bins)
+    columns = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    histogram = np.bincount(codes * bins + columns, minlength=len(labels) * bins)
+    histogram = histogram.reshape(len(labels), bins)
+
+    quartiles = quantile(0.25), quantile(0.75)
+    spread = quartiles[1] - quartiles[0]
+    lower, upper = quartiles[0] - fence * spread, quartiles[1] + fence * spread
+    flagged = np.flatnonzero((values < lower[codes]) | (values > upper[codes]))
+
+    cuts = {f"p{p:g}": quantile(p / 100) for p in percentiles}
+    key_of = [dict(zip(group_by, map(_plain, label))) for label in labels]
+    report.binEdges = edges.tolist()
+    report.groups = [
+        AnalyticsGroup(
+            key=key_of[group],
+            count=int(count[group]),
+            mean=float(total[group] / count[group]),
+            min=float(low[group]),
+            max=float(high[group]),
+            percentiles={name: float(cut[group]) for name, cut in cuts.items()},
+            histogram=histogram[group].tolist(),
+        )
+        for group in range(len(labels))
+    ]
+    report.outliers = [
+        AnalyticsOutlier(
+            id=ids[row],
+            key=key_of[codes[row]],
+            value=float(values[row]),
+            low=float(lower[codes[row]]),
+            high=float(upper[codes[row]]),
+        )
+        for row in flagged
+    ]
+    return report
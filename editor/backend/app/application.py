@@ -1,11 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routes import monsters_router, maps_router, music_router, equipment_router
+from .jobs import shutdown_jobs
+from .journal import compact_journals
+from .pagination import NEXT_CURSOR_HEADER
+from .routes import (
+    analytics_router,
+    equipment_router,
+    jobs_router,
+    maps_router,
+    monsters_router,
+    music_router,
+    search_router,
+    simulation_router,
+    storage_router,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop conversions still queued or running
+    shutdown_jobs()
+    # Fold pending edit journals into the canonical data files
+    compact_journals()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Game Editor Backend", version="0.1.0")
+    app = FastAPI(title="Game Editor Backend", version="0.1.0", lifespan=lifespan)
     
     # CORS middleware
     app.add_middleware(
@@ -14,12 +38,18 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
     )
     
     app.include_router(monsters_router)
     app.include_router(maps_router)
     app.include_router(music_router)
     app.include_router(equipment_router)
+    app.include_router(storage_router)
+    app.include_router(simulation_router)
+    app.include_router(analytics_router)
+    app.include_router(search_router)
+    app.include_router(jobs_router)
     return app
 
 
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from .cache import file_signature
+
+#: ``(asset id, extension)``, e.g. ``("m-alpha", "png")``.
+AssetKey = Tuple[str, str]
+
+
+def _keys(name: str) -> Tuple[Optional[AssetKey], Tuple[AssetKey, ...]]:
+    """The exact key of file ``name`` and the keys it serves as a suffixed variant.
+
+    ``m-beta-1.png`` is the exact asset ``("m-beta-1", "png")`` and a
+    variant for ``("m-beta", "png")`` and ``("m", "png")``, mirroring the
+    ``{id}-*.{ext}`` glob it used to be found with.
+    """
+    stem, dot, extension = name.rpartition(".")
+    if not dot or not stem:
+        return None, ()
+    variants = tuple(
+        (stem[:position], extension)
+        for position, char in enumerate(stem)
+        if char == "-" and position > 0
+    )
+    return (stem, extension), variants
+
+
+class AssetDirectory:
+    """One-pass index of the files in an asset directory.
+
+    Resolves an asset id and extension to ``{id}.{ext}`` or, failing that,
+    the first ``{id}-*.{ext}`` by name, with a dictionary lookup instead of
+    ``exists()`` calls and a glob per asset. The listing is revalidated
+    against the directory's mtime, which changes whenever files are added,
+    removed or renamed, and is patched in place for files written through
+    :meth:`track_write`.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._signature: Any = None
+        self._exact: Dict[AssetKey, str] = {}
+        #: Key -> every suffixed file name serving it.
+        self._variants: Dict[AssetKey, Set[str]] = {}
+
+    def _add(self, name: str) -> None:
+        exact, variants = _keys(name)
+        if exact is None:
+            return
+        self._exact[exact] = name
+        for key in variants:
+            self._variants.setdefault(key, set()).add(name)
+
+    def _scan(self) -> None:
+        signature = file_signature(self.directory)
+        if signature == self._signature:
+            return
+        self._exact, self._variants = {}, {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self._add(entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        # Taken before the listing, so changes made during it trigger a rescan
+        self._signature = signature
+
+    def find(self, asset_id: str, extension: str) -> Optional[Path]:
+        with self._lock:
+            self._scan()
+            key = (asset_id, extension)
+            name = self._exact.get(key)
+            if name is None and key in self._variants:
+                name = min(self._variants[key])
+        return self.directory / name if name is not None else None
+
+    def available(self, asset_ids: Iterable[str], extension: str) -> Set[str]:
+        """The ids among ``asset_ids`` having an asset, after a single revalidation."""
+        with self._lock:
+            self._scan()
+            return {
+                asset_id
+                for asset_id in asset_ids
+                if (asset_id, extension) in self._exact or (asset_id, extension) in self._variants
+            }
+
+    @contextmanager
+    def track_write(self, path: Path) -> Iterator[Path]:
+        """Wrap the creation of ``path`` so the index learns of it without a rescan.
+
+        The index is patched only if it was current before the write;
+        otherwise the next lookup rescans as usual.
+        """
+        before = file_signature(self.directory)
+        yield path
+        with self._lock:
+            if self._signature is not None and self._signature == before:
+                self._add(path.name)
+                self._signature = file_signature(self.directory)
+
+
+_directories: Dict[Path, AssetDirectory] = {}
+_directories_lock = threading.Lock()
+
+
+def asset_directory(directory: Path) -> AssetDirectory:
+    """The process-wide index of ``directory``."""
+    with _directories_lock:
+        index = _directories.get(directory)
+        if index is None:
+            index = _directories[directory] = AssetDirectory(directory)
+        return index
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .indexes import CollectionIndex
+from .models import EquipmentItem
+
+#: Equipment qualities from worst to best, as in the game's ``EquipmentQuality``.
+QUALITY_ORDER = ("normal", "fine", "rare", "excellent", "epic")
+
+
+def quality_rank(quality: str) -> int:
+    """Position of ``quality`` in :data:`QUALITY_ORDER`; ``ValueError`` if unknown."""
+    try:
+        return QUALITY_ORDER.index(quality)
+    except ValueError:
+        raise ValueError(f"Unknown quality {quality!r}") from None
+
+
+@dataclass(frozen=True)
+class ScoreWeights:
+    """Linear weights of the best-in-slot score.
+
+    ``score = main * base_main.value + substats * sum(substat values)
+    + flat_cap * flatCapMultiplier + price * price``, where the price is
+    the buy price, or the sell price for items that cannot be bought.
+    With a ``stat``, only a main stat and substats of that type count.
+    """
+
+    main: float = 1.0
+    substats: float = 1.0
+    flat_cap: float = 0.0
+    price: float = 0.0
+    stat: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class _ScoreColumns:
+    """Precomputed score inputs of one item."""
+
+    slot: str
+    quality: int
+    tier: Optional[int]
+    main_type: str
+    main: float
+    #: Substat type -> summed value.
+    substats: Dict[str, float]
+    substat_total: float
+    flat_cap: float
+    price: float
+
+    @classmethod
+    def of(cls, item: EquipmentItem) -> "_ScoreColumns":
+        substats: Dict[str, float] = {}
+        for stat in item.substats or []:
+            substats[stat.type] = substats.get(stat.type, 0.0) + stat.value
+        price = item.price.buy if item.price is not None else None
+        if price is None and item.price is not None:
+            price = item.price.sell
+        return cls(
+            slot=item.slot,
+            # Unknown qualities rank above every limit
+            quality=QUALITY_ORDER.index(item.base_quality)
+            if item.base_quality in QUALITY_ORDER
+            else len(QUALITY_ORDER),
+            tier=item.required_tier or None,
+            main_type=item.base_main.type,
+            main=item.base_main.value,
+            substats=substats,
+            substat_total=sum(substats.values()),
+            flat_cap=item.flatCapMultiplier or 0.0,
+            price=float(price or 0),
+        )
+
+    def score(self, weights: ScoreWeights) -> float:
+        if weights.stat is None:
+            main, substats = self.main, self.substat_total
+        else:
+            main = self.main if self.main_type == weights.stat else 0.0
+            substats = self.substats.get(weights.stat, 0.0)
+        return (
+            weights.main * main
+            + weights.substats * substats
+            + weights.flat_cap * self.flat_cap
+            + weights.price * self.price
+        )
+
+
+class ScoreIndex(CollectionIndex):
+    """Score inputs of every item, grouped by slot.
+
+    An item's columns are recomputed only when that item is added or
+    replaced. A query scores the slot's eligible items with a few
+    multiply-adds each and keeps the best ``k`` with a bounded heap
+    instead of sorting the slot.
+    """
+
+    def __init__(self) -> None:
+        self._columns: Dict[str, _ScoreColumns] = {}
+        self._slots: Dict[str, Set[str]] = {}
+
+    def add(self, record_id: str, item: EquipmentItem) -> None:
+        columns = self._columns[record_id] = _ScoreColumns.of(item)
+        self._slots.setdefault(columns.slot, set()).add(record_id)
+
+    def remove(self, record_id: str, item: EquipmentItem) -> None:
+        columns = self._columns.pop(record_id, None)
+        if columns is None:
+            return
+        bucket = self._slots[columns.slot]
+        bucket.discard(record_id)
+        if not bucket:
+            del self._slots[columns.slot]
+
+    def slots(self) -> List[str]:
+        return sorted(self._slots)
+
+    def top(
+        self,
+        slot: str,
+        k: int,
+        weights: ScoreWeights,
+        tier: Optional[int] = None,
+        max_quality: Optional[int] = None,
+    ) -> List[Tuple[float, str]]:
+        """Best ``k`` ``(score, id)`` pairs of ``slot``, highest first.
+
+        Only items wearable at ``tier`` (no required tier, or one at most
+        ``tier``) and of quality rank at most ``max_quality`` compete. Ties
+        go to the smaller id.
+        """
+        candidates = []
+        for record_id in self._slots.get(slot, ()):
+            columns = self._columns[record_id]
+            if tier is not None and columns.tier is not None and columns.tier > tier:
+                continue
+            if max_quality is not None and columns.quality > max_quality:
+                continue
+            candidates.append((columns.score(weights), record_id))
+        return heapq.nsmallest(k, candidates, key=lambda entry: (-entry[0], entry[1]))
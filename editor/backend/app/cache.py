@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from .indexes import CollectionIndex
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+FileSignature = Tuple[int, int]
+
+
+def file_signature(path: Path) -> Optional[FileSignature]:
+    """Return ``(st_mtime_ns, st_size)`` for ``path`` or ``None`` if it is missing."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class RecordCollection(Generic[ModelT]):
+    """Parsed, ordered and validated records of a single data file.
+
+    Records are kept both as the raw dictionaries written to disk and as
+    validated models. When ``sort_key`` is given the collection keeps the
+    records ordered by it; otherwise the file order is preserved and new
+    records are appended.
+    """
+
+    def __init__(
+        self,
+        model: Type[ModelT],
+        records: Iterable[Dict[str, Any]],
+        sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ):
+        self.model = model
+        self.sort_key = sort_key
+        self.meta: Dict[str, Any] = dict(meta or {})
+        self.lock = threading.RLock()
+        self.signature: Optional[Any] = None
+        self.revision = 0
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._items: Dict[str, ModelT] = {}
+        self._keys: List[Tuple[Any, str]] = []
+        self._ordered: Optional[List[ModelT]] = None
+        self._indexes: Dict[str, CollectionIndex] = {}
+        self._derived: Dict[str, Tuple[int, Any]] = {}
+
+        for record in records:
+            self._records[record["id"]] = record
+            self._items[record["id"]] = model(**record)
+        if sort_key is not None:
+            self._keys = sorted(
+                (sort_key(record), record_id) for record_id, record in self._records.items()
+            )
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, record_id: object) -> bool:
+        return record_id in self._records
+
+    def ids(self) -> List[str]:
+        with self.lock:
+            if self.sort_key is None:
+                return list(self._records)
+            return [record_id for _, record_id in self._keys]
+
+    def items(self) -> List[ModelT]:
+        with self.lock:
+            if self._ordered is None:
+                self._ordered = [self._items[record_id] for record_id in self.ids()]
+            return list(self._ordered)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [self._records[record_id] for record_id in self.ids()]
+
+    def get(self, record_id: str) -> ModelT:
+        return self._items[record_id]
+
+    def in_order(self, record_ids: Iterable[str]) -> List[ModelT]:
+        """Items for ``record_ids`` in collection order, in O(k log k) for k ids."""
+        with self.lock:
+            if self.sort_key is None:
+                wanted = set(record_ids)
+                return [
+                    self._items[record_id] for record_id in self._records if record_id in wanted
+                ]
+            keyed = sorted(
+                (self.sort_key(self._records[record_id]), record_id) for record_id in record_ids
+            )
+            return [self._items[record_id] for _, record_id in keyed]
+
+    def order_keys(self, record_ids: List[str]) -> List[Tuple[Any, str]]:
+        """Keys placing ``record_ids`` in collection order; stable page cursors."""
+        with self.lock:
+            if self.sort_key is not None:
+                return [(self.sort_key(self._records[rid]), rid) for rid in record_ids]
+            positions = {record_id: position for position, record_id in enumerate(self._records)}
+            return [(positions[record_id], record_id) for record_id in record_ids]
+
+    def page(
+        self, after: Optional[Tuple[Any, str]], limit: Optional[int]
+    ) -> Tuple[List[ModelT], bool]:
+        """Up to ``limit`` items ordered after the key ``after``, and whether more remain."""
+        with self.lock:
+            if self.sort_key is not None:
+                keys = self._keys
+            else:
+                keys = list(enumerate(self._records))
+            start = self.seek(keys, after)
+            end = len(keys) if limit is None else start + limit
+            return [self._items[record_id] for _, record_id in keys[start:end]], end < len(keys)
+
+    def seek(self, keys: List[Tuple[Any, str]], after: Optional[Tuple[Any, str]]) -> int:
+        """Index of the first of the ordered ``keys`` that comes after the cursor key ``after``.
+
+        Without a sort key, order keys are list positions, which shift when
+        an earlier record is removed; a cursor whose record still exists is
+        therefore re-anchored at that record's current position. Raises
+        ``ValueError`` if ``after`` cannot be compared with the keys.
+        """
+        if after is None:
+            return 0
+        with self.lock:
+            if self.sort_key is None and after[1] in self._records:
+                after = (list(self._records).index(after[1]), after[1])
+        try:
+            return bisect.bisect_right(keys, after)
+        except TypeError as exc:
+            raise ValueError("Invalid cursor for this collection") from exc
+
+    def add_index(self, name: str, index: CollectionIndex) -> CollectionIndex:
+        """Attach ``index``, populate it and keep it updated on every mutation."""
+        with self.lock:
+            index.populate(self._items.items())
+            self._indexes[name] = index
+        return index
+
+    def index(self, name: str) -> CollectionIndex:
+        return self._indexes[name]
+
+    def derived(self, name: str, build: Callable[["RecordCollection[ModelT]"], Any]) -> Any:
+        """Value computed by ``build`` from this collection, memoized per revision.
+
+        Suits whole-collection products such as serialized payloads that
+        are cheap to keep but expensive to recompute on every request.
+        """
+        with self.lock:
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == self.revision:
+                return cached[1]
+            value = build(self)
+            self._derived[name] = (self.revision, value)
+            return value
+
+    def get_record(self, record_id: str) -> Dict[str, Any]:
+        return self._records[record_id]
+
+    def upsert(self, record: Dict[str, Any], item: Optional[ModelT] = None) -> ModelT:
+        """Insert or replace ``record``; validation happens before any mutation.
+
+        ``item`` may pass a model already validated for ``record``.
+        """
+        if item is None:
+            item = self.model(**record)
+        record_id = record["id"]
+        with self.lock:
+            previous = self._items.get(record_id)
+            if self.sort_key is not None:
+                if previous is not None:
+                    self._remove_key(record_id)
+                bisect.insort(self._keys, (self.sort_key(record), record_id))
+            self._records[record_id] = record
+            self._items[record_id] = item
+            for index in self._indexes.values():
+                if previous is not None:
+                    index.remove(record_id, previous)
+                index.add(record_id, item)
+            self._touch()
+        return item
+
+    def delete(self, record_id: str) -> None:
+        with self.lock:
+            if record_id not in self._records:
+                raise KeyError(record_id)
+            if self.sort_key is not None:
+                self._remove_key(record_id)
+            del self._records[record_id]
+            item = self._items.pop(record_id)
+            for index in self._indexes.values():
+                index.remove(record_id, item)
+            self._touch()
+
+    def reorder(self, ids: List[str]) -> None:
+        """Restore the file order of an unsorted collection to ``ids``."""
+        with self.lock:
+            if self.sort_key is not None:
+                return
+            ordered = {
+                record_id: self._records[record_id]
+                for record_id in ids
+                if record_id in self._records
+            }
+            ordered.update(self._records)
+            self._records = ordered
+            self._touch()
+
+    def _remove_key(self, record_id: str) -> None:
+        key = (self.sort_key(self._records[record_id]), record_id)
+        index = bisect.bisect_left(self._keys, key)
+        del self._keys[index]
+
+    def _touch(self) -> None:
+        self._ordered = None
+        self.revision += 1
+
+
+class CollectionCache:
+    """Process-wide cache of :class:`RecordCollection` objects.
+
+    Entries are keyed by the storage they were loaded from, usually the
+    data file's path. An entry is reused while the storage signature
+    (by default the file's mtime and size) matches the one recorded when
+    it was loaded or last written by this process; any other change
+    triggers a reload on the next access.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, RecordCollection] = {}
+        self._lock = threading.Lock()
+
+    def _signature(self, key: Hashable, signature: Optional[Callable[[], Any]]) -> Any:
+        return signature() if signature is not None else file_signature(key)
+
+    def peek(
+        self, key: Hashable, signature: Optional[Callable[[], Any]] = None
+    ) -> Optional[RecordCollection]:
+        """Return the entry for ``key`` if it is loaded and still current."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.signature == self._signature(key, signature):
+            return entry
+        return None
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], RecordCollection],
+        signature: Optional[Callable[[], Any]] = None,
+    ) -> RecordCollection:
+        current = self._signature(key, signature)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.signature == current:
+            return entry
+        collection = loader()
+        collection.signature = current
+        with self._lock:
+            self._entries[key] = collection
+        return collection
+
+    def commit(
+        self,
+        key: Hashable,
+        collection: RecordCollection,
+        signature: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """Record that ``collection`` now matches what is stored under ``key``."""
+        collection.signature = self._signature(key, signature)
+        with self._lock:
+            self._entries[key] = collection
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+collection_cache = CollectionCache()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag derived from ``parts``, e.g. a storage key and its signature."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether ``If-None-Match`` lists ``etag`` (weak comparison, RFC 7232 §3.2)."""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == etag or candidate.startswith(etag[:-1] + "-"):
+            return True
+    return False
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """ETag of a content-coded representation; still matches ``etag`` in requests."""
+    if encoding == "identity":
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def not_modified(etag: str, encoding: Optional[str] = None) -> Response:
+    """A 304 for ``etag``.
+
+    For a content-negotiated body pass the ``encoding`` the 200 would use,
+    so the 304 carries the same variant ETag and ``Vary`` (RFC 7232 §4.1).
+    """
+    if encoding is None:
+        headers = {"ETag": etag}
+    else:
+        headers = {"ETag": variant_etag(etag, encoding), "Vary": "Accept-Encoding"}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def settle_etag(before: str, after: str) -> Optional[str]:
+    """ETag for a body loaded between two version checks.
+
+    If the data changed while the body was being built it is unclear
+    which version the body reflects, so no ETag is sent.
+    """
+    return before if before == after else None
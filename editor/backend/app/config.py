@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -19,6 +19,13 @@ def _path_from_env(variable: str, default: Path) -> Path:
     return default
 
 
+def _bool_from_env(variable: str, default: bool) -> bool:
+    value = os.getenv(variable)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 class Settings(BaseModel):
     """Runtime configuration for the monster editor backend."""
 
@@ -69,6 +76,54 @@ class Settings(BaseModel):
             _default_repo_root() / "scripts/optimize_assets.py",
         )
     )
+    conversion_python: Path = Field(
+        default_factory=lambda: _path_from_env(
+            "MONSTER_CONVERSION_PYTHON", Path("~/.uv-venvs/base/bin/python").expanduser()
+        )
+    )
+    conversion_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_CONVERSION_CONCURRENCY", "1"))
+    )
+    storage_backend: Literal["json", "sqlite"] = Field(
+        default_factory=lambda: os.getenv("EDITOR_STORAGE_BACKEND", "json")
+    )
+    sqlite_file: Path = Field(
+        default_factory=lambda: _path_from_env(
+            "EDITOR_SQLITE_FILE", _default_repo_root() / "editor/backend/editor.db"
+        )
+    )
+    export_on_commit: bool = Field(
+        default_factory=lambda: _bool_from_env("EDITOR_EXPORT_ON_COMMIT", False)
+    )
+    map_layout: Literal["single", "sharded"] = Field(
+        default_factory=lambda: os.getenv("EDITOR_MAP_LAYOUT", "single")
+    )
+    map_shards_dir: Path = Field(
+        default_factory=lambda: _path_from_env(
+            "MAP_SHARDS_DIR", _default_repo_root() / "src/data/maps"
+        )
+    )
+    journal_mode: bool = Field(
+        default_factory=lambda: _bool_from_env("EDITOR_JOURNAL_MODE", False)
+    )
+    journal_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_JOURNAL_MAX_ENTRIES", "200"))
+    )
+    journal_max_age_seconds: float = Field(
+        default_factory=lambda: float(os.getenv("EDITOR_JOURNAL_MAX_AGE_SECONDS", "30"))
+    )
+    image_max_age: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_IMAGE_MAX_AGE", "0"))
+    )
+    video_max_age: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_VIDEO_MAX_AGE", "0"))
+    )
+    audio_max_age: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_AUDIO_MAX_AGE", "0"))
+    )
+    upload_max_bytes: int = Field(
+        default_factory=lambda: int(os.getenv("EDITOR_UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+    )
 
 
 _settings: Optional[Settings] = None
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .indexes import CollectionIndex
+from .models import EquipmentItem
+
+#: Highest enhancement level, as ``MAX_EQUIP_LEVEL`` in the game.
+MAX_ENHANCE_LEVEL = 15
+
+
+@dataclass(frozen=True)
+class _MaterialPrefix:
+    """Materials needed to reach every level of one item from +0.
+
+    ``prefix[level][column]`` is the quantity of ``materials[column]``
+    used by the requirements with a target level up to ``level``, so the
+    cost between two levels is one subtraction per material.
+    """
+
+    materials: Tuple[str, ...]
+    prefix: Tuple[Tuple[int, ...], ...]
+
+    @classmethod
+    def of(cls, item: EquipmentItem) -> Optional["_MaterialPrefix"]:
+        per_level: Dict[int, Dict[str, int]] = {}
+        for requirement in item.enhance_materials or []:
+            level = requirement.target_level
+            # The game ignores requirements it can never reach
+            if level is None or not 0 < level <= MAX_ENHANCE_LEVEL:
+                continue
+            for material in requirement.materials or []:
+                if not material.id:
+                    continue
+                costs = per_level.setdefault(level, {})
+                quantity = max(1, round(material.quantity if material.quantity is not None else 1))
+                costs[material.id] = costs.get(material.id, 0) + quantity
+        if not per_level:
+            return None
+        materials = tuple(sorted({name for costs in per_level.values() for name in costs}))
+        running = [0] * len(materials)
+        prefix = [tuple(running)]
+        for level in range(1, MAX_ENHANCE_LEVEL + 1):
+            for column, name in enumerate(materials):
+                running[column] += per_level.get(level, {}).get(name, 0)
+            prefix.append(tuple(running))
+        return cls(materials, tuple(prefix))
+
+    def between(self, from_level: int, to_level: int) -> Dict[str, int]:
+        low, high = self.prefix[from_level], self.prefix[to_level]
+        return {
+            name: high[column] - low[column]
+            for column, name in enumerate(self.materials)
+            if high[column] != low[column]
+        }
+
+
+class EnhanceCostIndex(CollectionIndex):
+    """Prefix sums of every item's enhancement materials, rebuilt per item on write.
+
+    The prefix sums of the whole catalogue are kept as a running total,
+    so catalogue-wide rollups cost one subtraction per material too.
+    """
+
+    def __init__(self) -> None:
+        self._items: Dict[str, _MaterialPrefix] = {}
+        #: Material -> catalogue-wide quantity needed to reach each level.
+        self._catalogue: Dict[str, List[int]] = {}
+
+    def add(self, record_id: str, item: EquipmentItem) -> None:
+        prefix = _MaterialPrefix.of(item)
+        if prefix is not None:
+            self._items[record_id] = prefix
+            self._count(prefix, 1)
+
+    def remove(self, record_id: str, item: EquipmentItem) -> None:
+        prefix = self._items.pop(record_id, None)
+        if prefix is not None:
+            self._count(prefix, -1)
+
+    def _count(self, prefix: _MaterialPrefix, sign: int) -> None:
+        for column, name in enumerate(prefix.materials):
+            totals = self._catalogue.setdefault(name, [0] * (MAX_ENHANCE_LEVEL + 1))
+            for level, quantities in enumerate(prefix.prefix):
+                totals[level] += sign * quantities[column]
+            if not totals[MAX_ENHANCE_LEVEL]:
+                del self._catalogue[name]
+
+    def cost(self, record_id: str, from_level: int, to_level: int) -> Dict[str, int]:
+        """Materials to take ``record_id`` from ``+from_level`` to ``+to_level``."""
+        prefix = self._items.get(record_id)
+        return prefix.between(from_level, to_level) if prefix is not None else {}
+
+    def total(
+        self, record_ids: Optional[Iterable[str]], from_level: int, to_level: int
+    ) -> Dict[str, int]:
+        """Summed :meth:`cost` of ``record_ids``, or of every item if ``None``."""
+        if record_ids is None:
+            return {
+                name: totals[to_level] - totals[from_level]
+                for name, totals in sorted(self._catalogue.items())
+                if totals[to_level] != totals[from_level]
+            }
+        totals: Dict[str, int] = {}
+        for record_id in record_ids:
+            for name, quantity in self.cost(record_id, from_level, to_level).items():
+                totals[name] = totals.get(name, 0) + quantity
+        return dict(sorted(totals.items()))
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from .config import Settings, get_settings
+from .repository import EquipmentRepository, MapRepository, MonsterRepository
+
+REPOSITORIES = (MonsterRepository, EquipmentRepository, MapRepository)
+
+
+def export_all(settings: Optional[Settings] = None) -> List[Path]:
+    """Regenerate the canonical JSON data files from the configured storage."""
+    settings = settings or get_settings()
+    paths = [repository.from_settings(settings).export_json() for repository in REPOSITORIES]
+    paths.append(MapRepository.from_settings(settings).export_spawn_tables())
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Regenerate src/data/*.json from the editor's storage backend."
+    )
+    parser.parse_args(argv)
+    for path in export_all():
+        print(f"exported {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import mmap
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+import anyio
+from fastapi import Request, Response, status
+from starlette.types import Receive, Scope, Send
+
+from .conditional import etag_matches, make_etag
+
+#: Bytes sent per chunk when the server cannot send file ranges itself.
+CHUNK_SIZE = 1024 * 1024
+#: Most ranges honoured in one request; beyond that the whole file is sent.
+MAX_RANGES = 16
+
+#: Inclusive ``(first byte, last byte)``.
+ByteRange = Tuple[int, int]
+
+
+def cache_control(max_age: int) -> str:
+    """``Cache-Control`` for a file cached ``max_age`` seconds; ``0`` revalidates every use."""
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def file_etag(path: Path, stat: os.stat_result) -> str:
+    """Strong ETag of the file at ``path`` as of ``stat``."""
+    return make_etag(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _modified_since(request: Request, stat: os.stat_result) -> bool:
+    """``False`` if ``If-Modified-Since`` dates the file; ignored alongside ``If-None-Match``."""
+    header = request.headers.get("if-modified-since")
+    if not header or "if-none-match" in request.headers:
+        return True
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return True
+    # HTTP dates have whole-second precision
+    return int(stat.st_mtime) > since
+
+
+def _if_range_holds(request: Request, etag: str, last_modified: str) -> bool:
+    """Whether a ``Range`` may be honoured under ``If-Range`` (RFC 7233 §3.2)."""
+    header = request.headers.get("if-range")
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        # Strong comparison: a weak validator never matches
+        return header == etag
+    return header == last_modified
+
+
+def parse_ranges(header: str, size: int) -> Optional[List[ByteRange]]:
+    """Inclusive ``(start, end)`` ranges of a ``bytes=`` header over ``size`` bytes.
+
+    Handles open (``bytes=500-``), suffix (``bytes=-500``) and multiple
+    comma-separated ranges, dropping the unsatisfiable ones and coalescing
+    those that overlap or touch. ``None`` if the header is malformed or
+    lists more than :data:`MAX_RANGES` ranges, so the whole file is served;
+    ``ValueError`` if no range is satisfiable (RFC 7233 §2.1, §4.4).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    specs = [part.strip() for part in spec.split(",") if part.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+    ranges: List[ByteRange] = []
+    for part in specs:
+        first, dash, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not dash or not (first or last):
+            return None
+        if not (first or "0").isdigit() or not (last or "0").isdigit():
+            return None
+        if not first:
+            if int(last) and size:
+                ranges.append((max(0, size - int(last)), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+    if not ranges:
+        raise ValueError(header)
+    return _coalesce(ranges)
+
+
+def _coalesce(ranges: List[ByteRange]) -> List[ByteRange]:
+    """``ranges`` in request order, or sorted and merged if any overlap or touch."""
+    ordered = sorted(ranges)
+    if all(left[1] + 1 < right[0] for left, right in zip(ordered, ordered[1:])):
+        return ranges
+    merged = [ordered[0]]
+    for start, end in ordered[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFileResponse(Response):
+    """The whole of a file, one byte range, or several as ``multipart/byteranges``.
+
+    Ranges are sent with the ASGI ``http.response.zerocopy`` extension
+    (``sendfile``) where the server offers it, and otherwise as
+    :data:`CHUNK_SIZE` slices of a memory map taken in a worker thread,
+    so no Python-level read loop copies the data. ``HEAD`` requests get
+    the headers only, without opening the file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        size: int,
+        ranges: Optional[List[ByteRange]],
+        media_type: str,
+        headers: Dict[str, str],
+    ) -> None:
+        self.path = path
+        self.background = None
+        headers = dict(headers)
+        #: Body as literal bytes and ``(start, end)`` file ranges, in order.
+        self._segments: List[Union[bytes, ByteRange]] = []
+        if ranges is None:
+            self.status_code = status.HTTP_200_OK
+            headers["Content-Type"] = media_type
+            if size:
+                self._segments.append((0, size - 1))
+        elif len(ranges) == 1:
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Type"] = media_type
+            headers["Content-Range"] = f"bytes {ranges[0][0]}-{ranges[0][1]}/{size}"
+            self._segments.append(ranges[0])
+        else:
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            boundary = secrets.token_hex(16)
+            headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+            for position, (start, end) in enumerate(ranges):
+                part = (
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                )
+                self._segments.append((("\r\n" if position else "") + part).encode("latin-1"))
+                self._segments.append((start, end))
+            self._segments.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+        headers["Content-Length"] = str(
+            sum(
+                len(segment) if isinstance(segment, bytes) else segment[1] - segment[0] + 1
+                for segment in self._segments
+            )
+        )
+        self.media_type = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        if scope["method"].upper() == "HEAD" or not self._segments:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+        with self.path.open("rb") as handle:
+            if zerocopy:
+                await self._send_zerocopy(handle, send)
+            else:
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    await self._send_mapped(mapped, send)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_zerocopy(self, handle: BinaryIO, send: Send) -> None:
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                await send({"type": "http.response.body", "body": segment, "more_body": True})
+                continue
+            start, end = segment
+            await send(
+                {
+                    "type": "http.response.zerocopy",
+                    "file": handle,
+                    "offset": start,
+                    "count": end - start + 1,
+                    "more_body": True,
+                }
+            )
+
+    async def _send_mapped(self, mapped: mmap.mmap, send: Send) -> None:
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                await send({"type": "http.response.body", "body": segment, "more_body": True})
+                continue
+            start, end = segment
+            for offset in range(start, end + 1, CHUNK_SIZE):
+                # Slicing may fault pages in from disk, so it stays off the event loop
+                chunk = await anyio.to_thread.run_sync(
+                    mapped.__getitem__, slice(offset, min(offset + CHUNK_SIZE, end + 1))
+                )
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+
+def file_response(
+    request: Request, path: Path, media_type: Optional[str] = None, max_age: int = 0
+) -> Response:
+    """Serve ``path`` with validators, conditional requests and byte ranges.
+
+    Sends ``ETag``, ``Last-Modified`` and ``Cache-Control``, answers
+    ``If-None-Match`` and ``If-Modified-Since`` with ``304`` and ``Range``
+    on ``GET`` (subject to ``If-Range``) with ``206`` or ``416``, through a
+    :class:`RangeFileResponse`. The media type is guessed from the file
+    name if not given. Raises ``FileNotFoundError`` if ``path`` does not
+    exist.
+    """
+    media_type = media_type or guess_type(path.name)[0] or "application/octet-stream"
+    stat = path.stat()
+    etag = file_etag(path, stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control(max_age),
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request, etag) or not _modified_since(request, stat):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    ranges = None
+    range_header = request.headers.get("range")
+    # Range only applies to GET (RFC 7233 §3.1)
+    if range_header and request.method == "GET" and _if_range_holds(request, etag, last_modified):
+        try:
+            ranges = parse_ranges(range_header, stat.st_size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers
+            )
+    return RangeFileResponse(path, stat.st_size, ranges, media_type, headers)
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import abc
+import bisect
+import itertools
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Sorts after every record id, so (value, _MAX_ID) bounds all entries with ``value``.
+_MAX_ID = chr(0x10FFFF)
+
+
+class CollectionIndex(abc.ABC):
+    """Lookup structure derived from the items of a ``RecordCollection``.
+
+    The collection calls :meth:`add` and :meth:`remove` as records are
+    inserted, replaced and deleted, so an index never needs a full
+    rebuild after it has been populated. Subclasses must implement both.
+    """
+
+    @abc.abstractmethod
+    def add(self, record_id: str, item: Any) -> None:
+        """Index ``item``, stored under ``record_id``."""
+
+    @abc.abstractmethod
+    def remove(self, record_id: str, item: Any) -> None:
+        """Drop ``item``, previously added under ``record_id``."""
+
+    def populate(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        for record_id, item in entries:
+            self.add(record_id, item)
+
+
+class HashIndex(CollectionIndex):
+    """Maps the value of ``key(item)`` to the ids of the items holding it.
+
+    Items whose key is ``None`` are not indexed.
+    """
+
+    def __init__(self, key: Callable[[Any], Optional[Hashable]]):
+        self.key = key
+        self._buckets: Dict[Hashable, Set[str]] = {}
+
+    def add(self, record_id: str, item: Any) -> None:
+        value = self.key(item)
+        if value is not None:
+            self._buckets.setdefault(value, set()).add(record_id)
+
+    def remove(self, record_id: str, item: Any) -> None:
+        value = self.key(item)
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            return
+        bucket.discard(record_id)
+        if not bucket:
+            del self._buckets[value]
+
+    def get(self, value: Hashable) -> Set[str]:
+        """Ids holding ``value``; the returned set must not be modified."""
+        return self._buckets.get(value, set())
+
+    def count(self, value: Hashable) -> int:
+        return len(self._buckets.get(value, ()))
+
+
+class SortedIndex(CollectionIndex):
+    """Keeps ``(key(item), id)`` pairs sorted for bisect range queries.
+
+    Items whose key is ``None`` are not indexed.
+    """
+
+    def __init__(self, key: Callable[[Any], Any]):
+        self.key = key
+        self._entries: List[Tuple[Any, str]] = []
+
+    def add(self, record_id: str, item: Any) -> None:
+        value = self.key(item)
+        if value is not None:
+            bisect.insort(self._entries, (value, record_id))
+
+    def remove(self, record_id: str, item: Any) -> None:
+        value = self.key(item)
+        if value is None:
+            return
+        position = bisect.bisect_left(self._entries, (value, record_id))
+        if position < len(self._entries) and self._entries[position] == (value, record_id):
+            del self._entries[position]
+
+    def populate(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        for record_id, item in entries:
+            value = self.key(item)
+            if value is not None:
+                self._entries.append((value, record_id))
+        self._entries.sort()
+
+    def _bounds(self, low: Any, high: Any) -> Tuple[int, int]:
+        start = 0 if low is None else bisect.bisect_left(self._entries, (low,))
+        if high is None:
+            end = len(self._entries)
+        else:
+            end = bisect.bisect_right(self._entries, (high, _MAX_ID))
+        return start, max(start, end)
+
+    def range(self, low: Any = None, high: Any = None) -> List[str]:
+        """Ids whose key lies in ``[low, high]``; ``None`` leaves a side open."""
+        start, end = self._bounds(low, high)
+        return [record_id for _, record_id in self._entries[start:end]]
+
+    def count_range(self, low: Any = None, high: Any = None) -> int:
+        start, end = self._bounds(low, high)
+        return end - start
+
+    def contains(self, item: Any, low: Any = None, high: Any = None) -> bool:
+        value = self.key(item)
+        if value is None:
+            return False
+        return (low is None or value >= low) and (high is None or value <= high)
+
+
+class ReferenceIndex(CollectionIndex):
+    """Maps ids of records elsewhere to the items referring to them.
+
+    ``refs(item)`` yields ``(target_id, detail)`` pairs, ``detail``
+    describing where and how ``item`` refers to ``target_id``. Lookups and
+    counts by target are O(1), so callers can cheaply check whether a
+    record in another collection is still in use.
+    """
+
+    def __init__(self, refs: Callable[[Any], Iterable[Tuple[str, Any]]]):
+        self.refs = refs
+        self._targets: Dict[str, Dict[str, List[Any]]] = {}
+
+    def add(self, record_id: str, item: Any) -> None:
+        for target_id, detail in self.refs(item):
+            self._targets.setdefault(target_id, {}).setdefault(record_id, []).append(detail)
+
+    def remove(self, record_id: str, item: Any) -> None:
+        for target_id in {target_id for target_id, _ in self.refs(item)}:
+            referrers = self._targets.get(target_id)
+            if referrers is None:
+                continue
+            referrers.pop(record_id, None)
+            if not referrers:
+                del self._targets[target_id]
+
+    def get(self, target_id: str) -> List[Tuple[str, Any]]:
+        """``(record_id, detail)`` for every reference to ``target_id``."""
+        return [
+            (record_id, detail)
+            for record_id, details in self._targets.get(target_id, {}).items()
+            for detail in details
+        ]
+
+    def count(self, target_id: str) -> int:
+        """Number of records referring to ``target_id``."""
+        return len(self._targets.get(target_id, ()))
+
+    def targets(self) -> List[str]:
+        return list(self._targets)
+
+
+class ChangeFeed(CollectionIndex):
+    """Numbered log of the collection's recent changes, for downstream consumers.
+
+    Every add and remove is appended as ``(added, record_id, item)``; a
+    replace is a remove followed by an add. Consumers remember
+    :attr:`position` after reading the collection and later fetch what
+    happened since with :meth:`since`. Only the last ``limit`` events are
+    kept, so a consumer that fell further behind must resync from the
+    collection. The initial population is not logged.
+    """
+
+    def __init__(self, limit: int = 1024):
+        self._events: Deque[Tuple[bool, str, Any]] = deque(maxlen=limit)
+        self.position = 0
+
+    def populate(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        pass
+
+    def add(self, record_id: str, item: Any) -> None:
+        self._events.append((True, record_id, item))
+        self.position += 1
+
+    def remove(self, record_id: str, item: Any) -> None:
+        self._events.append((False, record_id, item))
+        self.position += 1
+
+    def since(self, position: int) -> Optional[List[Tuple[bool, str, Any]]]:
+        """Events after ``position``, or ``None`` if some are no longer kept."""
+        first = self.position - len(self._events)
+        if position < first:
+            return None
+        return list(itertools.islice(self._events, position - first, None))
+
+
+def _normalize(text: str) -> str:
+    return text.lower()
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    return {text[start:start + size] for start in range(len(text) - size + 1)}
+
+
+class TrigramIndex(CollectionIndex):
+    """Substring search over short text fields such as ids and names.
+
+    Every 1-, 2- and 3-gram of the lower-cased fields is mapped to the ids
+    containing it. Queries of up to three characters are answered from
+    their own posting list; longer queries intersect the postings of their
+    trigrams, smallest first, and verify the survivors. Grams are taken
+    per character, so CJK names need no tokenizer. A sorted list of the
+    field values additionally serves prefix-only lookups by bisection.
+    """
+
+    max_gram = 3
+
+    def __init__(self, fields: Callable[[Any], Iterable[Optional[str]]]):
+        self.fields = fields
+        self._postings: Dict[str, Set[str]] = {}
+        self._texts: Dict[str, Tuple[str, ...]] = {}
+        self._sorted: List[Tuple[str, str]] = []
+
+    def _texts_of(self, item: Any) -> Tuple[str, ...]:
+        return tuple(dict.fromkeys(_normalize(text) for text in self.fields(item) if text))
+
+    def add(self, record_id: str, item: Any) -> None:
+        texts = self._texts_of(item)
+        self._texts[record_id] = texts
+        for gram in self._all_grams(texts):
+            self._postings.setdefault(gram, set()).add(record_id)
+        for text in texts:
+            bisect.insort(self._sorted, (text, record_id))
+
+    def remove(self, record_id: str, item: Any) -> None:
+        texts = self._texts.pop(record_id, ())
+        for gram in self._all_grams(texts):
+            bucket = self._postings.get(gram)
+            if bucket is not None:
+                bucket.discard(record_id)
+                if not bucket:
+                    del self._postings[gram]
+        for text in texts:
+            position = bisect.bisect_left(self._sorted, (text, record_id))
+            if position < len(self._sorted) and self._sorted[position] == (text, record_id):
+                del self._sorted[position]
+
+    def _all_grams(self, texts: Iterable[str]) -> Set[str]:
+        grams: Set[str] = set()
+        for text in texts:
+            for size in range(1, self.max_gram + 1):
+                grams |= _grams(text, size)
+        return grams
+
+    def matches(self, query: str) -> Set[str]:
+        """Unranked ids whose fields contain ``query`` as a substring."""
+        query = _normalize(query)
+        if not query:
+            return set(self._texts)
+        if len(query) <= self.max_gram:
+            return set(self._postings.get(query, ()))
+        postings = sorted(
+            (self._postings.get(gram, set()) for gram in _grams(query, self.max_gram)), key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return {
+            record_id
+            for record_id in candidates
+            if any(query in text for text in self._texts[record_id])
+        }
+
+    def similar(self, query: str, threshold: float) -> Dict[str, float]:
+        """Ids sharing at least ``threshold`` of the query's trigrams, with that share.
+
+        Tolerates typos and transpositions in longer queries, which
+        substring matching cannot.
+        """
+        grams = _grams(_normalize(query), self.max_gram)
+        if not grams:
+            return {}
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for record_id in self._postings.get(gram, ()):
+                shared[record_id] = shared.get(record_id, 0) + 1
+        return {
+            record_id: count / len(grams)
+            for record_id, count in shared.items()
+            if count / len(grams) >= threshold
+        }
+
+    def prefix_matches(self, query: str) -> List[str]:
+        """Ids with a field starting with ``query``, in field value order."""
+        query = _normalize(query)
+        start = bisect.bisect_left(self._sorted, (query,))
+        end = bisect.bisect_left(self._sorted, (query + _MAX_ID,))
+        return list(dict.fromkeys(record_id for _, record_id in self._sorted[start:end]))
+
+    def rank(self, query: str, record_id: str) -> Tuple[int, int, int]:
+        """Lower is better: exact, prefix, word start, then plain substring."""
+        query = _normalize(query)
+        best = (4, 0, 0)
+        for text in self._texts.get(record_id, ()):
+            position = text.find(query)
+            if position < 0:
+                continue
+            if text == query:
+                tier = 0
+            elif position == 0:
+                tier = 1
+            elif not text[position - 1].isalnum():
+                tier = 2
+            else:
+                tier = 3
+            best = min(best, (tier, position, len(text)))
+        return best
+
+    def search(self, query: str, limit: Optional[int] = None, prefix: bool = False) -> List[str]:
+        """Ranked ids matching ``query``; ``prefix`` restricts to prefix matches."""
+        found = self.prefix_matches(query) if prefix else self.matches(query)
+        ranked = sorted(found, key=lambda record_id: (self.rank(query, record_id), record_id))
+        return ranked[:limit] if limit is not None else ranked
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from .config import Settings
+from .models import ConversionJob
+
+#: Finished jobs kept for status lookups, oldest dropped first.
+HISTORY_SIZE = 50
+#: Characters of stdout and stderr kept per job.
+OUTPUT_LIMIT = 64 * 1024
+#: Seconds a cancelled process gets to exit before it is killed.
+TERMINATE_GRACE_SECONDS = 5.0
+#: Output lines with which the conversion script reports a finished file.
+_STEP_PREFIXES = ("Saved ", "生成完成")
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+class JobFinished(ValueError):
+    """The job already finished and can no longer be cancelled."""
+
+
+class Job:
+    """One run of a command, with its state and output so far.
+
+    Every change bumps :attr:`version`, so watchers can tell whether
+    anything happened since they last looked.
+    """
+
+    def __init__(self, kind: str, command: Sequence[str], cwd: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.command = tuple(command)
+        self.cwd = cwd
+        self.state = "queued"
+        self.steps = 0
+        self.message: Optional[str] = None
+        self.return_code: Optional[int] = None
+        self.stdout = ""
+        self.stderr = ""
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.version = 0
+        self.process: Optional[subprocess.Popen] = None
+        self.cancel_requested = False
+
+    @property
+    def key(self) -> Tuple[Tuple[str, ...], str]:
+        """Jobs with equal keys would do the same work."""
+        return self.command, self.cwd
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def snapshot(self) -> ConversionJob:
+        return ConversionJob(
+            id=self.id,
+            kind=self.kind,
+            state=self.state,
+            steps=self.steps,
+            message=self.message,
+            returnCode=self.return_code,
+            stdout=self.stdout,
+            stderr=self.stderr,
+            createdAt=self.created_at,
+            startedAt=self.started_at,
+            finishedAt=self.finished_at,
+        )
+
+
+def _tail(text: str) -> str:
+    return text[-OUTPUT_LIMIT:]
+
+
+class JobQueue:
+    """Runs submitted commands in background threads, at most ``max_running`` at a time.
+
+    Submitting a command identical to one still queued returns the queued
+    job instead of adding another; a command identical to a running one is
+    queued, since it may see files the running one missed. Queued jobs are
+    cancelled by dropping them, running ones by terminating their process.
+    """
+
+    def __init__(self, max_running: int = 1):
+        self.max_running = max(1, max_running)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._queued: Deque[Job] = deque()
+        self._running: Dict[str, Job] = {}
+        self._history: "OrderedDict[str, None]" = OrderedDict()
+
+    def submit(self, kind: str, command: Sequence[str], cwd: str) -> Job:
+        with self._lock:
+            job = Job(kind, command, cwd)
+            for queued in self._queued:
+                if queued.key == job.key:
+                    return queued
+            self._jobs[job.id] = job
+            self._queued.append(job)
+            self._start_ready()
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        return job
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a job; ``JobNotFound`` if unknown, ``JobFinished`` if already over."""
+        job = self.get(job_id)
+        with self._lock:
+            if job.finished:
+                raise JobFinished(job_id)
+            job.cancel_requested = True
+            if job in self._queued:
+                self._queued.remove(job)
+                self._finish(job, "cancelled")
+                return job
+            process = job.process
+        if process is not None:
+            _terminate(process)
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel every queued and running job."""
+        for job in self.list():
+            if not job.finished:
+                try:
+                    self.cancel(job.id)
+                except JobFinished:
+                    pass
+
+    def _start_ready(self) -> None:
+        while self._queued and len(self._running) < self.max_running:
+            job = self._queued.popleft()
+            self._running[job.id] = job
+            job.state = "running"
+            job.started_at = time.time()
+            job.version += 1
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job: Job) -> None:
+        try:
+            process = subprocess.Popen(
+                job.command,
+                cwd=job.cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                # Own process group, so cancelling also stops the script's children
+                start_new_session=True,
+            )
+        except OSError as exc:
+            with self._lock:
+                job.stderr = str(exc)
+                self._finish(job, "failed")
+            return
+        with self._lock:
+            job.process = process
+            cancelled = job.cancel_requested
+        if cancelled:
+            _terminate(process)
+        errors = threading.Thread(target=self._read_stderr, args=(job, process), daemon=True)
+        errors.start()
+        for line in process.stdout:
+            with self._lock:
+                job.stdout = _tail(job.stdout + line)
+                job.message = line.strip() or job.message
+                if line.startswith(_STEP_PREFIXES):
+                    job.steps += 1
+                job.version += 1
+        return_code = process.wait()
+        errors.join()
+        with self._lock:
+            job.return_code = return_code
+            if job.cancel_requested:
+                state = "cancelled"
+            else:
+                state = "succeeded" if return_code == 0 else "failed"
+            self._finish(job, state)
+
+    def _read_stderr(self, job: Job, process: subprocess.Popen) -> None:
+        for line in process.stderr:
+            with self._lock:
+                job.stderr = _tail(job.stderr + line)
+                job.version += 1
+
+    def _finish(self, job: Job, state: str) -> None:
+        """Record the end of ``job`` and start the next ones; the lock must be held."""
+        job.state = state
+        job.finished_at = time.time()
+        job.process = None
+        job.version += 1
+        self._running.pop(job.id, None)
+        self._history[job.id] = None
+        while len(self._history) > HISTORY_SIZE:
+            expired, _ = self._history.popitem(last=False)
+            self._jobs.pop(expired, None)
+        self._start_ready()
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    """Ask the process group of ``process`` to stop, killing what is left after a grace period.
+
+    Signalling the group rather than the process reaches the encoders the
+    script starts, which would otherwise keep running and hold its output
+    pipes open.
+    """
+    _signal_group(process, signal.SIGTERM)
+
+    def kill_late() -> None:
+        try:
+            process.wait(TERMINATE_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            pass
+        _signal_group(process, signal.SIGKILL)
+
+    threading.Thread(target=kill_late, daemon=True).start()
+
+
+def _signal_group(process: subprocess.Popen, signum: int) -> None:
+    try:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+_queues: Dict[int, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def job_queue(settings: Settings) -> JobQueue:
+    """The process-wide queue for ``settings.conversion_concurrency`` parallel jobs."""
+    with _queues_lock:
+        queue = _queues.get(settings.conversion_concurrency)
+        if queue is None:
+            queue = _queues[settings.conversion_concurrency] = JobQueue(
+                settings.conversion_concurrency
+            )
+        return queue
+
+
+def shutdown_jobs() -> None:
+    """Cancel the jobs of every queue, e.g. when the application stops."""
+    with _queues_lock:
+        queues = list(_queues.values())
+    for queue in queues:
+        queue.shutdown()
+
+
+def submit_conversion(settings: Settings, kind: str) -> Job:
+    """Queue a run of the asset conversion script; ``FileNotFoundError`` if it is missing."""
+    if not settings.conversion_script.exists():
+        raise FileNotFoundError(settings.conversion_script)
+    command = [str(settings.conversion_python), "-u", str(settings.conversion_script)]
+    return job_queue(settings).submit(kind, command, str(settings.repo_root))
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .config import Settings
+from .writer import Delete, Mutation, Upsert
+
+JOURNAL_SUFFIX = ".journal"
+
+
+@dataclass(frozen=True)
+class JournalOptions:
+    """When to fold the journal back into the canonical data file."""
+
+    max_entries: int = 200
+    max_age_seconds: float = 30.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> Optional["JournalOptions"]:
+        if not settings.journal_mode:
+            return None
+        return cls(
+            max_entries=settings.journal_max_entries,
+            max_age_seconds=settings.journal_max_age_seconds,
+        )
+
+
+def journal_path(data_file: Path) -> Path:
+    return data_file.with_name(data_file.name + JOURNAL_SUFFIX)
+
+
+def _encode(mutation: Mutation) -> str:
+    if isinstance(mutation, Upsert):
+        entry = {"op": "upsert", "record": mutation.record}
+    else:
+        entry = {"op": "delete", "id": mutation.record_id}
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode(line: str) -> Mutation:
+    entry = json.loads(line)
+    if entry["op"] == "upsert":
+        return Upsert(entry["record"])
+    return Delete(entry["id"])
+
+
+def read_journal(path: Path) -> List[Mutation]:
+    """Read the mutations recorded in ``path``.
+
+    A torn final line, left by a crash in the middle of an append, is
+    ignored since its write was never acknowledged.
+    """
+    if not path.exists():
+        return []
+    mutations: List[Mutation] = []
+    with path.open("r", encoding="utf-8") as fp:
+        for line in fp:
+            if not line.endswith("\n"):
+                break
+            if line.strip():
+                mutations.append(_decode(line))
+    return mutations
+
+
+def repair_journal(path: Path) -> None:
+    """Cut a torn final line off ``path``, so later appends start on a fresh line."""
+    try:
+        fp = path.open("r+b")
+    except FileNotFoundError:
+        return
+    with fp:
+        size = end = fp.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 4096)
+            fp.seek(start)
+            newline = fp.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            fp.truncate(end)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+
+class EditJournal:
+    """Append-only sidecar log of mutations to one data file.
+
+    ``compact`` is called from a background timer once the journal holds
+    ``max_entries`` entries or its oldest entry is ``max_age_seconds``
+    old, and is expected to rewrite the canonical file and :meth:`clear`
+    the journal.
+    """
+
+    def __init__(self, path: Path, options: JournalOptions, compact: Callable[[], None]):
+        self.path = path
+        self.options = options
+        self._compact = compact
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        repair_journal(path)
+        self.entries = len(read_journal(path))
+        if self.entries:
+            self._schedule(0 if self.entries >= options.max_entries else options.max_age_seconds)
+
+    def append(self, mutations: List[Mutation]) -> None:
+        payload = "".join(_encode(mutation) + "\n" for mutation in mutations)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as fp:
+                start = fp.tell()
+                try:
+                    fp.write(payload)
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                except BaseException:
+                    # Drop what made it to disk; the entries were not acknowledged
+                    fp.truncate(start)
+                    raise
+            self.entries += len(mutations)
+            if self.entries >= self.options.max_entries:
+                self._schedule(0, replace=True)
+            else:
+                self._schedule(self.options.max_age_seconds)
+
+    def clear(self) -> None:
+        """Forget all entries; the caller has already folded them into the data file."""
+        with self._lock:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            self.entries = 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def compact(self) -> None:
+        if self.entries:
+            self._compact()
+
+    def _schedule(self, delay: float, replace: bool = False) -> None:
+        if self._timer is not None:
+            if not replace:
+                return
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self) -> None:
+        with self._lock:
+            self._timer = None
+        self.compact()
+
+
+_journals: Dict[Path, EditJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path: Path, factory: Callable[[], EditJournal]) -> EditJournal:
+    """Return the process-wide journal for ``path``, creating it with ``factory``."""
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = factory()
+        return journal
+
+
+def compact_journals() -> None:
+    """Fold every pending journal into its data file, e.g. on shutdown."""
+    with _journals_lock:
+        journals = list(_journals.values())
+    for journal in journals:
+        journal.compact()
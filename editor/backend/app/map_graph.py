@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .indexes import CollectionIndex
+from .models import (
+    AsymmetricEdge,
+    DanglingReference,
+    GraphPlace,
+    MapGraphReport,
+    MapMetadata,
+    MapRoute,
+)
+
+#: A vertex of the map graph: ``(map id, node or location id)``.
+Place = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class _MapShape:
+    """The parts of one map that make up its share of the graph."""
+
+    default: Optional[str]
+    nodes: Tuple[str, ...]
+    locations: Tuple[str, ...]
+    connections: Dict[str, Tuple[str, ...]]
+    #: Place id -> (destination map id, destination node id or ``None``).
+    destinations: Dict[str, Tuple[str, Optional[str]]]
+
+    @classmethod
+    def of(cls, item: MapMetadata) -> "_MapShape":
+        nodes = item.nodes or []
+        locations = item.locations or []
+        destinations = {
+            node.id: (node.destination.mapId, node.destination.nodeId)
+            for node in nodes
+            if node.destination is not None
+        }
+        destinations.update(
+            (location.id, (location.destinationMapId, None))
+            for location in locations
+            if location.destinationMapId
+        )
+        return cls(
+            default=item.defaultNodeId,
+            nodes=tuple(node.id for node in nodes),
+            locations=tuple(location.id for location in locations),
+            connections={node.id: tuple(node.connections) for node in nodes},
+            destinations=destinations,
+        )
+
+    @property
+    def places(self) -> Tuple[str, ...]:
+        return self.nodes + self.locations
+
+    @property
+    def entry(self) -> Optional[str]:
+        """Where travellers arrive without a target node, as the game resolves it."""
+        if self.default is not None and self.default in self.places:
+            return self.default
+        return self.places[0] if self.places else None
+
+
+@dataclass(frozen=True)
+class _LocalGraph:
+    """The walkable edges inside one map and the problems found within it."""
+
+    edges: Dict[Place, Set[Place]]
+    dangling: Tuple[DanglingReference, ...]
+    asymmetric: Tuple[AsymmetricEdge, ...]
+    #: Places not reachable from the map's entry place.
+    unreachable: Tuple[str, ...]
+
+    @classmethod
+    def of(cls, map_id: str, shape: _MapShape) -> "_LocalGraph":
+        places = set(shape.places)
+        edges: Dict[Place, Set[Place]] = {(map_id, place): set() for place in shape.places}
+        dangling: List[DanglingReference] = []
+        asymmetric: List[AsymmetricEdge] = []
+        if shape.default is not None and shape.default not in places:
+            dangling.append(
+                DanglingReference(mapId=map_id, kind="defaultNode", target=shape.default)
+            )
+        for node, targets in shape.connections.items():
+            for target in targets:
+                if target not in places:
+                    dangling.append(
+                        DanglingReference(
+                            mapId=map_id, nodeId=node, kind="connection", target=target
+                        )
+                    )
+                    continue
+                if node not in shape.connections.get(target, ()):
+                    asymmetric.append(AsymmetricEdge(mapId=map_id, fromNode=node, toNode=target))
+                for a, b in ((node, target), (target, node)):
+                    edges[(map_id, a)].add((map_id, b))
+        for location in shape.locations:
+            edges[(map_id, location)].update(
+                (map_id, other) for other in shape.locations if other != location
+            )
+        unreachable: Tuple[str, ...] = ()
+        if shape.entry is not None:
+            reached = _breadth_first(edges, (map_id, shape.entry))
+            unreachable = tuple(place for place in shape.places if (map_id, place) not in reached)
+        return cls(edges, tuple(dangling), tuple(asymmetric), unreachable)
+
+
+class MapGraphIndex(CollectionIndex):
+    """Graph of all map nodes and locations, joined across maps by portals.
+
+    Node ``connections`` are walkable both ways, as in the game, while
+    every location of a map can be reached from any other. Portal nodes
+    and locations with a destination lead to the destination node or to
+    the destination map's entry place.
+
+    A map's own edges and problems are derived when it is added or
+    replaced. On the next query only the changed maps and the maps with
+    portals into them are rejoined into the adjacency, and only the
+    routing tables that reached one of their places are dropped. Routing
+    tables are built per source place on first use, so a route lookup
+    walks a precomputed predecessor chain.
+    """
+
+    def __init__(self) -> None:
+        self._maps: Dict[str, _MapShape] = {}
+        self._local: Dict[str, _LocalGraph] = {}
+        #: Map id -> ids of the maps with a destination in it.
+        self._referrers: Dict[str, Set[str]] = {}
+        #: Map id -> place id -> resolved destination, ``None`` if dangling.
+        self._portals: Dict[str, Dict[str, Optional[Place]]] = {}
+        self._adjacency: Dict[Place, Set[Place]] = {}
+        #: Map id -> its places currently in the adjacency.
+        self._placed: Dict[str, Tuple[Place, ...]] = {}
+        #: Source -> (place -> predecessor on a shortest path from the source).
+        self._previous: Dict[Place, Dict[Place, Optional[Place]]] = {}
+        #: Maps changed since the adjacency was last brought up to date.
+        self._stale: Set[str] = set()
+        self._report: Optional[MapGraphReport] = None
+
+    def add(self, record_id: str, item: MapMetadata) -> None:
+        shape = self._maps[record_id] = _MapShape.of(item)
+        self._local[record_id] = _LocalGraph.of(record_id, shape)
+        for target_map, _ in shape.destinations.values():
+            self._referrers.setdefault(target_map, set()).add(record_id)
+        self._stale.add(record_id)
+        self._report = None
+
+    def remove(self, record_id: str, item: MapMetadata) -> None:
+        shape = self._maps.pop(record_id, None)
+        if shape is None:
+            return
+        del self._local[record_id]
+        for target_map, _ in shape.destinations.values():
+            referrers = self._referrers.get(target_map)
+            if referrers is not None:
+                referrers.discard(record_id)
+                if not referrers:
+                    del self._referrers[target_map]
+        self._stale.add(record_id)
+        self._report = None
+
+    def __contains__(self, map_id: str) -> bool:
+        return map_id in self._maps
+
+    def entry(self, map_id: str) -> Optional[str]:
+        shape = self._maps.get(map_id)
+        return shape.entry if shape is not None else None
+
+    def report(self) -> MapGraphReport:
+        self._refresh()
+        if self._report is None:
+            dangling = [ref for local in self._local.values() for ref in local.dangling]
+            for map_id, shape in self._maps.items():
+                for place, (target_map, target_node) in shape.destinations.items():
+                    if self._portals[map_id][place] is None:
+                        label = target_map if target_node is None else f"{target_map}/{target_node}"
+                        dangling.append(
+                            DanglingReference(
+                                mapId=map_id, nodeId=place, kind="destination", target=label
+                            )
+                        )
+            self._report = MapGraphReport(
+                dangling=dangling,
+                asymmetric=[edge for local in self._local.values() for edge in local.asymmetric],
+                unreachable={
+                    map_id: list(local.unreachable)
+                    for map_id, local in self._local.items()
+                    if local.unreachable
+                },
+            )
+        return self._report
+
+    def route(self, source: Place, target: Place) -> MapRoute:
+        """Shortest route between two places; ``KeyError`` if either is unknown."""
+        self._refresh()
+        for place in (source, target):
+            if place not in self._adjacency:
+                raise KeyError(place)
+        previous = self._previous.get(source)
+        if previous is None:
+            previous = self._previous[source] = _breadth_first(self._adjacency, source)
+        if target not in previous:
+            return MapRoute(reachable=False)
+        path: List[Place] = []
+        place: Optional[Place] = target
+        while place is not None:
+            path.append(place)
+            place = previous[place]
+        path.reverse()
+        return MapRoute(
+            reachable=True,
+            hops=len(path) - 1,
+            path=[GraphPlace(mapId=map_id, nodeId=node_id) for map_id, node_id in path],
+        )
+
+    def _refresh(self) -> None:
+        """Rejoin the stale maps and the maps with portals into them."""
+        if not self._stale:
+            return
+        affected = set(self._stale)
+        for map_id in self._stale:
+            affected |= self._referrers.get(map_id, set())
+        self._stale.clear()
+        touched: Set[Place] = set()
+        for map_id in affected:
+            for place in self._placed.pop(map_id, ()):
+                self._adjacency.pop(place, None)
+                touched.add(place)
+            self._portals.pop(map_id, None)
+            shape = self._maps.get(map_id)
+            if shape is None:
+                continue
+            for place, neighbours in self._local[map_id].edges.items():
+                self._adjacency[place] = set(neighbours)
+            portals = self._portals[map_id] = {}
+            for place, (target_map, target_node) in shape.destinations.items():
+                target = portals[place] = self._resolve(target_map, target_node)
+                if target is not None:
+                    self._adjacency[(map_id, place)].add(target)
+            self._placed[map_id] = tuple((map_id, place) for place in shape.places)
+            touched.update(self._placed[map_id])
+        # A table that never reached a changed place is still exact
+        self._previous = {
+            source: previous
+            for source, previous in self._previous.items()
+            if not any(place in previous for place in touched)
+        }
+
+    def _resolve(self, map_id: str, node_id: Optional[str]) -> Optional[Place]:
+        shape = self._maps.get(map_id)
+        if shape is None:
+            return None
+        if node_id is None:
+            return (map_id, shape.entry) if shape.entry is not None else None
+        return (map_id, node_id) if node_id in shape.places else None
+
+
+def _breadth_first(
+    adjacency: Dict[Place, Set[Place]], source: Place
+) -> Dict[Place, Optional[Place]]:
+    """Predecessor of every place reachable from ``source`` on a fewest-hop path."""
+    previous: Dict[Place, Optional[Place]] = {source: None}
+    queue = deque([source])
+    while queue:
+        place = queue.popleft()
+        for neighbour in sorted(adjacency[place]):
+            if neighbour not in previous:
+                previous[neighbour] = place
+                queue.append(neighbour)
+    return previous
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -25,15 +25,43 @@ class AssetStatus(BaseModel):
     mp4: bool
 
 
-class ConversionResult(BaseModel):
-    succeeded: bool
-    stdout: Optional[str] = None
-    stderr: Optional[str] = None
+class ConversionJob(BaseModel):
+    id: str
+    kind: str
+    state: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    #: Files the conversion script reported as written so far.
+    steps: int = 0
+    #: Last line of output.
+    message: Optional[str] = None
+    returnCode: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    createdAt: float
+    startedAt: Optional[float] = None
+    finishedAt: Optional[float] = None
 
 
 MonsterList = List[MonsterBlueprint]
 
 
+class MonsterBatch(BaseModel):
+    upserts: List[MonsterBlueprint] = Field(default_factory=list)
+    deletes: List[str] = Field(default_factory=list)
+
+
+# Batch results
+class BatchItemResult(BaseModel):
+    """Outcome of one item in a batch request."""
+    id: str
+    op: Literal["upsert", "delete"]
+    status: Literal["created", "updated", "deleted", "not_found", "aborted"]
+
+
+class BatchResult(BaseModel):
+    applied: bool
+    results: List[BatchItemResult]
+
+
 # Map models
 class Position(BaseModel):
     x: float
@@ -111,6 +139,156 @@ class MapMetadataFile(BaseModel):
 MapList = List[MapMetadata]
 
 
+class MapBatch(BaseModel):
+    upserts: List[MapMetadata] = Field(default_factory=list)
+    deletes: List[str] = Field(default_factory=list)
+
+
+class GraphPlace(BaseModel):
+    """A node or location of a map, as a vertex of the map graph."""
+    mapId: str
+    nodeId: str
+
+
+class DanglingReference(BaseModel):
+    mapId: str
+    nodeId: Optional[str] = None
+    kind: Literal["connection", "destination", "defaultNode"]
+    target: str
+
+
+class AsymmetricEdge(BaseModel):
+    mapId: str
+    fromNode: str
+    toNode: str
+
+
+class MapGraphReport(BaseModel):
+    dangling: List[DanglingReference]
+    asymmetric: List[AsymmetricEdge]
+    #: Map id -> places not reachable within the map from its entry place.
+    unreachable: Dict[str, List[str]]
+
+
+class MapRoute(BaseModel):
+    reachable: bool
+    hops: Optional[int] = None
+    path: List[GraphPlace] = Field(default_factory=list)
+
+
+class SpawnReference(BaseModel):
+    """A map node whose spawn table lists a monster."""
+    mapId: str
+    nodeId: str
+    weight: int
+
+
+class SpawnSample(BaseModel):
+    """Monsters drawn from a node's compiled spawn table."""
+    mapId: str
+    nodeId: str
+    monsters: List[str]
+    #: Monster id -> number of draws.
+    counts: Dict[str, int]
+
+
+class SearchHit(BaseModel):
+    """One result of the unified search."""
+    #: ``monster``, ``equipment``, ``map``, ``node``, ``location`` or ``music``.
+    kind: str
+    id: str
+    label: str
+    #: Map holding a node or location.
+    mapId: Optional[str] = None
+    #: ``exact``, ``prefix``, ``word``, ``substring`` or ``fuzzy``.
+    match: str
+
+
+# Economy simulation
+class Distribution(BaseModel):
+    """Summary of a simulated per-hour quantity across trials."""
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+
+
+class NodeEconomy(BaseModel):
+    mapId: str
+    nodeId: str
+    killsPerHour: Distribution
+    goldPerHour: Distribution
+    coreDropsPerHour: Distribution
+    #: Monster id -> mean kills per hour.
+    encounters: Dict[str, float]
+
+
+class MapEconomy(BaseModel):
+    """Pooled over the map's battle nodes, i.e. a player at a random node."""
+    mapId: str
+    nodes: int
+    killsPerHour: Distribution
+    goldPerHour: Distribution
+    coreDropsPerHour: Distribution
+
+
+class EconomyReport(BaseModel):
+    trials: int
+    dps: float
+    engageSeconds: float
+    seed: int
+    nodes: List[NodeEconomy]
+    maps: List[MapEconomy]
+    #: Spawn table entries naming monsters without a blueprint.
+    missingMonsters: List[str]
+
+
+# Analytics
+class AnalyticsColumn(BaseModel):
+    name: str
+    #: ``"number"`` or ``"category"``.
+    kind: str
+
+
+class AnalyticsDataset(BaseModel):
+    name: str
+    rows: int
+    columns: List[AnalyticsColumn]
+
+
+class AnalyticsGroup(BaseModel):
+    """Aggregates of the metric over the rows sharing one group key."""
+    key: Dict[str, Any]
+    count: int
+    mean: float
+    min: float
+    max: float
+    #: Percentile (as given in the request) -> value.
+    percentiles: Dict[str, float]
+    #: Row counts per bin of the report's ``binEdges``.
+    histogram: List[int]
+
+
+class AnalyticsOutlier(BaseModel):
+    """A row outside its group's Tukey fences."""
+    id: str
+    key: Dict[str, Any]
+    value: float
+    low: float
+    high: float
+
+
+class AnalyticsReport(BaseModel):
+    dataset: str
+    metric: str
+    groupBy: List[str]
+    #: Rows without a value for the metric, left out of every aggregate.
+    missing: int
+    binEdges: List[float]
+    groups: List[AnalyticsGroup]
+    outliers: List[AnalyticsOutlier]
+
+
 # Equipment models
 class EquipmentStat(BaseModel):
     """Equipment stat (main or sub)."""
@@ -159,3 +337,37 @@ class EquipmentItem(BaseModel):
 
 
 EquipmentList = List[EquipmentItem]
+
+
+class EquipmentBatch(BaseModel):
+    upserts: List[EquipmentItem] = Field(default_factory=list)
+    deletes: List[str] = Field(default_factory=list)
+
+
+class ScoredEquipment(BaseModel):
+    score: float
+    item: EquipmentItem
+
+
+class SlotRanking(BaseModel):
+    """Best-scoring equipment of one slot, highest score first."""
+    slot: str
+    items: List[ScoredEquipment]
+
+
+class MaterialRollup(BaseModel):
+    """Enhancement materials needed to take items from ``+from_level`` to ``+to_level``."""
+    from_level: int
+    to_level: int
+    item_count: int
+    #: Material id -> total quantity.
+    materials: Dict[str, int]
+    #: Equipment id -> its own materials, for items that need any.
+    per_item: Optional[Dict[str, Dict[str, int]]] = None
+
+
+class EquipmentReference(BaseModel):
+    """An equipment item that consumes another as an enhancement material."""
+    equipment_id: str
+    target_level: Optional[int] = None
+    quantity: Optional[int] = None
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Optional, Sequence, Set
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key: Any) -> str:
+    """Encode a collection order key as an opaque URL-safe cursor."""
+    raw = json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _as_tuple(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_as_tuple(element) for element in value)
+    return value
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = _as_tuple(json.loads(raw))
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+    if not isinstance(key, tuple) or len(key) != 2 or not isinstance(key[1], str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Turn ``"id,name,bp"`` into a field set; ``None`` or blank selects everything."""
+    if fields is None:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    return selected or None
+
+
+def list_response(
+    response: Response,
+    items: Sequence[BaseModel],
+    next_cursor: Optional[str],
+    fields: Optional[str],
+    etag: Optional[str] = None,
+) -> Any:
+    """Build a list endpoint response.
+
+    Without a projection the models are returned for the route's
+    ``response_model``; with ``fields`` only the selected keys are dumped
+    and sent directly, skipping response-model validation. The next page
+    cursor travels in the ``X-Next-Cursor`` header.
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    if etag is not None:
+        headers["ETag"] = etag
+    selected = parse_fields(fields)
+    if selected is None:
+        response.headers.update(headers)
+        return list(items)
+    content = [item.model_dump(mode="json", include=selected) for item in items]
+    return JSONResponse(content=content, headers=headers)
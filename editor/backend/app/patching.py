@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Callable, Dict, List, Optional
+
+MERGE_PATCH_TYPE = "application/merge-patch+json"
+JSON_PATCH_TYPE = "application/json-patch+json"
+
+_MISSING = object()
+
+
+class PatchError(ValueError):
+    """A patch document is malformed or cannot be applied to its target."""
+
+
+class PatchConflict(PatchError):
+    """A JSON Patch ``test`` operation did not hold."""
+
+
+def patch_status(exc: PatchError) -> int:
+    """HTTP status for a rejected patch: 409 for a failed test, otherwise 400."""
+    return 409 if isinstance(exc, PatchConflict) else 400
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """Apply an RFC 7396 merge patch; ``target`` is not modified."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def _parse_pointer(pointer: Any) -> List[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    if not pointer:
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: List[Any], token: str, pointer: str, append: bool = False) -> int:
+    if append and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index in {pointer}")
+    position = int(token)
+    if position > len(container) or (position == len(container) and not append):
+        raise PatchError(f"Array index out of range in {pointer}")
+    return position
+
+
+def _resolve(document: Any, tokens: List[str], pointer: str) -> Any:
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise PatchError(f"Path not found: {pointer}")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_index(document, token, pointer)]
+        else:
+            raise PatchError(f"Path not found: {pointer}")
+    return document
+
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1], pointer)
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], pointer, append=True), value)
+    else:
+        raise PatchError(f"Path not found: {pointer}")
+    return document
+
+
+def _remove(document: Any, pointer: str) -> Any:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    parent = _resolve(document, tokens[:-1], pointer)
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise PatchError(f"Path not found: {pointer}")
+        return parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, tokens[-1], pointer))
+    raise PatchError(f"Path not found: {pointer}")
+
+
+def _operand(operation: Dict[str, Any], name: str) -> Any:
+    value = operation.get(name, _MISSING)
+    if value is _MISSING:
+        raise PatchError(f"Operation {operation.get('op')!r} requires {name!r}")
+    return value
+
+
+def apply_json_patch(target: Any, operations: Any) -> Any:
+    """Apply an RFC 6902 JSON Patch; ``target`` is not modified.
+
+    Raises :class:`PatchConflict` when a ``test`` fails and
+    :class:`PatchError` for any other invalid operation.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("A JSON Patch document must be an array of operations")
+    document = copy.deepcopy(target)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise PatchError("Each JSON Patch operation must be an object")
+        op = operation.get("op")
+        path = _operand(operation, "path")
+        if op == "add":
+            document = _add(document, path, copy.deepcopy(_operand(operation, "value")))
+        elif op == "remove":
+            _remove(document, path)
+        elif op == "replace":
+            value = copy.deepcopy(_operand(operation, "value"))
+            if _parse_pointer(path):
+                _remove(document, path)
+            document = _add(document, path, value)
+        elif op in ("move", "copy"):
+            source = _operand(operation, "from")
+            if op == "move" and (path == source or path.startswith(source + "/")):
+                if path != source:
+                    raise PatchError(f"Cannot move {source} into itself")
+                continue
+            if op == "move":
+                value = _remove(document, source)
+            else:
+                value = copy.deepcopy(_resolve(document, _parse_pointer(source), source))
+            document = _add(document, path, value)
+        elif op == "test":
+            expected = _operand(operation, "value")
+            if _resolve(document, _parse_pointer(path), path) != expected:
+                raise PatchConflict(f"Test failed at {path or '/'}")
+        else:
+            raise PatchError(f"Unsupported JSON Patch operation: {op!r}")
+    return document
+
+
+def patcher(patch: Any, content_type: Optional[str]) -> Callable[[Any], Any]:
+    """Return a function applying ``patch`` in the format named by ``content_type``.
+
+    ``application/json-patch+json`` bodies, and arrays sent as plain JSON,
+    are JSON Patch documents; anything else is a merge patch.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == JSON_PATCH_TYPE or (
+        media_type != MERGE_PATCH_TYPE and isinstance(patch, list)
+    ):
+        return lambda target: apply_json_patch(target, patch)
+    if not isinstance(patch, dict):
+        raise PatchError("A merge patch for a record must be an object")
+    return lambda target: apply_merge_patch(target, patch)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import gzip
+import threading
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Request, Response
+
+from .conditional import variant_etag
+
+try:  # Brotli is optional; without it clients are offered gzip only.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+#: Bodies smaller than this are always sent uncompressed.
+MIN_COMPRESS_BYTES = 1024
+
+_ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=9, mtime=0),
+}
+if brotli is not None:
+    _ENCODERS["br"] = lambda body: brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+
+#: Server preference when the client accepts several encodings equally.
+_PREFERENCE = ["br", "gzip"]
+
+
+class EncodedPayload:
+    """A serialized response body and its compressed variants.
+
+    Payloads are built once per data version, so compression runs at the
+    highest level and each variant is produced on first request only.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.media_type = media_type
+        self._variants: Dict[str, bytes] = {"identity": body}
+        self._lock = threading.Lock()
+
+    @property
+    def body(self) -> bytes:
+        return self._variants["identity"]
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            variant = self._variants.get(encoding)
+            if variant is None:
+                variant = self._variants[encoding] = _ENCODERS[encoding](self.body)
+            return variant
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        accepted[coding.strip().lower()] = weight
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str], available: Optional[List[str]] = None) -> str:
+    """Pick the best of ``available`` encodings for an ``Accept-Encoding`` header."""
+    if not header:
+        return "identity"
+    accepted = _accepted(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_weight = "identity", 0.0
+    for encoding in available if available is not None else _PREFERENCE:
+        if encoding not in _ENCODERS:
+            continue
+        weight = accepted.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def payload_encoding(request: Request, payload: EncodedPayload) -> str:
+    """The encoding :func:`payload_response` sends ``payload`` in for ``request``."""
+    if len(payload.body) < MIN_COMPRESS_BYTES:
+        return "identity"
+    return negotiate_encoding(request.headers.get("accept-encoding"))
+
+
+def payload_response(
+    request: Request, payload: EncodedPayload, etag: Optional[str] = None
+) -> Response:
+    """Send ``payload`` as is, in the encoding negotiated from ``Accept-Encoding``.
+
+    The bytes bypass response-model validation and JSON encoding.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = payload_encoding(request, payload)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    if etag is not None:
+        headers["ETag"] = variant_etag(etag, encoding)
+    return Response(
+        content=payload.encoded(encoding), media_type=payload.media_type, headers=headers
+    )
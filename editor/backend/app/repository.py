@@ -1,54 +1,348 @@
 from __future__ import annotations
 
-import json
+import functools
+import random
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, Type
 
-from .models import MonsterBlueprint, MonsterList, EquipmentItem, EquipmentList
+from pydantic import BaseModel, TypeAdapter
+
+from .best_in_slot import ScoreIndex, ScoreWeights
+from .cache import ModelT, RecordCollection, collection_cache
+from .conditional import make_etag
+from .enhance_costs import MAX_ENHANCE_LEVEL, EnhanceCostIndex
+from .config import Settings
+from .indexes import (
+    ChangeFeed,
+    CollectionIndex,
+    HashIndex,
+    ReferenceIndex,
+    SortedIndex,
+    TrigramIndex,
+)
+from .journal import JournalOptions
+from .map_graph import MapGraphIndex
+from .models import (
+    BatchItemResult,
+    EquipmentItem,
+    EquipmentList,
+    EquipmentReference,
+    MapGraphReport,
+    MapLocation,
+    MapMetadata,
+    MapNode,
+    MapRoute,
+    MaterialRollup,
+    MonsterBlueprint,
+    ScoredEquipment,
+    SlotRanking,
+    SpawnReference,
+)
+from .pagination import decode_cursor, encode_cursor
+from .patching import PatchError
+from .payloads import EncodedPayload
+from .sharded_storage import ShardedJsonStorage
+from .spawn_tables import (
+    SPAWN_TABLES_NAME,
+    CompiledSpawn,
+    SpawnTableIndex,
+    dumps_spawn_tables,
+)
+from .sqlite_storage import SqliteStorage, get_sqlite_storage
+from .storage import JsonDocument, JsonStorage, RecordStorage
+from .writer import (
+    Delete,
+    GroupCommitWriter,
+    Mutation,
+    Patch,
+    Upsert,
+    get_writer,
+    write_atomic,
+)
+
+
+class BatchError(Exception):
+    """Raised when a batch is rejected; ``results`` reports every item."""
+
+    def __init__(self, results: List[BatchItemResult]):
+        super().__init__("Batch was not applied")
+        self.results = results
+
+
+@functools.lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+class MemberNotFound(KeyError):
+    """Raised when a map has no node or location with the requested id."""
 
 
 def _sort_key(monster: Dict[str, Any]) -> tuple[int, str]:
     return (int(monster.get("bp", 0)), monster.get("id", ""))
 
 
-class MonsterRepository:
-    """Handles persistence of monster blueprints."""
+class _Repository(Generic[ModelT]):
+    """Shared persistence for collections of records keyed by ``id``.
+
+    Parsed records are served from the process-wide collection cache, which
+    is revalidated against the storage signature on every access and
+    updated in place by this repository's writes. Writes go through the
+    collection's group-commit writer so concurrent requests never lose
+    updates.
+
+    ``storage`` defaults to the canonical JSON file ``data_file``; with
+    ``journal`` options the writer appends mutations to a sidecar
+    ``<file>.journal`` instead of rewriting the file. Other backends keep
+    ``data_file`` as the target of :meth:`export_json`.
+    """
 
-    def __init__(self, data_file: Path):
+    model: Type[ModelT]
+    sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None
+    document = JsonDocument(indent=2)
+    exclude_none = False
+    #: Settings attribute holding the canonical JSON file.
+    settings_field = "data_file"
+    #: SQLite table and indexed columns (column name -> record key).
+    table: str
+    indexed_fields: Dict[str, str] = {}
+    journaled = False
+    #: In-memory indexes attached to every loaded collection (name -> factory).
+    indexes: Dict[str, Callable[[], CollectionIndex]] = {}
+
+    def __init__(
+        self,
+        data_file: Path,
+        journal: Optional[JournalOptions] = None,
+        storage: Optional[RecordStorage] = None,
+    ):
         self.data_file = data_file
-        self.data_file.parent.mkdir(parents=True, exist_ok=True)
-
-    def _load_raw(self) -> List[Dict[str, Any]]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as fp:
-            return json.load(fp)
-
-    def _save_raw(self, monsters: List[Dict[str, Any]]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as fp:
-            json.dump(monsters, fp, ensure_ascii=False, indent=2)
-            fp.write("\n")
-
-    def list(self) -> MonsterList:
-        records = sorted(self._load_raw(), key=_sort_key)
-        return [MonsterBlueprint(**record) for record in records]
-
-    def upsert(self, monster: MonsterBlueprint) -> MonsterBlueprint:
-        records = self._load_raw()
-        mapping = {record["id"]: record for record in records}
-        payload = monster.model_dump()
-        mapping[monster.id] = payload
-        ordered = sorted(mapping.values(), key=_sort_key)
-        self._save_raw(ordered)
-        return MonsterBlueprint(**payload)
-
-    def delete(self, monster_id: str) -> None:
-        records = self._load_raw()
-        if not any(record["id"] == monster_id for record in records):
-            raise KeyError(monster_id)
-        remaining = [record for record in records if record["id"] != monster_id]
-        ordered = sorted(remaining, key=_sort_key)
-        self._save_raw(ordered)
+        if storage is None:
+            storage = JsonStorage(data_file, self.document, journal, compact=self.compact)
+        self.storage = storage
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "_Repository[ModelT]":
+        """Build the repository on the storage backend selected in ``settings``."""
+        data_file = getattr(settings, cls.settings_field)
+        if settings.storage_backend == "sqlite":
+            document = cls.document
+            on_commit = None
+            if settings.export_on_commit:
+                on_commit = lambda collection: write_atomic(data_file, document.dumps(collection))
+            key = (settings.sqlite_file, cls.table, data_file, settings.export_on_commit)
+            storage = get_sqlite_storage(
+                key,
+                lambda: SqliteStorage(
+                    settings.sqlite_file,
+                    cls.table,
+                    cls.indexed_fields,
+                    seed=JsonStorage(data_file, document),
+                    on_commit=on_commit,
+                ),
+            )
+            return cls(data_file, storage=storage)
+        journal = JournalOptions.from_settings(settings) if cls.journaled else None
+        return cls(data_file, journal=journal)
+
+    def _build_collection(self) -> RecordCollection[ModelT]:
+        records, meta = self.storage.load()
+        sort_key = type(self).sort_key
+        collection = RecordCollection(self.model, records, sort_key=sort_key, meta=meta)
+        for name, factory in self.indexes.items():
+            collection.add_index(name, factory())
+        return collection
+
+    def _collection(self) -> RecordCollection[ModelT]:
+        return collection_cache.get(
+            self.storage.key, self._build_collection, self.storage.signature
+        )
+
+    def collection(self) -> RecordCollection[ModelT]:
+        """The cached collection, for read-only use under its lock."""
+        return self._collection()
+
+    def _dump(self, item: ModelT) -> Dict[str, Any]:
+        return item.model_dump(exclude_none=self.exclude_none)
+
+    def _persist(self, collection: RecordCollection[ModelT], mutations: List[Mutation]) -> None:
+        self.storage.persist(collection, mutations)
+        collection_cache.commit(self.storage.key, collection, self.storage.signature)
+
+    def _writer(self) -> GroupCommitWriter:
+        return get_writer(
+            self.storage.key,
+            lambda: GroupCommitWriter(
+                load=self._collection,
+                persist=self._persist,
+                invalidate=lambda: collection_cache.invalidate(self.storage.key),
+            ),
+        )
+
+    def compact(self) -> None:
+        """Bring the storage fully in line with the current records.
+
+        For JSON storage this folds pending journal entries into the
+        canonical data file.
+        """
+        with self._writer().commit_lock:
+            collection = self._collection()
+            with collection.lock:
+                try:
+                    self.storage.rewrite(collection)
+                except BaseException:
+                    collection_cache.invalidate(self.storage.key)
+                    raise
+                collection_cache.commit(self.storage.key, collection, self.storage.signature)
+
+    def export_json(self) -> Path:
+        """Regenerate the canonical JSON file from the current records."""
+        if isinstance(self.storage, JsonStorage):
+            self.compact()
+            return self.data_file
+        with self._writer().commit_lock:
+            collection = self._collection()
+            with collection.lock:
+                write_atomic(self.data_file, self.document.dumps(collection))
+        return self.data_file
+
+    def etag(self) -> str:
+        """Strong ETag for the stored records, computed without loading them."""
+        return make_etag(self.storage.key, self.storage.signature())
+
+    def list(self) -> List[ModelT]:
+        return self._collection().items()
+
+    def payload(self) -> EncodedPayload:
+        """The full list as ready-made JSON bytes, rebuilt only when records change."""
+        return self._collection().derived("payload", self._encode_list)
+
+    def derived(self, name: str, build: Callable[[List[ModelT]], Any]) -> Any:
+        """``build(items)``, memoized until the records change."""
+        return self._collection().derived(name, lambda collection: build(collection.items()))
+
+    def _encode_list(self, collection: RecordCollection[ModelT]) -> EncodedPayload:
+        return EncodedPayload(_list_adapter(self.model).dump_json(collection.items()))
+
+    def get(self, record_id: str) -> ModelT:
+        collection = collection_cache.peek(self.storage.key, self.storage.signature)
+        if collection is None and self.storage.supports_fetch:
+            record = self.storage.fetch(record_id)
+            if record is None:
+                raise KeyError(record_id)
+            return self.model(**record)
+        return (collection or self._collection()).get(record_id)
+
+    def page(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        items: Optional[List[ModelT]] = None,
+    ) -> Tuple[List[ModelT], Optional[str]]:
+        """Return up to ``limit`` records after ``cursor`` and the next page's cursor.
+
+        Cursors encode the last record's sort key and id (or, for unsorted
+        collections, its position and id), so pages stay stable while
+        records are added or removed elsewhere.
+        ``items`` pages an already filtered list in collection order
+        instead of the whole collection. Raises ``ValueError`` for a
+        malformed cursor.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        collection = self._collection()
+        with collection.lock:
+            if items is None:
+                page, more = collection.page(after, limit)
+            else:
+                keys = collection.order_keys([item.id for item in items])
+                start = collection.seek(keys, after)
+                end = len(items) if limit is None else start + limit
+                page, more = items[start:end], end < len(items)
+            if not (more and page):
+                return page, None
+            return page, encode_cursor(collection.order_keys([page[-1].id])[0])
+
+    def search(self, query: str, limit: Optional[int] = None, prefix: bool = False) -> List[ModelT]:
+        """Rank records whose id or name contains (or, with ``prefix``, starts with) ``query``."""
+        collection = self._collection()
+        with collection.lock:
+            ids = collection.index("search").search(query, limit=limit, prefix=prefix)
+            return [collection.get(record_id) for record_id in ids]
+
+    def upsert(self, item: ModelT) -> ModelT:
+        return self._writer().submit(Upsert(self._dump(item)))
+
+    def delete(self, record_id: str) -> None:
+        self._writer().submit(Delete(record_id))
+
+    def patch(self, record_id: str, apply: Callable[[Dict[str, Any]], Any]) -> ModelT:
+        """Replace a record with ``apply(record)``, read and written in one commit.
+
+        ``apply`` must return a new document rather than modify its
+        argument. Raises ``KeyError`` for an unknown id, :class:`PatchError`
+        if the patch changes the id and ``ValidationError`` if the result
+        is not a valid record.
+        """
+
+        def transform(record: Dict[str, Any], item: ModelT) -> Tuple[Dict[str, Any], ModelT]:
+            patched = apply(record)
+            if not isinstance(patched, dict) or patched.get("id") != record_id:
+                raise PatchError("A patch cannot change the record id")
+            validated = self.model(**patched)
+            return self._dump(validated), validated
+
+        return self._writer().submit(Patch(record_id, transform))
+
+    def apply_batch(self, upserts: List[ModelT], deletes: List[str]) -> List[BatchItemResult]:
+        """Apply ``upserts`` then ``deletes`` in one commit, all or none.
+
+        Raises ``ValueError`` if an id appears more than once and
+        :class:`BatchError` if a delete targets an unknown id.
+        """
+        ops = [("upsert", item.id) for item in upserts] + [("delete", rid) for rid in deletes]
+        counts = Counter(record_id for _, record_id in ops)
+        duplicates = sorted(record_id for record_id, count in counts.items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Batch names these ids more than once: {', '.join(duplicates)}")
+        mutations: List[Mutation] = [Upsert(self._dump(item)) for item in upserts]
+        mutations += [Delete(record_id) for record_id in deletes]
+        try:
+            outcomes = self._writer().submit_all(mutations)
+        except KeyError as exc:
+            missing = exc.args[0]
+            raise BatchError(
+                [
+                    BatchItemResult(
+                        id=record_id,
+                        op=op,
+                        status="not_found" if record_id == missing else "aborted",
+                    )
+                    for op, record_id in ops
+                ]
+            ) from exc
+        results = []
+        for (op, record_id), (_, existed) in zip(ops, outcomes):
+            if op == "delete":
+                status = "deleted"
+            else:
+                status = "updated" if existed else "created"
+            results.append(BatchItemResult(id=record_id, op=op, status=status))
+        return results
+
+
+class MonsterRepository(_Repository[MonsterBlueprint]):
+    """Handles persistence of monster blueprints."""
+
+    model = MonsterBlueprint
+    sort_key = staticmethod(_sort_key)
+    table = "monsters"
+    indexed_fields = {"bp": "bp", "realm_tier": "realmTier"}
+    journaled = True
+    indexes = {
+        "search": lambda: TrigramIndex(lambda item: (item.id, item.name)),
+        "changes": ChangeFeed,
+    }
 
 
 def _equipment_sort_key(equipment: Dict[str, Any]) -> tuple[str, int, str]:
@@ -59,48 +353,362 @@ def _equipment_sort_key(equipment: Dict[str, Any]) -> tuple[str, int, str]:
     return (str(slot_order.get(slot, 999)), tier, equipment.get("id", ""))
 
 
-class EquipmentRepository:
+def _material_refs(item: EquipmentItem) -> Iterable[Tuple[str, EquipmentReference]]:
+    for requirement in item.enhance_materials or []:
+        for material in requirement.materials or []:
+            yield material.id, EquipmentReference(
+                equipment_id=item.id,
+                target_level=requirement.target_level,
+                quantity=material.quantity,
+            )
+
+
+class EquipmentRepository(_Repository[EquipmentItem]):
     """Handles persistence of equipment items."""
-    
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
-        self.data_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    def _load_raw(self) -> List[Dict[str, Any]]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as fp:
-            return json.load(fp)
-    
-    def _save_raw(self, equipment_list: List[Dict[str, Any]]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as fp:
-            json.dump(equipment_list, fp, ensure_ascii=False, indent=4)
-            fp.write("\n")
-    
-    def list(self) -> EquipmentList:
-        records = sorted(self._load_raw(), key=_equipment_sort_key)
-        return [EquipmentItem(**record) for record in records]
-    
-    def get(self, equipment_id: str) -> EquipmentItem:
-        records = self._load_raw()
-        for record in records:
-            if record["id"] == equipment_id:
-                return EquipmentItem(**record)
-        raise KeyError(equipment_id)
-    
-    def upsert(self, equipment: EquipmentItem) -> EquipmentItem:
-        records = self._load_raw()
-        mapping = {record["id"]: record for record in records}
-        payload = equipment.model_dump(exclude_none=True)
-        mapping[equipment.id] = payload
-        ordered = sorted(mapping.values(), key=_equipment_sort_key)
-        self._save_raw(ordered)
-        return EquipmentItem(**payload)
-    
-    def delete(self, equipment_id: str) -> None:
-        records = self._load_raw()
-        if not any(record["id"] == equipment_id for record in records):
-            raise KeyError(equipment_id)
-        remaining = [record for record in records if record["id"] != equipment_id]
-        ordered = sorted(remaining, key=_equipment_sort_key)
-        self._save_raw(ordered)
+
+    model = EquipmentItem
+    sort_key = staticmethod(_equipment_sort_key)
+    document = JsonDocument(indent=4)
+    exclude_none = True
+    settings_field = "equipment_items_file"
+    table = "equipment"
+    indexed_fields = {"slot": "slot", "quality": "base_quality", "tier": "required_tier"}
+    journaled = True
+    indexes = {
+        "slot": lambda: HashIndex(lambda item: item.slot),
+        "quality": lambda: HashIndex(lambda item: item.base_quality),
+        # Items without a (truthy) tier never match a tier filter
+        "tier": lambda: SortedIndex(lambda item: item.required_tier or None),
+        "search": lambda: TrigramIndex(lambda item: (item.id, item.name)),
+        "references": lambda: ReferenceIndex(_material_refs),
+        "scores": ScoreIndex,
+        "enhance_costs": EnhanceCostIndex,
+        "changes": ChangeFeed,
+    }
+
+    def references(self, equipment_id: str) -> List[EquipmentReference]:
+        """Equipment items that use ``equipment_id`` as an enhancement material."""
+        collection = self._collection()
+        with collection.lock:
+            return [detail for _, detail in collection.index("references").get(equipment_id)]
+
+    def enhance_costs(
+        self,
+        from_level: int = 0,
+        to_level: int = MAX_ENHANCE_LEVEL,
+        item_ids: Optional[List[str]] = None,
+        per_item: bool = False,
+        **filters: Any,
+    ) -> MaterialRollup:
+        """Enhancement materials to take ``item_ids`` (default: all items) between levels.
+
+        ``filters`` are those of :meth:`filter` and narrow the items further;
+        they are matched under the same lock as the rollup, so items deleted
+        concurrently cannot slip in between. Raises ``ValueError`` for an
+        invalid level range and ``KeyError`` for an unknown item id.
+        """
+        if not 0 <= from_level <= to_level <= MAX_ENHANCE_LEVEL:
+            raise ValueError(
+                f"Levels must satisfy 0 <= from_level <= to_level <= {MAX_ENHANCE_LEVEL}"
+            )
+        collection = self._collection()
+        with collection.lock:
+            costs = collection.index("enhance_costs")
+            for record_id in item_ids or ():
+                if record_id not in collection:
+                    raise KeyError(record_id)
+            matching = self._matching(collection, **filters)
+            if matching is not None:
+                if item_ids is not None:
+                    wanted = set(item_ids)
+                    matching = [record_id for record_id in matching if record_id in wanted]
+                item_ids = [item.id for item in collection.in_order(matching)]
+            ids = collection.ids() if item_ids is None else item_ids
+            rollup = MaterialRollup(
+                from_level=from_level,
+                to_level=to_level,
+                item_count=len(ids),
+                materials=costs.total(item_ids, from_level, to_level),
+            )
+            if per_item:
+                rollup.per_item = {
+                    record_id: cost
+                    for record_id in ids
+                    if (cost := costs.cost(record_id, from_level, to_level))
+                }
+            return rollup
+
+    def best_in_slot(
+        self,
+        k: int,
+        weights: ScoreWeights = ScoreWeights(),
+        tier: Optional[int] = None,
+        max_quality: Optional[int] = None,
+        slot: Optional[str] = None,
+    ) -> List[SlotRanking]:
+        """Top ``k`` items of every slot (or just ``slot``) by :class:`ScoreWeights`.
+
+        See :meth:`ScoreIndex.top` for the tier and quality limits;
+        ``max_quality`` is a rank from :func:`quality_rank`.
+        """
+        collection = self._collection()
+        with collection.lock:
+            scores = collection.index("scores")
+            rankings = []
+            for name in [slot] if slot else scores.slots():
+                best = scores.top(name, k, weights, tier=tier, max_quality=max_quality)
+                rankings.append(
+                    SlotRanking(
+                        slot=name,
+                        items=[
+                            ScoredEquipment(score=score, item=collection.get(record_id))
+                            for score, record_id in best
+                        ],
+                    )
+                )
+            return rankings
+
+    def filter(
+        self,
+        slot: Optional[str] = None,
+        quality: Optional[str] = None,
+        tier_min: Optional[int] = None,
+        tier_max: Optional[int] = None,
+        search: Optional[str] = None,
+    ) -> EquipmentList:
+        """List equipment matching every given filter, in catalogue order.
+
+        The smallest candidate set among the slot, quality, tier and search
+        indexes is materialised first and the remaining filters are checked per
+        candidate, so the cost follows the result size rather than the
+        catalogue size.
+        """
+        collection = self._collection()
+        with collection.lock:
+            matches = self._matching(
+                collection,
+                slot=slot,
+                quality=quality,
+                tier_min=tier_min,
+                tier_max=tier_max,
+                search=search,
+            )
+            if matches is None:
+                return collection.items()
+            return collection.in_order(matches)
+
+    @staticmethod
+    def _matching(
+        collection: RecordCollection[EquipmentItem],
+        slot: Optional[str] = None,
+        quality: Optional[str] = None,
+        tier_min: Optional[int] = None,
+        tier_max: Optional[int] = None,
+        search: Optional[str] = None,
+    ) -> Optional[List[str]]:
+        """Ids of the items matching the :meth:`filter` arguments, ``None`` if none are set.
+
+        The caller must hold ``collection.lock``.
+        """
+        slot_index = collection.index("slot")
+        quality_index = collection.index("quality")
+        tier_index = collection.index("tier")
+        candidates: List[Tuple[int, Callable[[], Iterable[str]]]] = []
+        checks: List[Callable[[EquipmentItem], bool]] = []
+        if slot:
+            candidates.append((slot_index.count(slot), lambda: slot_index.get(slot)))
+            checks.append(lambda item: item.slot == slot)
+        if quality:
+            candidates.append((quality_index.count(quality), lambda: quality_index.get(quality)))
+            checks.append(lambda item: item.base_quality == quality)
+        if tier_min is not None or tier_max is not None:
+            candidates.append(
+                (
+                    tier_index.count_range(tier_min, tier_max),
+                    lambda: tier_index.range(tier_min, tier_max),
+                )
+            )
+            checks.append(lambda item: tier_index.contains(item, tier_min, tier_max))
+        if search:
+            found = collection.index("search").matches(search)
+            candidates.append((len(found), lambda: found))
+            checks.append(lambda item: item.id in found)
+
+        if not candidates:
+            return None
+        candidates.sort(key=lambda candidate: candidate[0])
+        ids = candidates[0][1]()
+        return [
+            record_id
+            for record_id in ids
+            if all(check(collection.get(record_id)) for check in checks)
+        ]
+
+
+class MapDocument(JsonDocument):
+    """``map-metadata.json`` wraps the maps with the default map id."""
+
+    def empty(self) -> Any:
+        return {"defaultMapId": "florence", "maps": []}
+
+    def parse(self, data: Any) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        return data.get("maps", []), {"defaultMapId": data["defaultMapId"]}
+
+    def build(self, collection: RecordCollection) -> Any:
+        return {
+            "defaultMapId": collection.meta["defaultMapId"],
+            "maps": [item.model_dump(exclude_none=False) for item in collection.items()],
+        }
+
+
+def _spawn_refs(item: MapMetadata) -> Iterable[Tuple[str, SpawnReference]]:
+    for node in item.nodes or []:
+        if node.spawn is None:
+            continue
+        for spawn in node.spawn.monsters:
+            yield spawn.id, SpawnReference(mapId=item.id, nodeId=node.id, weight=spawn.weight)
+
+
+class MapRepository(_Repository[MapMetadata]):
+    """Handles persistence of map metadata."""
+
+    model = MapMetadata
+    document = MapDocument(indent=2)
+    settings_field = "map_metadata_file"
+    table = "maps"
+    indexes = {
+        "graph": MapGraphIndex,
+        "spawns": lambda: ReferenceIndex(_spawn_refs),
+        "spawn_tables": SpawnTableIndex,
+        "changes": ChangeFeed,
+    }
+    #: Per-map lists whose entries can be patched on their own (field -> model).
+    members: Dict[str, Type[BaseModel]] = {"nodes": MapNode, "locations": MapLocation}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "MapRepository":
+        """Like :meth:`_Repository.from_settings`, plus the per-map sharded layout.
+
+        With ``map_layout="sharded"`` (and JSON storage) every map lives in
+        its own file under ``map_shards_dir``; ``map-metadata.json`` is then
+        only produced by :meth:`export_json`.
+        """
+        if settings.storage_backend == "sqlite" or settings.map_layout != "sharded":
+            return super().from_settings(settings)
+        data_file = settings.map_metadata_file
+        document = cls.document
+        on_commit = None
+        if settings.export_on_commit:
+            on_commit = lambda collection: write_atomic(data_file, document.dumps(collection))
+        storage = ShardedJsonStorage(
+            settings.map_shards_dir,
+            indent=document.indent,
+            seed=JsonStorage(data_file, document),
+            on_commit=on_commit,
+        )
+        return cls(data_file, storage=storage)
+
+    def spawn_references(self, monster_id: str) -> List[SpawnReference]:
+        """Map nodes whose spawn tables list ``monster_id``."""
+        collection = self._collection()
+        with collection.lock:
+            return [detail for _, detail in collection.index("spawns").get(monster_id)]
+
+    def is_spawned(self, monster_id: str) -> bool:
+        """Whether any map spawns ``monster_id``; a single index lookup."""
+        return self._collection().index("spawns").count(monster_id) > 0
+
+    def spawn_table(self, map_id: str, node_id: str) -> CompiledSpawn:
+        """The compiled spawn table of a battle node.
+
+        Raises ``KeyError`` for an unknown map and :class:`MemberNotFound`
+        for a node that does not exist or has no spawn config.
+        """
+        collection = self._collection()
+        with collection.lock:
+            if map_id not in collection:
+                raise KeyError(map_id)
+            spawn = collection.index("spawn_tables").get(map_id, node_id)
+        if spawn is None:
+            raise MemberNotFound(node_id)
+        return spawn
+
+    def sample_spawns(
+        self, map_id: str, node_id: str, count: int, seed: Optional[int] = None
+    ) -> List[str]:
+        """Draw ``count`` monster ids from a node's spawn weights."""
+        return self.spawn_table(map_id, node_id).sample(count, random.Random(seed))
+
+    @property
+    def spawn_tables_file(self) -> Path:
+        return self.data_file.with_name(SPAWN_TABLES_NAME)
+
+    def export_spawn_tables(self) -> Path:
+        """Write the compiled spawn tables of all maps next to the map data file."""
+        collection = self._collection()
+        with collection.lock:
+            document = collection.index("spawn_tables").document(collection.ids())
+        write_atomic(self.spawn_tables_file, dumps_spawn_tables(document))
+        return self.spawn_tables_file
+
+    def graph_report(self) -> MapGraphReport:
+        """Dangling references, one-way connections and unreachable places."""
+        collection = self._collection()
+        with collection.lock:
+            return collection.index("graph").report()
+
+    def route(
+        self,
+        from_map: str,
+        to_map: str,
+        from_node: Optional[str] = None,
+        to_node: Optional[str] = None,
+    ) -> MapRoute:
+        """Fewest-hop route between two places, across portals.
+
+        A missing node id stands for the map's entry place. Raises
+        ``KeyError(map_id)`` for an unknown map and ``KeyError((map_id,
+        node_id))`` for a place that does not exist.
+        """
+        collection = self._collection()
+        with collection.lock:
+            graph = collection.index("graph")
+            for map_id in (from_map, to_map):
+                if map_id not in graph:
+                    raise KeyError(map_id)
+            source = (from_map, from_node or graph.entry(from_map))
+            target = (to_map, to_node or graph.entry(to_map))
+            return graph.route(source, target)
+
+    def patch_member(
+        self, map_id: str, field: str, member_id: str, apply: Callable[[Dict[str, Any]], Any]
+    ) -> BaseModel:
+        """Patch one node or location of a map, validating only that entry.
+
+        Raises ``KeyError`` for an unknown map and :class:`MemberNotFound`
+        for an unknown entry; see :meth:`patch` for the other errors.
+        """
+        member_model = self.members[field]
+
+        def transform(
+            record: Dict[str, Any], item: MapMetadata
+        ) -> Tuple[Dict[str, Any], MapMetadata]:
+            entries = record.get(field) or []
+            position = next(
+                (index for index, entry in enumerate(entries) if entry.get("id") == member_id),
+                None,
+            )
+            if position is None:
+                raise MemberNotFound(member_id)
+            patched = apply(entries[position])
+            if not isinstance(patched, dict) or patched.get("id") != member_id:
+                raise PatchError(f"A patch cannot change the {field[:-1]} id")
+            member = member_model(**patched)
+            updated = list(entries)
+            updated[position] = member.model_dump(exclude_none=self.exclude_none)
+            models = list(getattr(item, field))
+            models[position] = member
+            return {**record, field: updated}, item.model_copy(update={field: models})
+
+        updated_map = self._writer().submit(Patch(map_id, transform))
+        return next(entry for entry in getattr(updated_map, field) if entry.id == member_id)
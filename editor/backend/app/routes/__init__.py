@@ -2,5 +2,20 @@ from .monsters import router as monsters_router
 from .maps import router as maps_router
 from .music import router as music_router
 from .equipment import router as equipment_router
+from .storage import router as storage_router
+from .simulation import router as simulation_router
+from .analytics import router as analytics_router
+from .search import router as search_router
+from .jobs import router as jobs_router
 
-__all__ = ["monsters_router", "maps_router", "music_router", "equipment_router"]
+__all__ = [
+    "monsters_router",
+    "maps_router",
+    "music_router",
+    "equipment_router",
+    "storage_router",
+    "simulation_router",
+    "analytics_router",
+    "search_router",
+    "jobs_router",
+]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ..analytics import (
+    DEFAULT_BINS,
+    DEFAULT_FENCE,
+    AnalyticsUnavailable,
+    aggregate,
+    describe,
+    snapshot,
+)
+from ..config import Settings, get_settings
+from ..models import AnalyticsDataset, AnalyticsReport
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+@router.get("", response_model=List[AnalyticsDataset])
+def list_datasets(settings: Settings = Depends(get_settings)) -> List[AnalyticsDataset]:
+    """Datasets available for analytics, with their columns."""
+    try:
+        return describe(settings)
+    except AnalyticsUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+
+
+@router.get("/{dataset}", response_model=AnalyticsReport)
+def get_aggregates(
+    dataset: str,
+    metric: str,
+    group_by: Optional[str] = None,
+    percentiles: str = "10,50,90",
+    bins: int = Query(default=DEFAULT_BINS, ge=1, le=1000),
+    fence: float = Query(default=DEFAULT_FENCE, ge=0),
+    settings: Settings = Depends(get_settings),
+) -> AnalyticsReport:
+    """Per-group statistics, histogram and outliers of ``metric``.
+
+    ``group_by`` and ``percentiles`` are comma-separated, e.g.
+    ``/api/analytics/equipment?metric=base_main.value&group_by=slot,base_quality``.
+    """
+    try:
+        data = snapshot(settings, dataset)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Dataset {dataset} not found"
+        )
+    except AnalyticsUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+    try:
+        cuts = [float(value) for value in _split(percentiles)]
+        return aggregate(data, dataset, metric, _split(group_by), cuts, bins, fence)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
@@ -1,67 +1,183 @@
 from __future__ import annotations
 
 import os
-import subprocess
 from pathlib import Path
-from typing import Optional
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
+from ..assets import asset_directory
+from ..best_in_slot import ScoreWeights, quality_rank
+from ..conditional import etag_matches, not_modified, settle_etag
 from ..config import Settings, get_settings
-from ..models import EquipmentItem, EquipmentList, ConversionResult
-from ..repository import EquipmentRepository
+from ..enhance_costs import MAX_ENHANCE_LEVEL
+from ..file_responses import file_response
+from ..jobs import submit_conversion
+from ..models import (
+    BatchResult,
+    ConversionJob,
+    EquipmentBatch,
+    EquipmentItem,
+    EquipmentList,
+    EquipmentReference,
+    MaterialRollup,
+    SlotRanking,
+)
+from ..pagination import list_response
+from ..patching import PatchError, patch_status, patcher
+from ..payloads import payload_encoding, payload_response
+from ..repository import BatchError, EquipmentRepository
+from ..uploads import StoredUpload, UploadTooLarge, store_upload
 
 router = APIRouter(prefix="/api/equipment", tags=["equipment"])
 
 
 def get_repository(settings: Settings = Depends(get_settings)) -> EquipmentRepository:
-    return EquipmentRepository(settings.equipment_items_file)
+    return EquipmentRepository.from_settings(settings)
 
 
 @router.get("", response_model=EquipmentList)
 def list_equipment(
+    request: Request,
+    response: Response,
     repository: EquipmentRepository = Depends(get_repository),
     slot: Optional[str] = None,
     quality: Optional[str] = None,
     tier_min: Optional[int] = None,
     tier_max: Optional[int] = None,
     search: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ) -> EquipmentList:
-    """List all equipment with optional filters."""
-    items = repository.list()
-    
-    # Apply filters
-    if slot:
-        items = [item for item in items if item.slot == slot]
-    if quality:
-        items = [item for item in items if item.base_quality == quality]
-    if tier_min is not None:
-        items = [item for item in items if item.required_tier and item.required_tier >= tier_min]
-    if tier_max is not None:
-        items = [item for item in items if item.required_tier and item.required_tier <= tier_max]
-    if search:
-        search_lower = search.lower()
-        items = [
-            item for item in items
-            if search_lower in item.id.lower() or search_lower in item.name.lower()
-        ]
-    
-    return items
+    """List all equipment with optional filters, pagination and field projection."""
+    etag = repository.etag()
+    filtered = any(value is not None for value in (slot, quality, tier_min, tier_max, search))
+    if not filtered and cursor is None and limit is None and fields is None:
+        payload = repository.payload()
+        if etag_matches(request, etag):
+            return not_modified(etag, payload_encoding(request, payload))
+        return payload_response(request, payload, settle_etag(etag, repository.etag()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    items = (
+        repository.filter(
+            slot=slot, quality=quality, tier_min=tier_min, tier_max=tier_max, search=search
+        )
+        if filtered
+        else None
+    )
+    try:
+        page, next_cursor = repository.page(cursor, limit, items=items)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    etag = settle_etag(etag, repository.etag())
+    return list_response(response, page, next_cursor, fields, etag=etag)
+
+
+@router.get("/search", response_model=EquipmentList)
+def search_equipment(
+    q: str,
+    limit: Optional[int] = Query(default=None, ge=1),
+    prefix: bool = False,
+    repository: EquipmentRepository = Depends(get_repository),
+) -> EquipmentList:
+    """Search equipment by ID or name, best matches first."""
+    return repository.search(q, limit=limit, prefix=prefix)
+
+
+@router.get("/best-in-slot", response_model=List[SlotRanking])
+def get_best_in_slot(
+    k: int = Query(default=3, ge=1, le=100),
+    tier: Optional[int] = None,
+    max_quality: Optional[str] = None,
+    slot: Optional[str] = None,
+    stat: Optional[str] = None,
+    main: float = 1.0,
+    substats: float = 1.0,
+    flat_cap: float = 0.0,
+    price: float = 0.0,
+    repository: EquipmentRepository = Depends(get_repository),
+) -> List[SlotRanking]:
+    """Top ``k`` items per slot wearable at ``tier``, up to ``max_quality``.
+
+    The score is ``main * base_main.value + substats * sum(substats) +
+    flat_cap * flatCapMultiplier + price * price``; with ``stat`` only that
+    stat type counts. Use a negative ``price`` weight to favour cheap items.
+    """
+    try:
+        quality = quality_rank(max_quality) if max_quality is not None else None
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    weights = ScoreWeights(
+        main=main, substats=substats, flat_cap=flat_cap, price=price, stat=stat
+    )
+    return repository.best_in_slot(k, weights, tier=tier, max_quality=quality, slot=slot)
+
+
+@router.get("/enhance-costs", response_model=MaterialRollup)
+def get_enhance_costs(
+    from_level: int = Query(default=0, ge=0),
+    to_level: int = Query(default=MAX_ENHANCE_LEVEL, ge=0),
+    slot: Optional[str] = None,
+    quality: Optional[str] = None,
+    tier_min: Optional[int] = None,
+    tier_max: Optional[int] = None,
+    search: Optional[str] = None,
+    per_item: bool = False,
+    repository: EquipmentRepository = Depends(get_repository),
+) -> MaterialRollup:
+    """Enhancement materials for the items matching the filters, or the whole catalogue."""
+    try:
+        return repository.enhance_costs(
+            from_level,
+            to_level,
+            per_item=per_item,
+            slot=slot,
+            quality=quality,
+            tier_min=tier_min,
+            tier_max=tier_max,
+            search=search,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
 @router.get("/{equipment_id}", response_model=EquipmentItem)
 def get_equipment(
-    equipment_id: str, repository: EquipmentRepository = Depends(get_repository)
+    equipment_id: str,
+    request: Request,
+    response: Response,
+    repository: EquipmentRepository = Depends(get_repository),
 ) -> EquipmentItem:
     """Get a single equipment item by ID."""
+    etag = repository.etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
     try:
-        return repository.get(equipment_id)
+        equipment = repository.get(equipment_id)
     except KeyError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Equipment {equipment_id} not found"
         )
+    etag = settle_etag(etag, repository.etag())
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return equipment
 
 
 @router.post("", response_model=EquipmentItem, status_code=status.HTTP_201_CREATED)
@@ -72,6 +188,23 @@ def upsert_equipment(
     return repository.upsert(equipment)
 
 
+@router.post("/batch", response_model=BatchResult)
+def apply_equipment_batch(
+    batch: EquipmentBatch, repository: EquipmentRepository = Depends(get_repository)
+) -> BatchResult:
+    """Create, update and delete several equipment items in one commit."""
+    try:
+        results = repository.apply_batch(batch.upserts, batch.deletes)
+    except BatchError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=BatchResult(applied=False, results=exc.results).model_dump(),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return BatchResult(applied=True, results=results)
+
+
 @router.put("/{equipment_id}", response_model=EquipmentItem)
 def update_equipment(
     equipment_id: str,
@@ -87,6 +220,54 @@ def update_equipment(
     return repository.upsert(equipment)
 
 
+@router.get("/{equipment_id}/references", response_model=List[EquipmentReference])
+def get_equipment_references(
+    equipment_id: str, repository: EquipmentRepository = Depends(get_repository)
+) -> List[EquipmentReference]:
+    """Equipment items that consume this one as an enhancement material."""
+    return repository.references(equipment_id)
+
+
+@router.get("/{equipment_id}/enhance-costs", response_model=MaterialRollup)
+def get_equipment_enhance_costs(
+    equipment_id: str,
+    from_level: int = Query(default=0, ge=0),
+    to_level: int = Query(default=MAX_ENHANCE_LEVEL, ge=0),
+    repository: EquipmentRepository = Depends(get_repository),
+) -> MaterialRollup:
+    """Enhancement materials to take one item from ``+from_level`` to ``+to_level``."""
+    try:
+        return repository.enhance_costs(from_level, to_level, [equipment_id])
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Equipment {equipment_id} not found"
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.patch("/{equipment_id}", response_model=EquipmentItem)
+def patch_equipment(
+    equipment_id: str,
+    request: Request,
+    patch: Any = Body(...),
+    repository: EquipmentRepository = Depends(get_repository),
+) -> EquipmentItem:
+    """Apply a JSON Merge Patch (RFC 7396) or JSON Patch (RFC 6902) to an equipment item."""
+    try:
+        apply = patcher(patch, request.headers.get("content-type"))
+        return repository.patch(equipment_id, apply)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Equipment {equipment_id} not found"
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    except PatchError as exc:
+        raise HTTPException(status_code=patch_status(exc), detail=str(exc))
+
+
 @router.delete("/{equipment_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_equipment(
     equipment_id: str, repository: EquipmentRepository = Depends(get_repository)
@@ -105,9 +286,10 @@ def delete_equipment(
 @router.get("/{equipment_id}/image")
 def get_equipment_image(
     equipment_id: str,
+    request: Request,
     settings: Settings = Depends(get_settings),
     repository: EquipmentRepository = Depends(get_repository)
-) -> FileResponse:
+) -> Response:
     """Get equipment image."""
     try:
         equipment = repository.get(equipment_id)
@@ -125,13 +307,22 @@ def get_equipment_image(
     if not image_path.exists() and equipment.artwork:
         image_path = settings.assets_dir / equipment.artwork
     
-    if not image_path.exists():
+    try:
+        return file_response(request, image_path, max_age=settings.image_max_age)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Image file not found for equipment {equipment_id}"
         )
-    
-    return FileResponse(image_path)
+
+
+async def _store_image(file: UploadFile, path: Path, settings: Settings) -> StoredUpload:
+    """Stream an uploaded image to ``path``; ``413`` past the upload size limit."""
+    try:
+        with asset_directory(path.parent).track_write(path):
+            return await store_upload(file, path, settings.upload_max_bytes)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
 
 
 @router.post("/{equipment_id}/image/png")
@@ -158,24 +349,16 @@ async def upload_equipment_png(
             detail=f"Equipment {equipment_id} not found"
         )
     
-    # Create raw directory if it doesn't exist (save directly to raw assets root)
-    raw_dir = settings.raw_assets_dir
-    raw_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Save the file with eq- prefix
+    # Save the file with eq- prefix (directly to raw assets root)
     filename = f"eq-{equipment_id}.png"
-    file_path = raw_dir / filename
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    stored = await _store_image(file, settings.raw_assets_dir / filename, settings)
     
     # Auto-populate artwork field with corresponding webp filename
     webp_filename = f"eq-{equipment_id}.webp"
     if equipment.artwork != webp_filename:
-        equipment.artwork = webp_filename
-        repository.upsert(equipment)
+        repository.upsert(equipment.model_copy(update={"artwork": webp_filename}))
     
-    return {"path": filename, "filename": filename}
+    return {"path": filename, "filename": filename, "size": stored.size, "sha256": stored.sha256}
 
 
 @router.post("/{equipment_id}/image")
@@ -202,23 +385,15 @@ async def upload_equipment_image(
             detail=f"Equipment {equipment_id} not found"
         )
     
-    # Create assets directory if it doesn't exist (save directly to assets root)
-    assets_dir = settings.assets_dir
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Save the file with eq- prefix
+    # Save the file with eq- prefix (directly to assets root)
     filename = f"eq-{equipment_id}.webp"
-    file_path = assets_dir / filename
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    stored = await _store_image(file, settings.assets_dir / filename, settings)
     
     # Update equipment artwork field
     if equipment.artwork != filename:
-        equipment.artwork = filename
-        repository.upsert(equipment)
+        repository.upsert(equipment.model_copy(update={"artwork": filename}))
     
-    return {"path": filename, "filename": filename}
+    return {"path": filename, "filename": filename, "size": stored.size, "sha256": stored.sha256}
 
 
 @router.delete("/{equipment_id}/image", status_code=status.HTTP_204_NO_CONTENT)
@@ -249,40 +424,20 @@ def delete_equipment_image(
             os.remove(alt_path)
     
     # Clear the artwork field
-    equipment.artwork = None
-    repository.upsert(equipment)
+    repository.upsert(equipment.model_copy(update={"artwork": None}))
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.post("/convert", response_model=ConversionResult)
-def convert_equipment_images(settings: Settings = Depends(get_settings)) -> ConversionResult:
-    """Convert PNG equipment images to WebP format using the conversion script."""
-    if not settings.conversion_script.exists():
+@router.post(
+    "/convert", response_model=ConversionJob, status_code=status.HTTP_202_ACCEPTED
+)
+def convert_equipment_images(settings: Settings = Depends(get_settings)) -> ConversionJob:
+    """Queue the conversion of PNG equipment images to WebP; follow it under ``/api/jobs``."""
+    try:
+        return submit_conversion(settings, "equipment-images").snapshot()
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Conversion script not found at {settings.conversion_script}",
         )
-    command = [
-        "~/.uv-venvs/base/bin/python",
-        "-u",
-        str(settings.conversion_script),
-    ]
-    # expand home directory
-    command[0] = os.path.expanduser(command[0])
-    completed = subprocess.run(
-        command,
-        cwd=settings.repo_root,
-        capture_output=True,
-        text=True,
-        check=False,
-    )
-    succeeded = completed.returncode == 0
-    if not succeeded:
-        # print error
-        print(completed.stderr.strip())
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=completed.stderr.strip() or "Conversion script failed",
-        )
-    return ConversionResult(succeeded=True, stdout=completed.stdout, stderr=completed.stderr)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, List
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from ..config import Settings, get_settings
+from ..jobs import FINISHED_STATES, Job, JobFinished, JobNotFound, JobQueue, job_queue
+from ..models import ConversionJob
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+#: Seconds between checks of a watched job for changes.
+POLL_SECONDS = 0.25
+#: Seconds between keep-alive comments on an idle event stream.
+KEEPALIVE_SECONDS = 15.0
+
+
+def _get_job(queue: JobQueue, job_id: str) -> Job:
+    try:
+        return queue.get(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+
+
+@router.get("", response_model=List[ConversionJob])
+def list_jobs(settings: Settings = Depends(get_settings)) -> List[ConversionJob]:
+    return [job.snapshot() for job in job_queue(settings).list()]
+
+
+@router.get("/{job_id}", response_model=ConversionJob)
+def get_job(job_id: str, settings: Settings = Depends(get_settings)) -> ConversionJob:
+    return _get_job(job_queue(settings), job_id).snapshot()
+
+
+@router.post("/{job_id}/cancel", response_model=ConversionJob)
+def cancel_job(job_id: str, settings: Settings = Depends(get_settings)) -> ConversionJob:
+    queue = job_queue(settings)
+    try:
+        return queue.cancel(job_id).snapshot()
+    except JobNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    except JobFinished:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} already finished"
+        )
+
+
+async def _events(job: Job) -> AsyncIterator[str]:
+    """A ``job`` event per change of the job until it finishes, as server-sent events."""
+    seen = -1
+    idle = 0.0
+    while True:
+        version = job.version
+        if version != seen:
+            seen, idle = version, 0.0
+            snapshot = job.snapshot()
+            yield f"event: job\ndata: {snapshot.model_dump_json()}\n\n"
+            if snapshot.state in FINISHED_STATES:
+                return
+        elif idle >= KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield ": keep-alive\n\n"
+        await anyio.sleep(POLL_SECONDS)
+        idle += POLL_SECONDS
+
+
+@router.get("/{job_id}/events")
+def job_events(job_id: str, settings: Settings = Depends(get_settings)) -> StreamingResponse:
+    """Follow a job's state, progress and output as a ``text/event-stream``."""
+    job = _get_job(job_queue(settings), job_id)
+    return StreamingResponse(
+        _events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,94 +1,112 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-from typing import Dict, List
+from collections import Counter
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse, Response
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic import ValidationError
 
+from ..conditional import etag_matches, not_modified, settle_etag
 from ..config import Settings, get_settings
-from ..models import MapList, MapMetadata, MapMetadataFile
+from ..file_responses import file_response
+from ..models import (
+    BatchResult,
+    MapBatch,
+    MapGraphReport,
+    MapList,
+    MapLocation,
+    MapMetadata,
+    MapNode,
+    MapRoute,
+    SpawnSample,
+)
+from ..pagination import list_response
+from ..patching import PatchError, patch_status, patcher
+from ..payloads import payload_encoding, payload_response
+from ..repository import BatchError, MapRepository, MemberNotFound
 
 router = APIRouter(prefix="/api/maps", tags=["maps"])
 
 
-class MapRepository:
-    """Handles persistence of map metadata."""
-
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
-        self.data_file.parent.mkdir(parents=True, exist_ok=True)
-
-    def _load_raw(self) -> MapMetadataFile:
-        if not self.data_file.exists():
-            return MapMetadataFile(defaultMapId="florence", maps=[])
-        with self.data_file.open("r", encoding="utf-8") as fp:
-            data = json.load(fp)
-            return MapMetadataFile(**data)
-
-    def _save_raw(self, metadata: MapMetadataFile) -> None:
-        with self.data_file.open("w", encoding="utf-8") as fp:
-            json.dump(
-                metadata.model_dump(exclude_none=False),
-                fp,
-                ensure_ascii=False,
-                indent=2,
-            )
-            fp.write("\n")
-
-    def list(self) -> MapList:
-        metadata = self._load_raw()
-        return metadata.maps
-
-    def get(self, map_id: str) -> MapMetadata:
-        metadata = self._load_raw()
-        for map_data in metadata.maps:
-            if map_data.id == map_id:
-                return map_data
-        raise KeyError(map_id)
-
-    def upsert(self, map_data: MapMetadata) -> MapMetadata:
-        metadata = self._load_raw()
-        existing_index = None
-        for idx, existing_map in enumerate(metadata.maps):
-            if existing_map.id == map_data.id:
-                existing_index = idx
-                break
-
-        if existing_index is not None:
-            metadata.maps[existing_index] = map_data
-        else:
-            metadata.maps.append(map_data)
+def get_repository(settings: Settings = Depends(get_settings)) -> MapRepository:
+    return MapRepository.from_settings(settings)
 
-        self._save_raw(metadata)
-        return map_data
 
-    def delete(self, map_id: str) -> None:
-        metadata = self._load_raw()
-        if not any(map_data.id == map_id for map_data in metadata.maps):
-            raise KeyError(map_id)
-        metadata.maps = [m for m in metadata.maps if m.id != map_id]
-        self._save_raw(metadata)
+@router.get("", response_model=MapList)
+def list_maps(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    repository: MapRepository = Depends(get_repository),
+) -> MapList:
+    etag = repository.etag()
+    if cursor is None and limit is None and fields is None:
+        payload = repository.payload()
+        if etag_matches(request, etag):
+            return not_modified(etag, payload_encoding(request, payload))
+        return payload_response(request, payload, settle_etag(etag, repository.etag()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        items, next_cursor = repository.page(cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    etag = settle_etag(etag, repository.etag())
+    return list_response(response, items, next_cursor, fields, etag=etag)
 
 
-def get_repository(settings: Settings = Depends(get_settings)) -> MapRepository:
-    return MapRepository(settings.map_metadata_file)
+@router.get("/graph/report", response_model=MapGraphReport)
+def get_map_graph_report(repository: MapRepository = Depends(get_repository)) -> MapGraphReport:
+    """Validate connections and portals across all maps."""
+    return repository.graph_report()
 
 
-@router.get("", response_model=MapList)
-def list_maps(repository: MapRepository = Depends(get_repository)) -> MapList:
-    return repository.list()
+@router.get("/graph/route", response_model=MapRoute)
+def get_map_route(
+    from_map: str,
+    to_map: str,
+    from_node: Optional[str] = None,
+    to_node: Optional[str] = None,
+    repository: MapRepository = Depends(get_repository),
+) -> MapRoute:
+    """Shortest route between two nodes; a missing node means the map's entry."""
+    try:
+        return repository.route(from_map, to_map, from_node=from_node, to_node=to_node)
+    except KeyError as exc:
+        missing = exc.args[0]
+        if isinstance(missing, str):
+            detail = f"Map {missing} not found"
+        elif missing[1] is None:
+            detail = f"Map {missing[0]} has no nodes or locations"
+        else:
+            detail = f"Node {missing[1]} not found in map {missing[0]}"
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
 
 
 @router.get("/{map_id}", response_model=MapMetadata)
-def get_map(map_id: str, repository: MapRepository = Depends(get_repository)) -> MapMetadata:
+def get_map(
+    map_id: str,
+    request: Request,
+    response: Response,
+    repository: MapRepository = Depends(get_repository),
+) -> MapMetadata:
+    etag = repository.etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
     try:
-        return repository.get(map_id)
+        map_data = repository.get(map_id)
     except KeyError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Map {map_id} not found"
         )
+    etag = settle_etag(etag, repository.etag())
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return map_data
 
 
 @router.post("", response_model=MapMetadata, status_code=status.HTTP_201_CREATED)
@@ -98,6 +116,22 @@ def upsert_map(
     return repository.upsert(map_data)
 
 
+@router.post("/batch", response_model=BatchResult)
+def apply_map_batch(
+    batch: MapBatch, repository: MapRepository = Depends(get_repository)
+) -> BatchResult:
+    try:
+        results = repository.apply_batch(batch.upserts, batch.deletes)
+    except BatchError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=BatchResult(applied=False, results=exc.results).model_dump(),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return BatchResult(applied=True, results=results)
+
+
 @router.put("/{map_id}", response_model=MapMetadata)
 def update_map(
     map_id: str,
@@ -112,6 +146,107 @@ def update_map(
     return repository.upsert(map_data)
 
 
+@router.patch("/{map_id}", response_model=MapMetadata)
+def patch_map(
+    map_id: str,
+    request: Request,
+    patch: Any = Body(...),
+    repository: MapRepository = Depends(get_repository),
+) -> MapMetadata:
+    """Apply a JSON Merge Patch (RFC 7396) or JSON Patch (RFC 6902) to a map."""
+    try:
+        apply = patcher(patch, request.headers.get("content-type"))
+        return repository.patch(map_id, apply)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Map {map_id} not found"
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    except PatchError as exc:
+        raise HTTPException(status_code=patch_status(exc), detail=str(exc))
+
+
+def _patch_member(
+    repository: MapRepository,
+    map_id: str,
+    field: str,
+    member_id: str,
+    patch: Any,
+    content_type: Optional[str],
+) -> Any:
+    label = "Node" if field == "nodes" else "Location"
+    try:
+        apply = patcher(patch, content_type)
+        return repository.patch_member(map_id, field, member_id, apply)
+    except MemberNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{label} {member_id} not found in map {map_id}",
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Map {map_id} not found"
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    except PatchError as exc:
+        raise HTTPException(status_code=patch_status(exc), detail=str(exc))
+
+
+@router.patch("/{map_id}/nodes/{node_id}", response_model=MapNode)
+def patch_map_node(
+    map_id: str,
+    node_id: str,
+    request: Request,
+    patch: Any = Body(...),
+    repository: MapRepository = Depends(get_repository),
+) -> MapNode:
+    """Patch a single node; only the node is re-validated."""
+    return _patch_member(
+        repository, map_id, "nodes", node_id, patch, request.headers.get("content-type")
+    )
+
+
+@router.patch("/{map_id}/locations/{location_id}", response_model=MapLocation)
+def patch_map_location(
+    map_id: str,
+    location_id: str,
+    request: Request,
+    patch: Any = Body(...),
+    repository: MapRepository = Depends(get_repository),
+) -> MapLocation:
+    """Patch a single location; only the location is re-validated."""
+    return _patch_member(
+        repository, map_id, "locations", location_id, patch, request.headers.get("content-type")
+    )
+
+
+@router.get("/{map_id}/nodes/{node_id}/spawns/sample", response_model=SpawnSample)
+def sample_node_spawns(
+    map_id: str,
+    node_id: str,
+    count: int = Query(default=100, ge=1, le=100_000),
+    seed: Optional[int] = None,
+    repository: MapRepository = Depends(get_repository),
+) -> SpawnSample:
+    """Draw ``count`` monsters from the node's compiled spawn table."""
+    try:
+        monsters = repository.sample_spawns(map_id, node_id, count, seed=seed)
+    except MemberNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Node {node_id} in map {map_id} has no spawn table",
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Map {map_id} not found"
+        )
+    return SpawnSample(
+        mapId=map_id, nodeId=node_id, monsters=monsters, counts=dict(Counter(monsters))
+    )
+
+
 @router.delete("/{map_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_map(map_id: str, repository: MapRepository = Depends(get_repository)) -> Response:
     try:
@@ -124,9 +259,11 @@ def delete_map(map_id: str, repository: MapRepository = Depends(get_repository))
 
 
 @router.get("/{map_id}/image")
-def get_map_image(map_id: str, settings: Settings = Depends(get_settings)) -> FileResponse:
+def get_map_image(
+    map_id: str, request: Request, settings: Settings = Depends(get_settings)
+) -> Response:
     """Get map background image."""
-    repository = MapRepository(settings.map_metadata_file)
+    repository = MapRepository.from_settings(settings)
     try:
         map_data = repository.get(map_id)
     except KeyError:
@@ -134,11 +271,15 @@ def get_map_image(map_id: str, settings: Settings = Depends(get_settings)) -> Fi
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Map {map_id} not found"
         )
 
-    image_path = settings.map_images_dir / map_data.image
-    if not image_path.exists():
+    try:
+        return file_response(
+            request,
+            settings.map_images_dir / map_data.image,
+            media_type="image/webp",
+            max_age=settings.image_max_age,
+        )
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Image {map_data.image} not found",
         )
-
-    return FileResponse(image_path, media_type="image/webp")
@@ -1,48 +1,98 @@
 from __future__ import annotations
 
-import os
-import shutil
-import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
+from ..assets import asset_directory
+from ..conditional import etag_matches, not_modified, settle_etag
 from ..config import Settings, get_settings
-from ..models import AssetStatus, ConversionResult, MonsterBlueprint, MonsterList
-from ..repository import MonsterRepository
+from ..file_responses import file_response
+from ..jobs import submit_conversion
+from ..models import (
+    AssetStatus,
+    BatchResult,
+    ConversionJob,
+    MonsterBatch,
+    MonsterBlueprint,
+    MonsterList,
+    SpawnReference,
+)
+from ..pagination import list_response
+from ..patching import PatchError, patch_status, patcher
+from ..payloads import payload_encoding, payload_response
+from ..repository import BatchError, MapRepository, MonsterRepository
+from ..uploads import UploadTooLarge, store_upload
 
 router = APIRouter(prefix="/api/monsters", tags=["monsters"])
 
 
 def get_repository(settings: Settings = Depends(get_settings)) -> MonsterRepository:
-    return MonsterRepository(settings.data_file)
+    return MonsterRepository.from_settings(settings)
 
 
 def _asset_status(monster_id: str, settings: Settings) -> AssetStatus:
+    raw = asset_directory(settings.raw_assets_dir)
     return AssetStatus(
-        png=_find_asset_path(settings.raw_assets_dir, monster_id, "png") is not None,
-        webp=_find_asset_path(settings.webp_assets_dir, monster_id, "webp") is not None,
-        mp4=_find_asset_path(settings.raw_assets_dir, monster_id, "mp4") is not None,
+        png=raw.find(monster_id, "png") is not None,
+        webp=asset_directory(settings.webp_assets_dir).find(monster_id, "webp") is not None,
+        mp4=raw.find(monster_id, "mp4") is not None,
     )
 
 
 def _find_asset_path(directory: Path, monster_id: str, extension: str) -> Optional[Path]:
     """Locate the primary asset file (with optional suffix) for the provided monster."""
-    if not directory.exists():
-        return None
-    base_path = directory / f"{monster_id}.{extension}"
-    if base_path.exists():
-        return base_path
-    candidates = sorted(directory.glob(f"{monster_id}-*.{extension}"))
-    return candidates[0] if candidates else None
+    return asset_directory(directory).find(monster_id, extension)
 
 
 @router.get("", response_model=MonsterList)
-def list_monsters(repository: MonsterRepository = Depends(get_repository)) -> MonsterList:
-    return repository.list()
+def list_monsters(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    repository: MonsterRepository = Depends(get_repository),
+) -> MonsterList:
+    etag = repository.etag()
+    if cursor is None and limit is None and fields is None:
+        payload = repository.payload()
+        if etag_matches(request, etag):
+            return not_modified(etag, payload_encoding(request, payload))
+        return payload_response(request, payload, settle_etag(etag, repository.etag()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        items, next_cursor = repository.page(cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    etag = settle_etag(etag, repository.etag())
+    return list_response(response, items, next_cursor, fields, etag=etag)
+
+
+@router.get("/search", response_model=MonsterList)
+def search_monsters(
+    q: str,
+    limit: Optional[int] = Query(default=None, ge=1),
+    prefix: bool = False,
+    repository: MonsterRepository = Depends(get_repository),
+) -> MonsterList:
+    return repository.search(q, limit=limit, prefix=prefix)
 
 
 @router.post("", response_model=MonsterBlueprint, status_code=status.HTTP_201_CREATED)
@@ -52,13 +102,65 @@ def upsert_monster(
     return repository.upsert(monster)
 
 
+@router.patch("/{monster_id}", response_model=MonsterBlueprint)
+def patch_monster(
+    monster_id: str,
+    request: Request,
+    patch: Any = Body(...),
+    repository: MonsterRepository = Depends(get_repository),
+) -> MonsterBlueprint:
+    """Apply a JSON Merge Patch (RFC 7396) or JSON Patch (RFC 6902) to a monster."""
+    try:
+        apply = patcher(patch, request.headers.get("content-type"))
+        return repository.patch(monster_id, apply)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Monster {monster_id} not found"
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    except PatchError as exc:
+        raise HTTPException(status_code=patch_status(exc), detail=str(exc))
+
+
+@router.post("/batch", response_model=BatchResult)
+def apply_monster_batch(
+    batch: MonsterBatch, repository: MonsterRepository = Depends(get_repository)
+) -> BatchResult:
+    try:
+        results = repository.apply_batch(batch.upserts, batch.deletes)
+    except BatchError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=BatchResult(applied=False, results=exc.results).model_dump(),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return BatchResult(applied=True, results=results)
+
+
 @router.delete(
     "/{monster_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
 def delete_monster(
-    monster_id: str, repository: MonsterRepository = Depends(get_repository)
+    monster_id: str,
+    check_references: bool = False,
+    repository: MonsterRepository = Depends(get_repository),
+    settings: Settings = Depends(get_settings),
 ) -> Response:
+    if check_references:
+        maps = MapRepository.from_settings(settings)
+        if maps.is_spawned(monster_id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": f"Monster {monster_id} is still spawned on maps",
+                    "references": [
+                        reference.model_dump() for reference in maps.spawn_references(monster_id)
+                    ],
+                },
+            )
     try:
         repository.delete(monster_id)
     except KeyError:
@@ -68,6 +170,14 @@ def delete_monster(
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.get("/{monster_id}/references", response_model=List[SpawnReference])
+def get_monster_references(
+    monster_id: str, settings: Settings = Depends(get_settings)
+) -> List[SpawnReference]:
+    """Map nodes spawning the monster; also works for ids that no longer exist."""
+    return MapRepository.from_settings(settings).spawn_references(monster_id)
+
+
 @router.get("/{monster_id}/assets", response_model=AssetStatus)
 def get_monster_assets(
     monster_id: str, settings: Settings = Depends(get_settings)
@@ -80,35 +190,55 @@ def list_all_asset_statuses(
     repository: MonsterRepository = Depends(get_repository),
     settings: Settings = Depends(get_settings),
 ) -> Dict[str, AssetStatus]:
+    ids = [monster.id for monster in repository.list()]
+    raw = asset_directory(settings.raw_assets_dir)
+    png = raw.available(ids, "png")
+    webp = asset_directory(settings.webp_assets_dir).available(ids, "webp")
+    mp4 = raw.available(ids, "mp4")
     return {
-        monster.id: _asset_status(monster.id, settings)
-        for monster in repository.list()
+        monster_id: AssetStatus(
+            png=monster_id in png, webp=monster_id in webp, mp4=monster_id in mp4
+        )
+        for monster_id in ids
     }
 
 
-@router.get("/{monster_id}/assets/{asset_type}")
+@router.api_route("/{monster_id}/assets/{asset_type}", methods=["GET", "HEAD"])
 def download_monster_asset(
     monster_id: str,
     asset_type: Literal["png", "webp", "mp4"],
+    request: Request,
     settings: Settings = Depends(get_settings),
-) -> FileResponse:
+) -> Response:
+    max_age = settings.image_max_age
     if asset_type == "png":
         asset_path = _find_asset_path(settings.raw_assets_dir, monster_id, "png")
         media_type = "image/png"
     elif asset_type == "mp4":
         asset_path = _find_asset_path(settings.raw_assets_dir, monster_id, "mp4")
         media_type = "video/mp4"
+        max_age = settings.video_max_age
     else:
         asset_path = _find_asset_path(settings.webp_assets_dir, monster_id, "webp")
         media_type = "image/webp"
 
-    if not asset_path or not asset_path.exists():
+    try:
+        if asset_path is None:
+            raise FileNotFoundError(monster_id)
+        return file_response(request, asset_path, media_type=media_type, max_age=max_age)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"{asset_type.upper()} asset for {monster_id} not found",
         )
 
-    return FileResponse(asset_path, media_type=media_type)
+
+async def _store_asset(file: UploadFile, target_path: Path, settings: Settings) -> None:
+    try:
+        with asset_directory(target_path.parent).track_write(target_path):
+            await store_upload(file, target_path, settings.upload_max_bytes)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
 
 
 @router.post("/{monster_id}/assets/png", response_model=AssetStatus)
@@ -123,9 +253,7 @@ async def upload_monster_png(
             detail="Uploaded file must be a .png image",
         )
     target_path = settings.raw_assets_dir / f"{monster_id}.png"
-    target_path.parent.mkdir(parents=True, exist_ok=True)
-    with target_path.open("wb") as destination:
-        shutil.copyfileobj(file.file, destination)
+    await _store_asset(file, target_path, settings)
     return _asset_status(monster_id, settings)
 
 
@@ -141,39 +269,19 @@ async def upload_monster_mp4(
             detail="Uploaded file must be a .mp4 video",
         )
     target_path = settings.raw_assets_dir / f"{monster_id}.mp4"
-    target_path.parent.mkdir(parents=True, exist_ok=True)
-    with target_path.open("wb") as destination:
-        shutil.copyfileobj(file.file, destination)
+    await _store_asset(file, target_path, settings)
     return _asset_status(monster_id, settings)
 
 
-@router.post("/assets/convert", response_model=ConversionResult)
-def convert_missing_assets(settings: Settings = Depends(get_settings)) -> ConversionResult:
-    if not settings.conversion_script.exists():
+@router.post(
+    "/assets/convert", response_model=ConversionJob, status_code=status.HTTP_202_ACCEPTED
+)
+def convert_missing_assets(settings: Settings = Depends(get_settings)) -> ConversionJob:
+    """Queue the conversion of missing WebP assets; follow it under ``/api/jobs``."""
+    try:
+        return submit_conversion(settings, "monster-assets").snapshot()
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Conversion script not found at {settings.conversion_script}",
         )
-    command = [
-        "~/.uv-venvs/base/bin/python",
-        "-u",
-        str(settings.conversion_script),
-    ]
-    # expand home directory
-    command[0] = os.path.expanduser(command[0])
-    completed = subprocess.run(
-        command,
-        cwd=settings.repo_root,
-        capture_output=True,
-        text=True,
-        check=False,
-    )
-    succeeded = completed.returncode == 0
-    if not succeeded:
-        # print error
-        print(completed.stderr.strip())
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=completed.stderr.strip() or "Conversion script failed",
-        )
-    return ConversionResult(succeeded=True, stdout=completed.stdout, stderr=completed.stderr)
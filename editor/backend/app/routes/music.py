@@ -3,10 +3,13 @@ from __future__ import annotations
 from pathlib import Path
 from typing import List
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Request
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
 
+from ..cache import file_signature
+from ..conditional import etag_matches, make_etag, not_modified, settle_etag
 from ..config import Settings, get_settings
+from ..file_responses import file_response
+from ..uploads import UploadTooLarge, store_upload
 
 router = APIRouter(prefix="/api/music", tags=["music"])
 
@@ -17,6 +20,10 @@ class MusicRepository:
     def __init__(self, assets_dir: Path):
         self.assets_dir = assets_dir
 
+    def etag(self) -> str:
+        """目录版本标识：增删文件会改变目录的 mtime"""
+        return make_etag(self.assets_dir, file_signature(self.assets_dir))
+
     def list_music(self) -> List[dict]:
         """获取所有音乐文件"""
         mp3_files = list(self.assets_dir.glob("*.mp3"))
@@ -29,8 +36,8 @@ class MusicRepository:
             for f in sorted(mp3_files, key=lambda x: x.name)
         ]
 
-    def upload_music(self, file: UploadFile) -> dict:
-        """上传新音乐文件"""
+    async def upload_music(self, file: UploadFile, max_bytes: int) -> dict:
+        """上传新音乐文件（分块写入临时文件，完成后原子替换）"""
         if not file.filename or not file.filename.endswith(".mp3"):
             raise ValueError("只支持 MP3 格式")
 
@@ -38,11 +45,8 @@ class MusicRepository:
         if file_path.exists():
             raise FileExistsError(f"文件 {file.filename} 已存在")
 
-        content = file.file.read()
-        with file_path.open("wb") as f:
-            f.write(content)
-
-        return {"filename": file.filename, "size": file_path.stat().st_size}
+        stored = await store_upload(file, file_path, max_bytes)
+        return {"filename": file.filename, "size": stored.size, "sha256": stored.sha256}
 
     def delete_music(self, filename: str) -> None:
         """删除音乐文件"""
@@ -60,10 +64,19 @@ class MusicRepository:
 
 
 @router.get("", response_model=List[dict])
-def list_music(settings: Settings = Depends(get_settings)):
+def list_music(
+    request: Request, response: Response, settings: Settings = Depends(get_settings)
+):
     """获取音乐列表"""
     repo = MusicRepository(settings.assets_dir)
-    return repo.list_music()
+    etag = repo.etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    music = repo.list_music()
+    etag = settle_etag(etag, repo.etag())
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return music
 
 
 @router.post("/upload")
@@ -73,8 +86,10 @@ async def upload_music(
     """上传音乐文件"""
     repo = MusicRepository(settings.assets_dir)
     try:
-        result = repo.upload_music(file)
+        result = await repo.upload_music(file, settings.upload_max_bytes)
         return {"success": True, "data": result}
+    except UploadTooLarge as e:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, str(e))
     except ValueError as e:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
     except FileExistsError as e:
@@ -92,63 +107,16 @@ def delete_music(filename: str, settings: Settings = Depends(get_settings)):
         raise HTTPException(status.HTTP_404_NOT_FOUND, str(e))
 
 
-@router.get("/{filename}/stream")
+@router.api_route("/{filename}/stream", methods=["GET", "HEAD"])
 def stream_music(filename: str, request: Request, settings: Settings = Depends(get_settings)):
-    """播放音乐（支持 Range 请求）"""
+    """播放音乐（支持 Range、多段 Range、If-Range 与 HEAD 请求）"""
     repo = MusicRepository(settings.assets_dir)
     try:
-        file_path = repo.serve_music(filename)
-        
-        # 获取文件大小
-        file_size = file_path.stat().st_size
-        
-        # 检查是否有 Range 请求头
-        range_header = request.headers.get("range")
-        
-        if not range_header:
-            # 没有 Range 请求，返回整个文件
-            return FileResponse(
-                file_path, 
-                media_type="audio/mpeg",
-                headers={
-                    "Accept-Ranges": "bytes",
-                    "Content-Length": str(file_size)
-                }
-            )
-        
-        # 解析 Range 请求
-        range_match = range_header.replace("bytes=", "").split("-")
-        start = int(range_match[0]) if range_match[0] else 0
-        end = int(range_match[1]) if len(range_match) > 1 and range_match[1] else file_size - 1
-        
-        # 确保范围有效
-        start = max(0, min(start, file_size - 1))
-        end = max(start, min(end, file_size - 1))
-        content_length = end - start + 1
-        
-        # 读取文件片段
-        def iter_file():
-            with open(file_path, "rb") as f:
-                f.seek(start)
-                remaining = content_length
-                chunk_size = 8192
-                while remaining > 0:
-                    chunk = f.read(min(chunk_size, remaining))
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-        
-        # 返回部分内容
-        return StreamingResponse(
-            iter_file(),
+        return file_response(
+            request,
+            repo.serve_music(filename),
             media_type="audio/mpeg",
-            status_code=206,  # Partial Content
-            headers={
-                "Content-Range": f"bytes {start}-{end}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(content_length),
-            }
+            max_age=settings.audio_max_age,
         )
     except FileNotFoundError as e:
         raise HTTPException(status.HTTP_404_NOT_FOUND, str(e))
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ..config import Settings, get_settings
+from ..models import SearchHit
+from ..search import KINDS, unified_index
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("", response_model=List[SearchHit])
+def search(
+    q: str,
+    limit: int = Query(default=20, ge=1, le=500),
+    kinds: Optional[str] = None,
+    settings: Settings = Depends(get_settings),
+) -> List[SearchHit]:
+    """Search monsters, equipment, maps, map nodes and locations, and music at once.
+
+    ``kinds`` optionally restricts the result to a comma-separated subset
+    of ``monster,equipment,map,node,location,music``.
+    """
+    selected = [kind.strip() for kind in (kinds or "").split(",") if kind.strip()]
+    unknown = sorted(set(selected) - set(KINDS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown kinds: {', '.join(unknown)}",
+        )
+    return unified_index(settings).search(q, limit=limit, kinds=selected)
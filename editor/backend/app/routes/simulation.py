@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..config import Settings, get_settings
+from ..models import EconomyReport
+from ..simulation import SimulationParams, SimulationUnavailable, economy_report
+
+router = APIRouter(prefix="/api/simulation", tags=["simulation"])
+
+_DEFAULTS = SimulationParams()
+
+
+@router.get("/economy", response_model=EconomyReport)
+def get_economy(
+    trials: int = Query(_DEFAULTS.trials, ge=1, le=5000),
+    dps: float = Query(_DEFAULTS.dps, gt=0),
+    engage_seconds: float = Query(_DEFAULTS.engage_seconds, ge=0),
+    seed: int = Query(_DEFAULTS.seed, ge=0),
+    settings: Settings = Depends(get_settings),
+) -> EconomyReport:
+    """Simulated kills, gold and core drops per hour for every battle node and map."""
+    params = SimulationParams(trials=trials, dps=dps, engage_seconds=engage_seconds, seed=seed)
+    try:
+        return economy_report(settings, params)
+    except SimulationUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
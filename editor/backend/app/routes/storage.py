@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends
+
+from ..config import Settings, get_settings
+from ..export import export_all
+
+router = APIRouter(prefix="/api/storage", tags=["storage"])
+
+
+@router.post("/export")
+def export_json(settings: Settings = Depends(get_settings)) -> Dict[str, List[str]]:
+    """Regenerate the canonical JSON data files from the storage backend."""
+    return {"exported": [str(path) for path in export_all(settings)]}
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .cache import RecordCollection, file_signature
+from .config import Settings
+from .indexes import TrigramIndex
+from .models import SearchHit
+from .repository import EquipmentRepository, MapRepository, MonsterRepository
+
+KINDS = ("monster", "equipment", "map", "node", "location", "music")
+#: Share of the query's trigrams a fuzzy match must contain.
+FUZZY_THRESHOLD = 0.5
+_MATCHES = ("exact", "prefix", "word", "substring")
+#: Number of search indexes kept per process, one per set of data sources.
+CACHE_SIZE = 8
+
+
+@dataclass(frozen=True)
+class _Document:
+    kind: str
+    id: str
+    label: str
+    map_id: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        if self.map_id is None:
+            return f"{self.kind}/{self.id}"
+        return f"{self.kind}/{self.map_id}/{self.id}"
+
+
+@dataclass(frozen=True)
+class _Music:
+    id: str
+
+    @property
+    def name(self) -> str:
+        return self.id.rsplit(".", 1)[0]
+
+
+def _documents(source: str, item: Any) -> List[_Document]:
+    if source != "map":
+        return [_Document(source, item.id, item.name)]
+    documents = [_Document("map", item.id, item.name)]
+    documents += [_Document("node", node.id, node.label, item.id) for node in item.nodes or []]
+    documents += [
+        _Document("location", location.id, location.name, item.id)
+        for location in item.locations or []
+    ]
+    return documents
+
+
+class UnifiedSearchIndex:
+    """One trigram index over monsters, equipment, maps, their nodes and locations, and music.
+
+    Each repository collection carries a :class:`~app.indexes.ChangeFeed`;
+    :meth:`sync` replays the records changed since the last sync and only
+    re-indexes everything of a source when its collection was reloaded
+    or the feed no longer reaches back far enough. The music directory is
+    re-listed only when its mtime changes, and then diffed by file name.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._text = TrigramIndex(lambda document: (document.id, document.label))
+        self._documents: Dict[str, _Document] = {}
+        #: (source, record id) -> keys of the documents derived from that record.
+        self._owned: Dict[Tuple[str, str], List[str]] = {}
+        #: Source -> (collection last read, change feed position).
+        self._seen: Dict[str, Tuple[RecordCollection, int]] = {}
+        self._music_signature: Any = None
+
+    def _put(self, source: str, record_id: str, item: Any) -> None:
+        keys = []
+        for document in _documents(source, item):
+            self._documents[document.key] = document
+            self._text.add(document.key, document)
+            keys.append(document.key)
+        self._owned[(source, record_id)] = keys
+
+    def _drop(self, source: str, record_id: str) -> None:
+        for key in self._owned.pop((source, record_id), ()):
+            self._text.remove(key, self._documents.pop(key))
+
+    def _sync_collection(self, source: str, collection: RecordCollection) -> None:
+        with collection.lock:
+            feed = collection.index("changes")
+            seen = self._seen.get(source)
+            events = None
+            if seen is not None and seen[0] is collection:
+                events = feed.since(seen[1])
+            if events is None:
+                for owner in [owner for owner in self._owned if owner[0] == source]:
+                    self._drop(*owner)
+                for record_id in collection.ids():
+                    self._put(source, record_id, collection.get(record_id))
+            else:
+                for added, record_id, item in events:
+                    self._drop(source, record_id)
+                    if added:
+                        self._put(source, record_id, item)
+            self._seen[source] = (collection, feed.position)
+
+    def _sync_music(self, directory: Path) -> None:
+        signature = file_signature(directory)
+        if signature == self._music_signature:
+            return
+        names = {path.name for path in directory.glob("*.mp3")} if directory.is_dir() else set()
+        known = {record_id for source, record_id in self._owned if source == "music"}
+        for name in known - names:
+            self._drop("music", name)
+        for name in names - known:
+            self._put("music", name, _Music(name))
+        self._music_signature = signature
+
+    def sync(self, collections: Dict[str, RecordCollection], music_dir: Path) -> None:
+        with self._lock:
+            for source, collection in collections.items():
+                self._sync_collection(source, collection)
+            self._sync_music(music_dir)
+
+    def search(
+        self, query: str, limit: int = 20, kinds: Optional[Iterable[str]] = None
+    ) -> List[SearchHit]:
+        """Substring matches ranked as :meth:`TrigramIndex.rank`, then fuzzy matches.
+
+        Fuzzy matches share at least :data:`FUZZY_THRESHOLD` of the query's
+        trigrams and are only looked up while the substring matches leave
+        room under ``limit``.
+        """
+        wanted: Set[str] = set(kinds) if kinds else set(KINDS)
+        with self._lock:
+            found = [
+                key for key in self._text.matches(query) if self._documents[key].kind in wanted
+            ]
+            ranked = sorted((self._text.rank(query, key), key) for key in found)
+            hits = [(_MATCHES[rank[0]], key) for rank, key in ranked[:limit]]
+            if len(hits) < limit:
+                matched = set(found)
+                similar = [
+                    (share, key)
+                    for key, share in self._text.similar(query, FUZZY_THRESHOLD).items()
+                    if key not in matched and self._documents[key].kind in wanted
+                ]
+                similar.sort(key=lambda entry: (-entry[0], entry[1]))
+                hits += [("fuzzy", key) for _, key in similar[: limit - len(hits)]]
+            return [self._hit(key, match) for match, key in hits]
+
+    def _hit(self, key: str, match: str) -> SearchHit:
+        document = self._documents[key]
+        return SearchHit(
+            kind=document.kind,
+            id=document.id,
+            label=document.label,
+            mapId=document.map_id,
+            match=match,
+        )
+
+
+_indexes: "OrderedDict[Hashable, UnifiedSearchIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def unified_index(settings: Settings) -> UnifiedSearchIndex:
+    """The process-wide search index for the data sources in ``settings``, brought up to date."""
+    repositories = {
+        "monster": MonsterRepository.from_settings(settings),
+        "equipment": EquipmentRepository.from_settings(settings),
+        "map": MapRepository.from_settings(settings),
+    }
+    key = tuple(repository.storage.key for repository in repositories.values()) + (
+        settings.assets_dir,
+    )
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = UnifiedSearchIndex()
+            while len(_indexes) > CACHE_SIZE:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+    collections = {source: repository.collection() for source, repository in repositories.items()}
+    index.sync(collections, settings.assets_dir)
+    return index
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from .cache import RecordCollection, file_signature
+from .storage import RecordStorage
+from .writer import Mutation, Upsert, write_atomic
+
+# "@" is always percent-encoded in shard names, so no record id can collide
+MANIFEST_NAME = "@manifest.json"
+SHARD_SUFFIX = ".json"
+
+
+class ShardedJsonStorage(RecordStorage):
+    """Records stored one JSON file per record, next to a small manifest.
+
+    ``@manifest.json`` holds the collection metadata and the record order;
+    every other ``*.json`` file in ``directory`` is one record, named after
+    its id. A commit rewrites only the shards it touches plus the manifest,
+    and single records are fetched without reading the others. On first
+    use an empty directory is seeded from ``seed``, typically the combined
+    JSON file.
+
+    The signature combines the manifest's and the directory's mtime, so
+    shards replaced by editors or version control (which rename files into
+    place) are picked up as well as this process's own commits.
+    """
+
+    supports_fetch = True
+
+    def __init__(
+        self,
+        directory: Path,
+        indent: int = 2,
+        seed: Optional[RecordStorage] = None,
+        on_commit: Optional[Callable[[RecordCollection], None]] = None,
+    ):
+        self.directory = directory
+        self.manifest_file = directory / MANIFEST_NAME
+        self.indent = indent
+        self.seed = seed
+        self.on_commit = on_commit
+        self.key = directory
+
+    def shard_path(self, record_id: str) -> Path:
+        return self.directory / (quote(record_id, safe="") + SHARD_SUFFIX)
+
+    def _dumps(self, data: Any) -> bytes:
+        return (json.dumps(data, ensure_ascii=False, indent=self.indent) + "\n").encode("utf-8")
+
+    def _read(self, path: Path) -> Any:
+        with path.open("r", encoding="utf-8") as fp:
+            return json.load(fp)
+
+    def _ensure_seeded(self) -> None:
+        if self.manifest_file.exists():
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        records, meta = self.seed.load() if self.seed is not None else ([], {})
+        for record in records:
+            write_atomic(self.shard_path(record["id"]), self._dumps(record))
+        self._write_manifest([record["id"] for record in records], meta)
+
+    def _write_manifest(self, order: List[str], meta: Dict[str, Any]) -> None:
+        write_atomic(self.manifest_file, self._dumps({**meta, "order": order}))
+
+    def _manifest(self) -> Tuple[List[str], Dict[str, Any]]:
+        manifest = self._read(self.manifest_file)
+        order = manifest.pop("order", [])
+        return order, manifest
+
+    def signature(self) -> Any:
+        self._ensure_seeded()
+        return (file_signature(self.manifest_file), file_signature(self.directory))
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        self._ensure_seeded()
+        order, meta = self._manifest()
+        shards = {
+            unquote(path.name[: -len(SHARD_SUFFIX)]): path
+            for path in self.directory.glob("*" + SHARD_SUFFIX)
+            if path.name != MANIFEST_NAME
+        }
+        # Shards missing from the manifest (e.g. added by hand) go last, by id
+        ids = [record_id for record_id in order if record_id in shards]
+        ids += sorted(set(shards) - set(ids))
+        return [self._read(shards[record_id]) for record_id in ids], meta
+
+    def fetch(self, record_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_seeded()
+        try:
+            return self._read(self.shard_path(record_id))
+        except FileNotFoundError:
+            return None
+
+    def persist(self, collection: RecordCollection, mutations: List[Mutation]) -> None:
+        self._ensure_seeded()
+        for mutation in mutations:
+            if isinstance(mutation, Upsert):
+                write_atomic(self.shard_path(mutation.record["id"]), self._dumps(mutation.record))
+            elif mutation.record_id not in collection:
+                self.shard_path(mutation.record_id).unlink(missing_ok=True)
+        self._write_manifest(collection.ids(), collection.meta)
+        if self.on_commit is not None:
+            self.on_commit(collection)
+
+    def rewrite(self, collection: RecordCollection) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        ids = collection.ids()
+        for record_id, record in zip(ids, collection.records()):
+            write_atomic(self.shard_path(record_id), self._dumps(record))
+        keep = {self.shard_path(record_id).name for record_id in ids}
+        for path in self.directory.glob("*" + SHARD_SUFFIX):
+            if path.name != MANIFEST_NAME and path.name not in keep:
+                path.unlink()
+        self._write_manifest(ids, collection.meta)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import argparse
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+try:  # NumPy is optional; only the simulator needs it.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from .config import Settings, get_settings
+from .models import (
+    Distribution,
+    EconomyReport,
+    MapEconomy,
+    MapMetadata,
+    MonsterBlueprint,
+    NodeEconomy,
+)
+
+# Spawn rules as implemented by the game's node spawn store.
+DEFAULT_BATCH_INTERVAL = 900
+MIN_BATCH_INTERVAL = 15
+DEFAULT_RESPAWN_DELAY = 60
+MIN_RESPAWN_DELAY = 5
+DEFAULT_CORE_DROP_CHANCE = 0.2
+BOSS_CORE_DROP_CHANCE = 0.9
+
+HOUR_SECONDS = 3600.0
+#: Number of reports kept per process, keyed by data version and parameters.
+CACHE_SIZE = 16
+
+
+class SimulationUnavailable(RuntimeError):
+    """Raised when NumPy is not installed."""
+
+
+@dataclass(frozen=True)
+class SimulationParams:
+    """How the simulated player farms a node.
+
+    Each trial is one hour at one node, fighting the first available
+    monster; a fight takes ``engage_seconds`` plus the monster's hp
+    divided by ``dps``.
+    """
+
+    trials: int = 200
+    dps: float = 50.0
+    engage_seconds: float = 3.0
+    seed: int = 0
+
+
+@dataclass
+class _SpawnTables:
+    """Spawn configs of all battle nodes, padded into arrays."""
+
+    places: List[Tuple[str, str]]
+    low: Any
+    high: Any
+    interval: Any
+    respawn: Any
+    cumulative: Any
+    #: Global monster index per weighted entry; -1 for unknown monsters.
+    entries: Any
+    missing: List[str]
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise SimulationUnavailable(
+            "The economy simulator needs NumPy; install the 'simulation' extra"
+        )
+
+
+def _seconds(value: int, default: int, minimum: int) -> float:
+    return float(max(minimum, value or default))
+
+
+def _spawn_tables(maps: List[MapMetadata], index: Dict[str, int]) -> _SpawnTables:
+    configs = [
+        (map_data.id, node.id, node.spawn)
+        for map_data in maps
+        for node in map_data.nodes or []
+        if node.spawn is not None
+    ]
+    width = max([len(spawn.monsters) for _, _, spawn in configs] + [1])
+    count = len(configs)
+    cumulative = np.full((count, width), np.inf)
+    entries = np.full((count, width), -1, dtype=np.int64)
+    missing: List[str] = []
+    for row, (_, _, spawn) in enumerate(configs):
+        weights = np.array([entry.weight for entry in spawn.monsters], dtype=float)
+        cumulative[row, : len(weights)] = np.cumsum(weights)
+        for column, entry in enumerate(spawn.monsters):
+            if entry.id in index:
+                entries[row, column] = index[entry.id]
+            elif entry.id not in missing:
+                missing.append(entry.id)
+    return _SpawnTables(
+        places=[(map_id, node_id) for map_id, node_id, _ in configs],
+        low=np.array([spawn.min for _, _, spawn in configs], dtype=np.int64),
+        high=np.array([spawn.max for _, _, spawn in configs], dtype=np.int64),
+        interval=np.array(
+            [_seconds(spawn.intervalSeconds, DEFAULT_BATCH_INTERVAL, MIN_BATCH_INTERVAL)
+             for _, _, spawn in configs],
+            dtype=float,
+        ),
+        respawn=np.array(
+            [_seconds(spawn.respawnSeconds, DEFAULT_RESPAWN_DELAY, MIN_RESPAWN_DELAY)
+             for _, _, spawn in configs],
+            dtype=float,
+        ),
+        cumulative=cumulative,
+        entries=entries,
+        missing=missing,
+    )
+
+
+def _core_chance(monster: MonsterBlueprint) -> float:
+    chance = monster.rewards.get("coreDropChance")
+    if chance is None:
+        is_boss = getattr(monster, "rank", None) == "boss"
+        chance = BOSS_CORE_DROP_CHANCE if is_boss else DEFAULT_CORE_DROP_CHANCE
+    return min(1.0, max(0.0, float(chance)))
+
+
+def _distribution(samples: Any) -> Distribution:
+    p10, p50, p90 = np.percentile(samples, [10, 50, 90])
+    return Distribution(
+        mean=float(samples.mean()), p10=float(p10), p50=float(p50), p90=float(p90)
+    )
+
+
+def simulate_economy(
+    maps: List[MapMetadata],
+    monsters: List[MonsterBlueprint],
+    params: SimulationParams = SimulationParams(),
+) -> EconomyReport:
+    """Monte Carlo estimate of kills, gold and core drops per hour at every battle node.
+
+    All ``trials`` of all nodes advance together as lanes of NumPy arrays:
+    each step lets every lane either finish a fight or wait for its next
+    respawn or batch refresh, so the loop runs once per fight rather than
+    once per fight and node. Spawns follow the game's rules: a batch of
+    ``min``..``max`` weighted monsters every ``intervalSeconds``, and a
+    defeated monster returning after ``respawnSeconds``. Rewards are the
+    blueprints' base values, before rank multipliers.
+    """
+    _require_numpy()
+    rng = np.random.default_rng(params.seed)
+    index = {monster.id: position for position, monster in enumerate(monsters)}
+    hp = np.array([monster.hp for monster in monsters] + [0], dtype=float)
+    gold = np.array([monster.rewards.get("gold", 0) for monster in monsters] + [0], dtype=float)
+    core = np.array([_core_chance(monster) for monster in monsters] + [0.0])
+    tables = _spawn_tables(maps, index)
+
+    node_count, trials = len(tables.places), params.trials
+    lanes = node_count * trials
+    node = np.repeat(np.arange(node_count), trials)
+    slots = int(max(tables.high.max(initial=0), 1))
+    monster = np.full((lanes, slots), -1, dtype=np.int64)
+    ready = np.zeros((lanes, slots))
+    now = np.zeros(lanes)
+    next_batch = np.zeros(lanes)
+    kills = np.zeros((lanes, len(monsters) + 1))
+    gold_total = np.zeros(lanes)
+    cores = np.zeros(lanes)
+
+    def roll_batch(rows: Any) -> None:
+        nodes = node[rows]
+        spawning = (tables.low[nodes] > 0) & (tables.high[nodes] > 0)
+        span = np.maximum(0, tables.high[nodes] - tables.low[nodes])
+        count = np.where(spawning, tables.low[nodes] + rng.integers(0, span + 1), 0)
+        cumulative = tables.cumulative[nodes]
+        total = np.where(np.isinf(cumulative), 0, cumulative).max(axis=1)
+        rolls = rng.random((len(rows), slots)) * total[:, None]
+        picks = (rolls[:, :, None] > cumulative[:, None, :]).sum(axis=2)
+        picks = np.minimum(picks, cumulative.shape[1] - 1)
+        chosen = np.take_along_axis(tables.entries[nodes], picks, axis=1)
+        present = (np.arange(slots)[None, :] < count[:, None]) & (total[:, None] > 0)
+        monster[rows] = np.where(present, chosen, -1)
+        ready[rows] = now[rows, None]
+        next_batch[rows] = np.where(spawning, now[rows] + tables.interval[nodes], np.inf)
+
+    active = now < HOUR_SECONDS
+    while active.any():
+        due = np.flatnonzero(active & (now >= next_batch))
+        if len(due):
+            roll_batch(due)
+        available = (monster >= 0) & (ready <= now[:, None])
+        fighting = np.flatnonzero(active & available.any(axis=1))
+        if len(fighting):
+            slot = available[fighting].argmax(axis=1)
+            foe = monster[fighting, slot]
+            finish = now[fighting] + params.engage_seconds + hp[foe] / params.dps
+            won = finish <= HOUR_SECONDS
+            rows, foes = fighting[won], foe[won]
+            np.add.at(kills, (rows, foes), 1)
+            gold_total[rows] += gold[foes]
+            cores[rows] += rng.random(len(rows)) < core[foes]
+            ready[fighting, slot] = finish + tables.respawn[node[fighting]]
+            now[fighting] = finish
+        waiting = np.flatnonzero(active & ~available.any(axis=1))
+        if len(waiting):
+            pending = np.where(monster[waiting] >= 0, ready[waiting], np.inf).min(axis=1)
+            now[waiting] = np.minimum(pending, next_batch[waiting])
+        active = now < HOUR_SECONDS
+
+    kills_per_lane = kills.sum(axis=1)
+    node_reports: List[NodeEconomy] = []
+    for position, (map_id, node_id) in enumerate(tables.places):
+        rows = slice(position * trials, (position + 1) * trials)
+        mean_kills = kills[rows, :-1].mean(axis=0)
+        node_reports.append(
+            NodeEconomy(
+                mapId=map_id,
+                nodeId=node_id,
+                killsPerHour=_distribution(kills_per_lane[rows]),
+                goldPerHour=_distribution(gold_total[rows]),
+                coreDropsPerHour=_distribution(cores[rows]),
+                encounters={
+                    monsters[column].id: float(mean_kills[column])
+                    for column in np.flatnonzero(mean_kills)
+                },
+            )
+        )
+
+    map_reports: List[MapEconomy] = []
+    map_ids = list(dict.fromkeys(map_id for map_id, _ in tables.places))
+    for map_id in map_ids:
+        rows = np.isin(node, [i for i, (m, _) in enumerate(tables.places) if m == map_id])
+        map_reports.append(
+            MapEconomy(
+                mapId=map_id,
+                nodes=int(rows.sum() // max(trials, 1)),
+                killsPerHour=_distribution(kills_per_lane[rows]),
+                goldPerHour=_distribution(gold_total[rows]),
+                coreDropsPerHour=_distribution(cores[rows]),
+            )
+        )
+
+    return EconomyReport(
+        trials=trials,
+        dps=params.dps,
+        engageSeconds=params.engage_seconds,
+        seed=params.seed,
+        nodes=node_reports,
+        maps=map_reports,
+        missingMonsters=tables.missing,
+    )
+
+
+_reports: "OrderedDict[Hashable, EconomyReport]" = OrderedDict()
+_reports_lock = threading.Lock()
+
+
+def economy_report(
+    settings: Settings, params: SimulationParams = SimulationParams()
+) -> EconomyReport:
+    """Simulate the configured data, reusing the report while the data is unchanged."""
+    from .repository import MapRepository, MonsterRepository
+
+    _require_numpy()
+    maps = MapRepository.from_settings(settings)
+    monsters = MonsterRepository.from_settings(settings)
+    key = (maps.etag(), monsters.etag(), params)
+    with _reports_lock:
+        report = _reports.get(key)
+        if report is not None:
+            _reports.move_to_end(key)
+            return report
+    report = simulate_economy(maps.list(), monsters.list(), params)
+    with _reports_lock:
+        _reports[key] = report
+        while len(_reports) > CACHE_SIZE:
+            _reports.popitem(last=False)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Simulate kills, gold and core drops per hour at every battle node."
+    )
+    defaults = SimulationParams()
+    parser.add_argument("--trials", type=int, default=defaults.trials)
+    parser.add_argument("--dps", type=float, default=defaults.dps)
+    parser.add_argument("--engage-seconds", type=float, default=defaults.engage_seconds)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--map", dest="map_id", help="only print nodes of this map")
+    args = parser.parse_args(argv)
+    params = SimulationParams(
+        trials=args.trials, dps=args.dps, engage_seconds=args.engage_seconds, seed=args.seed
+    )
+    report = economy_report(get_settings(), params)
+    for entry in report.maps:
+        if args.map_id and entry.mapId != args.map_id:
+            continue
+        print(
+            f"{entry.mapId}: {entry.killsPerHour.mean:.1f} kills/h, "
+            f"{entry.goldPerHour.mean:.0f} gold/h "
+            f"(p10 {entry.goldPerHour.p10:.0f}, p90 {entry.goldPerHour.p90:.0f}), "
+            f"{entry.coreDropsPerHour.mean:.2f} cores/h"
+        )
+        for node_entry in report.nodes:
+            if node_entry.mapId == entry.mapId:
+                print(
+                    f"  {node_entry.nodeId}: {node_entry.killsPerHour.mean:.1f} kills/h, "
+                    f"{node_entry.goldPerHour.mean:.0f} gold/h"
+                )
+    if report.missingMonsters:
+        print("missing monsters: " + ", ".join(repr(m) for m in report.missingMonsters))
+
+
+if __name__ == "__main__":
+    main()
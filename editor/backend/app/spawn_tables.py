@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .indexes import CollectionIndex
+from .models import MapMetadata, SpawnConfig
+
+#: File written next to ``map-metadata.json`` by the export.
+SPAWN_TABLES_NAME = "spawn-tables.json"
+SPAWN_TABLES_VERSION = 1
+
+
+@dataclass(frozen=True)
+class AliasTable:
+    """Weighted choice among ``ids`` in constant time (Walker/Vose alias method).
+
+    A draw picks a column uniformly, then keeps it with ``probability``
+    or takes its ``alias`` otherwise. Entries with a non-positive weight
+    are never drawn, matching the game's cumulative-weight roll.
+    """
+
+    ids: Tuple[str, ...]
+    probability: Tuple[float, ...]
+    alias: Tuple[int, ...]
+
+    @classmethod
+    def build(cls, entries: Sequence[Tuple[str, float]]) -> Optional["AliasTable"]:
+        """Compile ``(id, weight)`` pairs; ``None`` when no weight is positive."""
+        entries = [(entry_id, float(weight)) for entry_id, weight in entries if weight > 0]
+        if not entries:
+            return None
+        count = len(entries)
+        total = sum(weight for _, weight in entries)
+        scaled = [weight * count / total for _, weight in entries]
+        probability = [1.0] * count
+        alias = list(range(count))
+        small = [column for column, value in enumerate(scaled) if value < 1.0]
+        large = [column for column, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            probability[low] = scaled[low]
+            alias[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            (small if scaled[high] < 1.0 else large).append(high)
+        # Whatever is left is 1.0 up to rounding and keeps its own column
+        return cls(
+            ids=tuple(entry_id for entry_id, _ in entries),
+            probability=tuple(probability),
+            alias=tuple(alias),
+        )
+
+    def draw(self, rng: random.Random) -> str:
+        column = rng.randrange(len(self.ids))
+        if rng.random() >= self.probability[column]:
+            column = self.alias[column]
+        return self.ids[column]
+
+
+@dataclass(frozen=True)
+class CompiledSpawn:
+    """A node's spawn config with its monster weights compiled to an alias table."""
+
+    min: int
+    max: int
+    intervalSeconds: int
+    respawnSeconds: int
+    #: ``None`` when the node lists no monster with a positive weight.
+    table: Optional[AliasTable]
+
+    @classmethod
+    def of(cls, spawn: SpawnConfig) -> "CompiledSpawn":
+        return cls(
+            min=spawn.min,
+            max=spawn.max,
+            intervalSeconds=spawn.intervalSeconds,
+            respawnSeconds=spawn.respawnSeconds,
+            table=AliasTable.build([(entry.id, entry.weight) for entry in spawn.monsters]),
+        )
+
+    def sample(self, count: int, rng: random.Random) -> List[str]:
+        """Draw ``count`` monster ids independently."""
+        if self.table is None:
+            return []
+        return [self.table.draw(rng) for _ in range(count)]
+
+    def to_json(self) -> Dict[str, Any]:
+        table = self.table
+        return {
+            "min": self.min,
+            "max": self.max,
+            "intervalSeconds": self.intervalSeconds,
+            "respawnSeconds": self.respawnSeconds,
+            "monsters": list(table.ids) if table else [],
+            "probability": list(table.probability) if table else [],
+            "alias": list(table.alias) if table else [],
+        }
+
+
+class SpawnTableIndex(CollectionIndex):
+    """Compiled spawn tables of every battle node, keyed by map.
+
+    A map's nodes are compiled when the map is added or replaced, so an
+    upsert recompiles only that map.
+    """
+
+    def __init__(self) -> None:
+        self._maps: Dict[str, Dict[str, CompiledSpawn]] = {}
+
+    def add(self, record_id: str, item: MapMetadata) -> None:
+        self._maps[record_id] = {
+            node.id: CompiledSpawn.of(node.spawn)
+            for node in item.nodes or []
+            if node.spawn is not None
+        }
+
+    def remove(self, record_id: str, item: MapMetadata) -> None:
+        self._maps.pop(record_id, None)
+
+    def get(self, map_id: str, node_id: str) -> Optional[CompiledSpawn]:
+        return self._maps.get(map_id, {}).get(node_id)
+
+    def document(self, order: Sequence[str]) -> Dict[str, Any]:
+        """The exported artifact, with maps in collection ``order``."""
+        return {
+            "version": SPAWN_TABLES_VERSION,
+            "maps": {
+                map_id: {node_id: spawn.to_json() for node_id, spawn in self._maps[map_id].items()}
+                for map_id in order
+                if self._maps.get(map_id)
+            },
+        }
+
+
+def dumps_spawn_tables(document: Dict[str, Any]) -> bytes:
+    """Compact encoding for the artifact; it is read by code, not by people."""
+    return (json.dumps(document, ensure_ascii=False, separators=(",", ":")) + "\n").encode(
+        "utf-8"
+    )
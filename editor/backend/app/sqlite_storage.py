@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .cache import RecordCollection
+from .storage import RecordStorage
+from .writer import Mutation, Upsert
+
+_META_TABLE = "collection_meta"
+
+
+class SqliteStorage(RecordStorage):
+    """Records of one collection stored in a table of a WAL-mode SQLite database.
+
+    Each row holds the record as JSON next to copies of ``indexed_fields``
+    (column name -> record key), which get their own indexes. A per
+    collection version counter in ``collection_meta`` is bumped by every
+    write transaction and serves as the cache signature. On first use an
+    empty table is seeded from ``seed``, typically the canonical JSON file.
+    """
+
+    supports_fetch = True
+
+    def __init__(
+        self,
+        db_file: Path,
+        table: str,
+        indexed_fields: Optional[Dict[str, str]] = None,
+        seed: Optional[RecordStorage] = None,
+        on_commit: Optional[Callable[[RecordCollection], None]] = None,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.db_file = db_file
+        self.table = table
+        self.indexed_fields = dict(indexed_fields or {})
+        self.seed = seed
+        self.on_commit = on_commit
+        self.key = (db_file, table)
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.db_file, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+        if not self._ready:
+            self._initialize(connection)
+        return connection
+
+    def _seeded(self, connection: sqlite3.Connection) -> bool:
+        """Whether the schema exists and the table was seeded, checked with a plain read."""
+        try:
+            row = connection.execute(
+                f"SELECT 1 FROM {_META_TABLE} WHERE collection = ?", (self.table,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None
+
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        with self._ready_lock:
+            if self._ready:
+                return
+            # The schema and seed are written in one transaction, so a seeded
+            # table needs no write lock
+            if self._seeded(connection):
+                self._ready = True
+                return
+            columns = "".join(f", {column}" for column in self.indexed_fields)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {_META_TABLE} ("
+                    "collection TEXT PRIMARY KEY, version INTEGER NOT NULL, meta TEXT NOT NULL)"
+                )
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    f"id TEXT PRIMARY KEY, position INTEGER NOT NULL{columns}, data TEXT NOT NULL)"
+                )
+                for column in self.indexed_fields:
+                    connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS ix_{self.table}_{column} "
+                        f"ON {self.table} ({column})"
+                    )
+                seeded = connection.execute(
+                    f"SELECT 1 FROM {_META_TABLE} WHERE collection = ?", (self.table,)
+                ).fetchone()
+                if seeded is None:
+                    records, meta = self.seed.load() if self.seed is not None else ([], {})
+                    for position, record in enumerate(records):
+                        self._insert(connection, record, position)
+                    connection.execute(
+                        f"INSERT INTO {_META_TABLE} (collection, version, meta) VALUES (?, 1, ?)",
+                        (self.table, json.dumps(meta, ensure_ascii=False)),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._ready = True
+
+    def _row(self, record: Dict[str, Any]) -> List[Any]:
+        values = [record.get(field) for field in self.indexed_fields.values()]
+        return [record["id"], *values, json.dumps(record, ensure_ascii=False)]
+
+    def _insert(self, connection: sqlite3.Connection, record: Dict[str, Any], position: int) -> None:
+        columns = "".join(f", {column}" for column in self.indexed_fields)
+        placeholders = ", ?" * len(self.indexed_fields)
+        record_id, *rest = self._row(record)
+        connection.execute(
+            f"INSERT INTO {self.table} (id, position{columns}, data) "
+            f"VALUES (?, ?{placeholders}, ?)",
+            (record_id, position, *rest),
+        )
+
+    def signature(self) -> Any:
+        row = self._connection().execute(
+            f"SELECT version FROM {_META_TABLE} WHERE collection = ?", (self.table,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            rows = connection.execute(f"SELECT data FROM {self.table} ORDER BY position").fetchall()
+            meta_row = connection.execute(
+                f"SELECT meta FROM {_META_TABLE} WHERE collection = ?", (self.table,)
+            ).fetchone()
+        finally:
+            connection.execute("COMMIT")
+        meta = json.loads(meta_row[0]) if meta_row else {}
+        return [json.loads(data) for (data,) in rows], meta
+
+    def fetch(self, record_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            f"SELECT data FROM {self.table} WHERE id = ?", (record_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def persist(self, collection: RecordCollection, mutations: List[Mutation]) -> None:
+        connection = self._connection()
+        assignments = "".join(f", {column} = excluded.{column}" for column in self.indexed_fields)
+        columns = "".join(f", {column}" for column in self.indexed_fields)
+        placeholders = ", ?" * len(self.indexed_fields)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for mutation in mutations:
+                if isinstance(mutation, Upsert):
+                    record_id, *rest = self._row(mutation.record)
+                    connection.execute(
+                        f"INSERT INTO {self.table} (id, position{columns}, data) "
+                        f"VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM {self.table})"
+                        f"{placeholders}, ?) "
+                        f"ON CONFLICT(id) DO UPDATE SET data = excluded.data{assignments}",
+                        (record_id, *rest),
+                    )
+                else:
+                    connection.execute(
+                        f"DELETE FROM {self.table} WHERE id = ?", (mutation.record_id,)
+                    )
+            connection.execute(
+                f"UPDATE {_META_TABLE} SET version = version + 1, meta = ? WHERE collection = ?",
+                (json.dumps(collection.meta, ensure_ascii=False), self.table),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if self.on_commit is not None:
+            self.on_commit(collection)
+
+    def rewrite(self, collection: RecordCollection) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(f"DELETE FROM {self.table}")
+            for position, record in enumerate(collection.records()):
+                self._insert(connection, record, position)
+            connection.execute(
+                f"UPDATE {_META_TABLE} SET version = version + 1, meta = ? WHERE collection = ?",
+                (json.dumps(collection.meta, ensure_ascii=False), self.table),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+
+_storages: Dict[Hashable, SqliteStorage] = {}
+_storages_lock = threading.Lock()
+
+
+def get_sqlite_storage(key: Hashable, factory: Callable[[], SqliteStorage]) -> SqliteStorage:
+    """Return the process-wide storage for ``key``, creating it with ``factory``.
+
+    Sharing one instance keeps its per-thread connections and its schema
+    check alive across requests.
+    """
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            storage = _storages[key] = factory()
+        return storage
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .cache import RecordCollection, file_signature
+from .journal import EditJournal, JournalOptions, get_journal, journal_path, read_journal
+from .writer import Mutation, Upsert, write_atomic
+
+
+class JsonDocument:
+    """Layout of a canonical JSON data file holding a list of records."""
+
+    def __init__(self, indent: int = 2):
+        self.indent = indent
+
+    def empty(self) -> Any:
+        return []
+
+    def parse(self, data: Any) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Split the file document into records and collection metadata."""
+        return data, {}
+
+    def build(self, collection: RecordCollection) -> Any:
+        """Build the file document for ``collection``."""
+        return collection.records()
+
+    def dumps(self, collection: RecordCollection) -> bytes:
+        text = json.dumps(self.build(collection), ensure_ascii=False, indent=self.indent)
+        return (text + "\n").encode("utf-8")
+
+    def read(self, path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        if not path.exists():
+            return self.parse(self.empty())
+        with path.open("r", encoding="utf-8") as fp:
+            return self.parse(json.load(fp))
+
+
+class RecordStorage(ABC):
+    """Backend holding the records of one collection.
+
+    Repositories keep the parsed records in the process-wide collection
+    cache and only call into the storage to (re)load them, to check
+    whether the cached copy is still current and to persist committed
+    mutations.
+    """
+
+    #: Identifies the collection in the collection cache and writer registry.
+    key: Hashable
+    #: Whether :meth:`fetch` can look up single records without a full load.
+    supports_fetch = False
+
+    @abstractmethod
+    def signature(self) -> Any:
+        """Cheap token that changes whenever the stored records change."""
+
+    @abstractmethod
+    def load(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return all records in stored order together with collection metadata."""
+
+    @abstractmethod
+    def persist(self, collection: RecordCollection, mutations: List[Mutation]) -> None:
+        """Durably store ``mutations``, already applied to ``collection``."""
+
+    def rewrite(self, collection: RecordCollection) -> None:
+        """Bring the stored representation fully in line with ``collection``."""
+
+    def fetch(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Look up one record without a full load; ``None`` if it is missing."""
+        return None
+
+
+class JsonStorage(RecordStorage):
+    """Records stored in a canonical JSON file, optionally with an edit journal.
+
+    Without ``journal`` options every commit rewrites the file. With them
+    commits append to a sidecar ``<file>.journal`` that readers replay over
+    the file; ``compact`` is called in the background to fold it back.
+    """
+
+    def __init__(
+        self,
+        data_file: Path,
+        document: JsonDocument,
+        journal: Optional[JournalOptions] = None,
+        compact: Optional[Callable[[], None]] = None,
+    ):
+        self.data_file = data_file
+        self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.document = document
+        self.journal_options = journal
+        self.journal_file = journal_path(data_file)
+        self._compact = compact
+        self.key = data_file
+
+    def signature(self) -> Any:
+        return (file_signature(self.data_file), file_signature(self.journal_file))
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        records, meta = self.document.read(self.data_file)
+        mutations = read_journal(self.journal_file)
+        if not mutations:
+            return records, meta
+        if self.journal_options is not None:
+            self._journal()
+        replayed = {record["id"]: record for record in records}
+        for mutation in mutations:
+            if isinstance(mutation, Upsert):
+                replayed[mutation.record["id"]] = mutation.record
+            else:
+                replayed.pop(mutation.record_id, None)
+        return list(replayed.values()), meta
+
+    def persist(self, collection: RecordCollection, mutations: List[Mutation]) -> None:
+        if self.journal_options is not None:
+            self._journal().append(mutations)
+        else:
+            self.rewrite(collection)
+
+    def rewrite(self, collection: RecordCollection) -> None:
+        """Write the canonical file and drop any journal it now subsumes."""
+        write_atomic(self.data_file, self.document.dumps(collection))
+        if self.journal_options is not None:
+            self._journal().clear()
+        elif self.journal_file.exists():
+            self.journal_file.unlink()
+
+    def _journal(self) -> EditJournal:
+        return get_journal(
+            self.journal_file,
+            lambda: EditJournal(
+                self.journal_file, self.journal_options, self._compact or (lambda: None)
+            ),
+        )
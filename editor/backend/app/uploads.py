@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import anyio
+from fastapi import UploadFile
+
+from .writer import atomic_file
+
+#: Bytes read from an upload and written to disk at a time.
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """An upload exceeded the configured size limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the limit of {limit} bytes")
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+
+
+def _flush(destination: BinaryIO) -> None:
+    destination.flush()
+    os.fsync(destination.fileno())
+
+
+async def store_upload(upload: UploadFile, path: Path, max_bytes: int) -> StoredUpload:
+    """Stream ``upload`` to ``path`` in :data:`CHUNK_SIZE` chunks, hashing it on the way.
+
+    The data goes to a temp file in the target directory that replaces
+    ``path`` atomically once complete, so readers never see a partial
+    file and at most one chunk is held in memory. Raises
+    :class:`UploadTooLarge`, leaving ``path`` untouched, as soon as more
+    than ``max_bytes`` have arrived.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with atomic_file(path) as destination:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+            await anyio.to_thread.run_sync(destination.write, chunk)
+        # Flushed here so the commit on exit does not block the event loop
+        await anyio.to_thread.run_sync(_flush, destination)
+    return StoredUpload(path, size, digest.hexdigest())
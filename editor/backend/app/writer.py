@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .cache import RecordCollection
+
+COMMIT_WINDOW_SECONDS = 0.002
+IDLE_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class Upsert:
+    record: Dict[str, Any]
+    #: Model already validated for ``record``, if the caller has one.
+    item: Optional[Any] = field(default=None, compare=False)
+
+
+@dataclass(frozen=True)
+class Delete:
+    record_id: str
+
+
+@dataclass(frozen=True)
+class Patch:
+    """Read-modify-write of one record, resolved to an :class:`Upsert` when applied.
+
+    ``transform(record, item)`` receives the current record and model and
+    returns the new record together with its validated model, or ``None``
+    to have the whole record validated. It must not modify its arguments.
+    """
+
+    record_id: str
+    transform: Callable[[Dict[str, Any], Any], Tuple[Dict[str, Any], Optional[Any]]]
+
+
+Mutation = Union[Upsert, Delete, Patch]
+
+
+def resolve_patch(collection: RecordCollection, patch: Patch) -> Upsert:
+    """Turn ``patch`` into an upsert against the current state of ``collection``."""
+    record, item = patch.transform(
+        collection.get_record(patch.record_id), collection.get(patch.record_id)
+    )
+    return Upsert(record, item)
+
+
+def apply_mutation(collection: RecordCollection, mutation: Mutation) -> Any:
+    if isinstance(mutation, Patch):
+        mutation = resolve_patch(collection, mutation)
+    if isinstance(mutation, Upsert):
+        return collection.upsert(mutation.record, mutation.item)
+    return collection.delete(mutation.record_id)
+
+
+def _mutation_id(mutation: Mutation) -> str:
+    if isinstance(mutation, Upsert):
+        return mutation.record["id"]
+    return mutation.record_id
+
+
+def apply_mutations(
+    collection: RecordCollection, mutations: List[Mutation]
+) -> List[Tuple[Any, bool]]:
+    """Apply ``mutations`` all-or-nothing.
+
+    Returns ``(result, existed)`` per mutation, where ``existed`` tells
+    whether the record was present before the mutation. If any mutation
+    raises, the earlier ones are undone and the exception propagates.
+    :class:`Patch` entries are replaced in ``mutations`` by the upserts they
+    resolve to, so storage backends only ever persist upserts and deletes.
+    """
+    with collection.lock:
+        order = collection.ids() if collection.sort_key is None and len(mutations) > 1 else None
+        undo: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        outcomes: List[Tuple[Any, bool]] = []
+        try:
+            for position, mutation in enumerate(mutations):
+                if isinstance(mutation, Patch):
+                    mutation = mutations[position] = resolve_patch(collection, mutation)
+                record_id = _mutation_id(mutation)
+                previous = collection.get_record(record_id) if record_id in collection else None
+                result = apply_mutation(collection, mutation)
+                undo.append((record_id, previous))
+                outcomes.append((result, previous is not None))
+        except BaseException:
+            for record_id, previous in reversed(undo):
+                if previous is None:
+                    collection.delete(record_id)
+                else:
+                    collection.upsert(previous)
+            if order is not None and undo:
+                collection.reorder(order)
+            raise
+        return outcomes
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Durably replace ``path`` with ``data`` via a temp file, fsync and ``os.replace``."""
+    with atomic_file(path) as fp:
+        fp.write(data)
+
+
+@contextmanager
+def atomic_file(path: Path) -> Iterator[BinaryIO]:
+    """A temp file next to ``path`` that durably replaces it once the block exits.
+
+    If the block raises, the temp file is removed and ``path`` is left as it was.
+    """
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            yield fp
+            fp.flush()
+            os.fsync(fp.fileno())
+        if path.exists():
+            shutil.copymode(path, tmp_name)
+        else:
+            os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@dataclass
+class _Pending:
+    mutations: List[Mutation]
+    future: Future = field(default_factory=Future)
+
+
+class GroupCommitWriter:
+    """Serialises the mutations of one data file and commits them in batches.
+
+    Mutations submitted while a commit is in flight, or within
+    ``window`` seconds of the first one, are applied to the cached
+    collection together and persisted with a single ``persist`` call.
+    Each caller is released only after the batch holding its mutations is
+    durable, and receives its own result or exception; the mutations of
+    one :meth:`submit_all` call are applied all-or-nothing. Other maintenance
+    of the file, such as compaction, holds ``commit_lock`` to stay out of
+    the way of in-flight commits.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], RecordCollection],
+        persist: Callable[[RecordCollection, List[Mutation]], None],
+        invalidate: Callable[[], None],
+        window: float = COMMIT_WINDOW_SECONDS,
+    ):
+        self._load = load
+        self._persist = persist
+        self._invalidate = invalidate
+        self.window = window
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, mutation: Mutation) -> Any:
+        result, _ = self.submit_all([mutation])[0]
+        return result
+
+    def submit_all(self, mutations: List[Mutation]) -> List[Tuple[Any, bool]]:
+        """Commit ``mutations`` atomically; see :func:`apply_mutations`."""
+        pending = _Pending(list(mutations))
+        with self._lock:
+            self._queue.put(pending)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit-writer", daemon=True
+                )
+                self._thread.start()
+        return pending.future.result()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=IDLE_TIMEOUT_SECONDS)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            batch = self._collect(first)
+            with self.commit_lock:
+                self._commit(batch)
+
+    def _collect(self, first: _Pending) -> List[_Pending]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _commit(self, batch: List[_Pending]) -> None:
+        try:
+            collection = self._load()
+        except BaseException as exc:
+            for pending in batch:
+                pending.future.set_exception(exc)
+            return
+
+        applied: List[Tuple[_Pending, Any]] = []
+        with collection.lock:
+            for pending in batch:
+                try:
+                    result = apply_mutations(collection, pending.mutations)
+                except Exception as exc:
+                    pending.future.set_exception(exc)
+                else:
+                    applied.append((pending, result))
+            if not applied:
+                return
+            try:
+                self._persist(
+                    collection,
+                    [mutation for pending, _ in applied for mutation in pending.mutations],
+                )
+            except BaseException as exc:
+                self._invalidate()
+                for pending, _ in applied:
+                    pending.future.set_exception(exc)
+                return
+        for pending, result in applied:
+            pending.future.set_result(result)
+
+
+_writers: Dict[Hashable, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(key: Hashable, factory: Callable[[], GroupCommitWriter]) -> GroupCommitWriter:
+    """Return the process-wide writer for ``key``, creating it with ``factory``."""
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = factory()
+        return writer
@@ -16,6 +16,8 @@ def test_settings(tmp_path: Path) -> Settings:
     data_src = tests_root / "data" / "monster-blueprints-test.json"
     data_file = tmp_path / "monster-blueprints.json"
     shutil.copy(data_src, data_file)
+    map_file = tmp_path / "map-metadata.json"
+    shutil.copy(tests_root / "data" / "map-metadata-test.json", map_file)
 
     raw_src = tests_root / "data" / "assets" / "raw" / "m-alpha.png"
     webp_src = tests_root / "data" / "assets" / "webp" / "m-alpha.webp"
@@ -36,6 +38,7 @@ def test_settings(tmp_path: Path) -> Settings:
     return Settings(
         repo_root=tmp_path,
         data_file=data_file,
+        map_metadata_file=map_file,
         raw_assets_dir=raw_assets_dir,
         webp_assets_dir=webp_assets_dir,
         conversion_script=conversion_script,
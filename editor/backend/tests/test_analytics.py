@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.analytics import snapshot  # noqa: E402
+
+
+def test_monster_aggregates_by_tier(client):
+    response = client.get(
+        "/api/analytics/monsters",
+        params={"metric": "hp", "group_by": "realmTier", "percentiles": "50,90", "bins": 4},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["binEdges"] == [100.0, 125.0, 150.0, 175.0, 200.0]
+    groups = {group["key"]["realmTier"]: group for group in report["groups"]}
+    assert set(groups) == {1, 2}
+    assert groups[2]["count"] == 1
+    assert groups[2]["percentiles"] == {"p50": 200.0, "p90": 200.0}
+    assert groups[1]["histogram"] == [1, 0, 0, 0]
+    assert report["outliers"] == []
+
+    assert client.get("/api/analytics/monsters", params={"metric": "name"}).status_code == 400
+    category = client.get("/api/analytics/monsters", params={"metric": "specialization"})
+    assert category.status_code == 400
+    assert client.get("/api/analytics/items", params={"metric": "hp"}).status_code == 404
+
+
+def test_snapshot_is_rebuilt_only_after_writes(client, test_settings):
+    first = snapshot(test_settings, "monsters")
+    assert snapshot(test_settings, "monsters") is first
+
+    monster = {"name": "Extra", "realmTier": 1, "bp": 10, "specialization": "balanced"}
+    for index in range(8):
+        client.post("/api/monsters", json={**monster, "id": f"m-extra-{index}", "hp": 100 + index})
+    client.post("/api/monsters", json={**monster, "id": "m-giant", "hp": 5000})
+    assert snapshot(test_settings, "monsters") is not first
+
+    report = client.get(
+        "/api/analytics/monsters", params={"metric": "hp", "group_by": "realmTier"}
+    ).json()
+    groups = {group["key"]["realmTier"]: group for group in report["groups"]}
+    values = np.array([100.0] + [100.0 + index for index in range(8)] + [5000.0])
+    assert groups[1]["percentiles"]["p90"] == pytest.approx(np.percentile(values, 90))
+    assert [outlier["id"] for outlier in report["outliers"]] == ["m-giant"]
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from app.file_responses import RangeFileResponse, parse_ranges
+
+TRACK = bytes(range(256)) * 64
+
+
+@pytest.fixture
+def track(test_settings, tmp_path):
+    test_settings.assets_dir = tmp_path / "music"
+    test_settings.assets_dir.mkdir()
+    path = test_settings.assets_dir / "theme.mp3"
+    path.write_bytes(TRACK)
+    return path
+
+
+def test_parse_ranges():
+    assert parse_ranges("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_ranges("bytes=900-", 1000) == [(900, 999)]
+    assert parse_ranges("bytes=-100", 1000) == [(900, 999)]
+    assert parse_ranges("bytes=-5000", 1000) == [(0, 999)]
+    assert parse_ranges("bytes=500-600, 0-9", 1000) == [(500, 600), (0, 9)]
+    assert parse_ranges("bytes=0-9, 5-20, 21-30", 1000) == [(0, 30)]
+    assert parse_ranges("bytes=0-9, 2000-", 1000) == [(0, 9)]
+    assert parse_ranges("items=0-9", 1000) is None
+    assert parse_ranges("bytes=9-0", 1000) is None
+    assert parse_ranges("bytes=a-b", 1000) is None
+    assert parse_ranges("bytes=" + ",".join(["0-1"] * 17), 1000) is None
+    with pytest.raises(ValueError):
+        parse_ranges("bytes=1000-", 1000)
+    with pytest.raises(ValueError):
+        parse_ranges("bytes=-0", 1000)
+
+
+def test_music_stream_serves_ranges(client, track):
+    url = "/api/music/theme.mp3/stream"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == TRACK
+    assert full.headers["content-type"] == "audio/mpeg"
+
+    suffix = client.get(url, headers={"Range": "bytes=-500"})
+    assert suffix.status_code == 206
+    assert suffix.content == TRACK[-500:]
+    assert suffix.headers["content-range"] == "bytes 15884-16383/16384"
+
+    multi = client.get(url, headers={"Range": "bytes=0-9, 1000-1099"})
+    assert multi.status_code == 206
+    content_type = multi.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(multi.headers["content-length"]) == len(multi.content)
+    parts = multi.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    head, body = parts[1].split(b"\r\n\r\n", 1)
+    assert b"Content-Range: bytes 0-9/16384" in head
+    assert body == TRACK[:10] + b"\r\n"
+    head, body = parts[2].split(b"\r\n\r\n", 1)
+    assert b"Content-Range: bytes 1000-1099/16384" in head
+    assert body == TRACK[1000:1100] + b"\r\n"
+
+    head = client.head(url, headers={"Range": "bytes=0-9"})
+    assert head.status_code == 200
+    assert head.content == b""
+    assert head.headers["content-length"] == str(len(TRACK))
+    assert head.headers["etag"] == full.headers["etag"]
+
+    assert client.get("/api/music/missing.mp3/stream").status_code == 404
+
+
+def test_range_response_uses_zerocopy_when_offered(track):
+    response = RangeFileResponse(track, len(TRACK), [(10, 19), (100, 109)], "audio/mpeg", {})
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": {"http.response.zerocopy": {}}}
+    asyncio.run(response(scope, None, send))
+    sent = [(message["offset"], message["count"]) for message in messages if "count" in message]
+    assert sent == [(10, 10), (100, 10)]
+    assert messages[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+def test_music_upload_is_hashed_and_streamed(client, track, test_settings):
+    data = b"ID3" + bytes(range(256)) * 8
+    files = {"file": ("new.mp3", io.BytesIO(data), "audio/mpeg")}
+    response = client.post("/api/music/upload", files=files)
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "filename": "new.mp3",
+        "size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+    assert (test_settings.assets_dir / "new.mp3").read_bytes() == data
+    assert client.post("/api/music/upload", files=files).status_code == 409
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from app.jobs import JobQueue
+
+
+def _wait(job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return job
+
+
+def test_queue_caps_dedupes_and_cancels(tmp_path):
+    queue = JobQueue(max_running=1)
+    slow = [sys.executable, "-c", "import time; print('Saved a', flush=True); time.sleep(30)"]
+    fast = [sys.executable, "-c", "print('Saved b')"]
+
+    running = queue.submit("convert", slow, str(tmp_path))
+    queued = queue.submit("convert", fast, str(tmp_path))
+    assert queue.submit("other", fast, str(tmp_path)) is queued
+    # Identical to the running job, so it is queued rather than merged
+    again = queue.submit("convert", slow, str(tmp_path))
+    assert again is not running
+    assert (running.state, queued.state, again.state) == ("running", "queued", "queued")
+
+    assert queue.cancel(again.id).state == "cancelled"
+    while running.steps < 1:
+        time.sleep(0.02)
+    queue.cancel(running.id)
+    assert _wait(running).state == "cancelled"
+    assert _wait(queued).state == "succeeded"
+    assert (queued.steps, queued.message, queued.return_code) == (1, "Saved b", 0)
+
+    failing = _wait(queue.submit("convert", [sys.executable, "-c", "raise SystemExit(3)"], "."))
+    assert (failing.state, failing.return_code) == ("failed", 3)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_cancel_stops_the_children_of_a_job(tmp_path):
+    queue = JobQueue(max_running=1)
+    script = (
+        "import subprocess, sys\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+        "print(child.pid, flush=True)\n"
+        "child.wait()\n"
+    )
+    job = queue.submit("convert", [sys.executable, "-c", script], str(tmp_path))
+    while not job.message:
+        time.sleep(0.02)
+    child = int(job.message)
+
+    started = time.monotonic()
+    queue.cancel(job.id)
+    assert _wait(job, timeout=3.0).state == "cancelled"
+    assert time.monotonic() - started < 3.0
+    deadline = time.monotonic() + 3.0
+    while _alive(child) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not _alive(child)
+
+
+def test_conversion_job_endpoints(client, test_settings):
+    test_settings.conversion_python = Path(sys.executable)
+    test_settings.conversion_script.write_text(
+        "print('Saved one.webp')\nprint('Saved two.webp')\n", encoding="utf-8"
+    )
+    submitted = client.post("/api/equipment/convert")
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+
+    with client.stream("GET", f"/api/jobs/{job_id}/events") as events:
+        updates = [
+            json.loads(line.removeprefix("data: "))
+            for line in events.iter_lines()
+            if line.startswith("data: ")
+        ]
+    final = updates[-1]
+    assert (final["state"], final["steps"], final["kind"]) == ("succeeded", 2, "equipment-images")
+    assert client.get(f"/api/jobs/{job_id}").json() == final
+    assert job_id in [job["id"] for job in client.get("/api/jobs").json()]
+
+    assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 409
+    assert client.get("/api/jobs/unknown").status_code == 404
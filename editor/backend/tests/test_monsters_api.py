@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import io
-import subprocess
+import json
+import sys
+import time
 from pathlib import Path
 
 import pytest
 
+from app.pagination import encode_cursor
+
 
 def _sample_monster() -> dict:
     return {
@@ -73,6 +77,20 @@ def test_list_all_asset_statuses(client):
     assert payload["m-beta"] == {"png": True, "webp": True}
 
 
+def test_asset_statuses_follow_directory_changes(client, test_settings):
+    raw_dir = test_settings.raw_assets_dir
+    assert client.get("/api/monsters/assets/statuses").json()["m-alpha"]["png"] is True
+
+    (raw_dir / "m-alpha.png").rename(raw_dir / "m-alpha-2.png")
+    assert client.get("/api/monsters/m-alpha/assets").json()["png"] is True
+    (raw_dir / "m-alpha-2.png").unlink()
+    assert client.get("/api/monsters/assets/statuses").json()["m-alpha"]["png"] is False
+
+    files = {"file": ("clip.mp4", io.BytesIO(b"\x00" * 16), "video/mp4")}
+    assert client.post("/api/monsters/m-alpha/assets/mp4", files=files).json()["mp4"] is True
+    assert client.get("/api/monsters/assets/statuses").json()["m-alpha"]["mp4"] is True
+
+
 def test_download_monster_asset_with_suffix(client):
     raw_sample = Path(__file__).resolve().parent / "data" / "assets" / "raw" / "m-alpha.png"
     webp_sample = Path(__file__).resolve().parent / "data" / "assets" / "webp" / "m-alpha.webp"
@@ -86,6 +104,37 @@ def test_download_monster_asset_with_suffix(client):
     assert webp_response.content == webp_sample.read_bytes()
 
 
+def test_monster_video_supports_validators_and_ranges(client, test_settings):
+    video = bytes(range(256)) * 4
+    (test_settings.raw_assets_dir / "m-alpha.mp4").write_bytes(video)
+    url = "/api/monsters/m-alpha/assets/mp4"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == video
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["cache-control"] == "no-cache"
+    etag, last_modified = full.headers["etag"], full.headers["last-modified"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    part = client.get(url, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.content == video[100:200]
+    assert part.headers["content-range"] == "bytes 100-199/1024"
+    suffix = client.get(url, headers={"Range": "bytes=-24", "If-Range": etag})
+    assert suffix.status_code == 206
+    assert suffix.content == video[-24:]
+
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == video
+    unsatisfiable = client.get(url, headers={"Range": "bytes=2048-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */1024"
+
+
 def test_upload_monster_png(client, tmp_path, test_settings):
     sample_png = Path(__file__).resolve().parent / "data" / "assets" / "raw" / "m-alpha.png"
     payload = io.BytesIO(sample_png.read_bytes())
@@ -95,16 +144,224 @@ def test_upload_monster_png(client, tmp_path, test_settings):
     assert response.json()["png"] is True
 
 
-def test_convert_missing_assets(client, monkeypatch):
-    class DummyCompleted:
-        returncode = 0
-        stdout = "done"
-        stderr = ""
+def test_upload_is_streamed_atomically_under_size_limit(client, test_settings):
+    test_settings.upload_max_bytes = 64
+    target = test_settings.raw_assets_dir / "m-alpha.mp4"
+    files = {"file": ("clip.mp4", io.BytesIO(b"\x01" * 64), "video/mp4")}
+    assert client.post("/api/monsters/m-alpha/assets/mp4", files=files).json()["mp4"] is True
+    assert target.read_bytes() == b"\x01" * 64
+
+    files = {"file": ("clip.mp4", io.BytesIO(b"\x02" * 65), "video/mp4")}
+    response = client.post("/api/monsters/m-alpha/assets/mp4", files=files)
+    assert response.status_code == 413
+    assert target.read_bytes() == b"\x01" * 64
+    assert not list(test_settings.raw_assets_dir.glob(".*.tmp"))
 
-    def fake_run(*args, **kwargs):
-        return DummyCompleted()
 
-    monkeypatch.setattr(subprocess, "run", fake_run)
+def test_convert_missing_assets(client, test_settings):
+    test_settings.conversion_python = Path(sys.executable)
     response = client.post("/api/monsters/assets/convert")
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    for _ in range(200):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["state"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert job["state"] == "succeeded"
+    assert job["stdout"] == "ok\n"
+
+
+def test_batch_applies_upserts_and_deletes(client):
+    response = client.post(
+        "/api/monsters/batch",
+        json={"upserts": [_sample_monster()], "deletes": ["m-alpha"]},
+    )
     assert response.status_code == 200
-    assert response.json()["succeeded"] is True
+    payload = response.json()
+    assert payload["applied"] is True
+    assert [(item["id"], item["status"]) for item in payload["results"]] == [
+        ("m-gamma", "created"),
+        ("m-alpha", "deleted"),
+    ]
+    fetched = client.get("/api/monsters").json()
+    assert [item["id"] for item in fetched] == ["m-beta", "m-gamma"]
+
+
+def test_batch_is_all_or_none(client, test_settings):
+    before = test_settings.data_file.read_text(encoding="utf-8")
+    response = client.post(
+        "/api/monsters/batch",
+        json={"upserts": [_sample_monster()], "deletes": ["m-alpha", "m-missing"]},
+    )
+    assert response.status_code == 404
+    statuses = {item["id"]: item["status"] for item in response.json()["detail"]["results"]}
+    assert statuses == {"m-gamma": "aborted", "m-alpha": "aborted", "m-missing": "not_found"}
+    assert test_settings.data_file.read_text(encoding="utf-8") == before
+    fetched = client.get("/api/monsters").json()
+    assert [item["id"] for item in fetched] == ["m-alpha", "m-beta"]
+
+    duplicate = client.post("/api/monsters/batch", json={"deletes": ["m-alpha", "m-alpha"]})
+    assert duplicate.status_code == 400
+    assert "m-alpha" in duplicate.json()["detail"]
+    assert test_settings.data_file.read_text(encoding="utf-8") == before
+
+
+def test_search_monsters_ranks_and_supports_cjk(client):
+    client.post("/api/monsters", json={**_sample_monster(), "name": "Alphabet Golem"})
+    client.post(
+        "/api/monsters",
+        json={**_sample_monster(), "id": "m-ember", "name": "赤焰狼王"},
+    )
+
+    ranked = client.get("/api/monsters/search", params={"q": "alpha"}).json()
+    assert [monster["id"] for monster in ranked] == ["m-alpha", "m-gamma"]
+
+    cjk = client.get("/api/monsters/search", params={"q": "焰狼"}).json()
+    assert [monster["id"] for monster in cjk] == ["m-ember"]
+
+    prefix = client.get("/api/monsters/search", params={"q": "m-b", "prefix": True}).json()
+    assert [monster["id"] for monster in prefix] == ["m-beta"]
+
+    client.delete("/api/monsters/m-ember")
+    assert client.get("/api/monsters/search", params={"q": "焰狼"}).json() == []
+
+
+def test_list_monsters_cursor_pagination_and_projection(client):
+    client.post("/api/monsters", json=_sample_monster())
+
+    first = client.get("/api/monsters", params={"limit": 2, "fields": "id,bp"})
+    assert first.status_code == 200
+    assert first.json() == [{"id": "m-alpha", "bp": 50}, {"id": "m-beta", "bp": 100}]
+    cursor = first.headers["X-Next-Cursor"]
+
+    # A record inserted before the cursor must not shift the next page
+    client.post("/api/monsters", json={**_sample_monster(), "id": "m-aaa", "bp": 1})
+    second = client.get("/api/monsters", params={"limit": 2, "cursor": cursor})
+    assert [monster["id"] for monster in second.json()] == ["m-gamma"]
+    assert "X-Next-Cursor" not in second.headers
+
+    invalid = client.get("/api/monsters", params={"cursor": "not-a-cursor"})
+    assert invalid.status_code == 400
+    # Well-formed cursors whose key does not match the collection's order
+    foreign = encode_cursor([["a"], "x"])
+    assert client.get("/api/monsters", params={"cursor": foreign}).status_code == 400
+    foreign = encode_cursor([1, "x"])
+    assert client.get("/api/equipment", params={"cursor": foreign}).status_code == 400
+
+
+def test_list_monsters_honours_if_none_match(client):
+    first = client.get("/api/monsters")
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/monsters", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    client.post("/api/monsters", json=_sample_monster())
+    changed = client.get("/api/monsters", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [monster["id"] for monster in changed.json()] == ["m-alpha", "m-beta", "m-gamma"]
+
+
+def test_full_list_is_served_precompressed(client):
+    monsters = [
+        {**_sample_monster(), "id": f"m-bulk-{index:02d}", "bp": index} for index in range(20)
+    ]
+    client.post("/api/monsters/batch", json={"upserts": monsters})
+
+    plain = client.get("/api/monsters", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    compressed = client.get("/api/monsters", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert int(compressed.headers["Content-Length"]) < len(plain.content)
+    assert compressed.json() == plain.json()
+    assert compressed.json() == client.get("/api/monsters", params={"limit": 100}).json()
+
+    # Variant ETags still validate the shared representation
+    revalidated = client.get(
+        "/api/monsters",
+        headers={"If-None-Match": compressed.headers["ETag"], "Accept-Encoding": "gzip, br;q=0"},
+    )
+    assert revalidated.status_code == 304
+    # ...and the 304 carries the headers the 200 would have
+    assert revalidated.headers["ETag"] == compressed.headers["ETag"]
+    assert revalidated.headers["Vary"] == "Accept-Encoding"
+
+    client.delete("/api/monsters/m-bulk-00")
+    updated = client.get("/api/monsters", headers={"Accept-Encoding": "gzip"})
+    assert "m-bulk-00" not in [monster["id"] for monster in updated.json()]
+
+
+def test_patch_monster_with_merge_and_json_patch(client, test_settings):
+    merged = client.patch(
+        "/api/monsters/m-alpha",
+        json={"name": "Alpha Prime", "rewards": {"gold": 5}},
+        headers={"Content-Type": "application/merge-patch+json"},
+    )
+    assert merged.status_code == 200
+    assert merged.json()["name"] == "Alpha Prime"
+    assert merged.json()["rewards"]["gold"] == 5
+
+    patched = client.patch(
+        "/api/monsters/m-alpha",
+        json=[
+            {"op": "test", "path": "/name", "value": "Alpha Prime"},
+            {"op": "replace", "path": "/bp", "value": 500},
+        ],
+        headers={"Content-Type": "application/json-patch+json"},
+    )
+    assert patched.status_code == 200
+    assert [monster["id"] for monster in client.get("/api/monsters").json()] == [
+        "m-beta",
+        "m-alpha",
+    ]
+
+    conflict = client.patch(
+        "/api/monsters/m-alpha",
+        json=[{"op": "test", "path": "/name", "value": "Alpha"}],
+        headers={"Content-Type": "application/json-patch+json"},
+    )
+    assert conflict.status_code == 409
+
+    invalid = client.patch("/api/monsters/m-alpha", json={"hp": "lots"})
+    assert invalid.status_code == 422
+    renamed = client.patch("/api/monsters/m-alpha", json={"id": "m-other"})
+    assert renamed.status_code == 400
+    missing = client.patch("/api/monsters/m-missing", json={"name": "Nobody"})
+    assert missing.status_code == 404
+
+    records = json.loads(test_settings.data_file.read_text(encoding="utf-8"))
+    on_disk = {record["id"]: record for record in records}
+    assert on_disk["m-alpha"]["name"] == "Alpha Prime"
+    assert on_disk["m-alpha"]["bp"] == 500
+
+
+def test_monster_references_and_checked_delete(client):
+    references = client.get("/api/monsters/m-alpha/references").json()
+    assert references == [
+        {"mapId": "meadow", "nodeId": "meadow-01", "weight": 3},
+        {"mapId": "meadow", "nodeId": "meadow-02", "weight": 1},
+    ]
+    assert client.get("/api/monsters/m-ghost/references").json() == [
+        {"mapId": "meadow", "nodeId": "meadow-02", "weight": 1}
+    ]
+
+    blocked = client.delete("/api/monsters/m-alpha", params={"check_references": True})
+    assert blocked.status_code == 409
+    assert len(blocked.json()["detail"]["references"]) == 2
+
+    client.patch(
+        "/api/maps/meadow/nodes/meadow-01",
+        json={"spawn": {"monsters": [{"id": "m-beta", "weight": 1}]}},
+    )
+    assert [ref["nodeId"] for ref in client.get("/api/monsters/m-alpha/references").json()] == [
+        "meadow-02"
+    ]
+    checked = client.delete("/api/monsters/m-beta", params={"check_references": True})
+    assert checked.status_code == 409
+    assert client.delete("/api/monsters/m-beta").status_code == 204
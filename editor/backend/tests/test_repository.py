@@ -0,0 +1,596 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import ValidationError
+
+from app.best_in_slot import ScoreWeights, quality_rank
+from app.cache import collection_cache
+from app.indexes import CollectionIndex
+from app.journal import JournalOptions, compact_journals
+from app.models import EquipmentItem, MapMetadata, MonsterBlueprint
+from app.patching import apply_merge_patch
+from app.repository import EquipmentRepository, MapRepository, MemberNotFound, MonsterRepository
+from app.spawn_tables import AliasTable
+from app.sqlite_storage import SqliteStorage
+from app.storage import JsonStorage
+
+
+def test_list_is_served_from_cache(test_settings):
+    first = MonsterRepository(test_settings.data_file).list()
+    second = MonsterRepository(test_settings.data_file).list()
+    assert [monster.id for monster in first] == ["m-alpha", "m-beta"]
+    assert all(a is b for a, b in zip(first, second))
+
+
+def test_cache_reloads_after_external_change(test_settings):
+    repository = MonsterRepository(test_settings.data_file)
+    repository.list()
+
+    records = json.loads(test_settings.data_file.read_text(encoding="utf-8"))
+    records[0]["name"] = "Alpha Edited Elsewhere"
+    test_settings.data_file.write_text(json.dumps(records), encoding="utf-8")
+    stat = test_settings.data_file.stat()
+    os.utime(test_settings.data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    names = {monster.id: monster.name for monster in repository.list()}
+    assert names["m-alpha"] == "Alpha Edited Elsewhere"
+
+
+def test_writes_update_cache_in_place(test_settings):
+    repository = MonsterRepository(test_settings.data_file)
+    repository.list()
+    repository.delete("m-alpha")
+
+    assert [monster.id for monster in repository.list()] == ["m-beta"]
+    on_disk = json.loads(test_settings.data_file.read_text(encoding="utf-8"))
+    assert [record["id"] for record in on_disk] == ["m-beta"]
+
+
+def test_concurrent_upserts_are_grouped_and_none_are_lost(test_settings, monkeypatch):
+    repository = MonsterRepository(test_settings.data_file)
+    saves = []
+    original_rewrite = JsonStorage.rewrite
+
+    def counting_rewrite(self, collection):
+        saves.append(len(collection))
+        time.sleep(0.01)
+        original_rewrite(self, collection)
+
+    monkeypatch.setattr(JsonStorage, "rewrite", counting_rewrite)
+
+    def create(index: int) -> None:
+        repository.upsert(
+            MonsterBlueprint(
+                id=f"m-bulk-{index:02d}",
+                name=f"Bulk {index}",
+                realmTier=1,
+                hp=10,
+                bp=index,
+                specialization="balanced",
+            )
+        )
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(create, range(32)))
+
+    on_disk = json.loads(test_settings.data_file.read_text(encoding="utf-8"))
+    assert len(on_disk) == 34
+    assert len(saves) < 32
+    assert [record["id"] for record in on_disk] == [m.id for m in repository.list()]
+
+
+def test_journal_mode_appends_and_compacts(test_settings):
+    original = test_settings.data_file.read_text(encoding="utf-8")
+    repository = MonsterRepository(
+        test_settings.data_file, journal=JournalOptions(max_entries=100, max_age_seconds=60)
+    )
+    repository.upsert(
+        MonsterBlueprint(
+            id="m-gamma", name="Gamma", realmTier=3, hp=250, bp=150, specialization="attacker"
+        )
+    )
+    repository.delete("m-alpha")
+
+    assert test_settings.data_file.read_text(encoding="utf-8") == original
+    assert len(repository.storage.journal_file.read_text(encoding="utf-8").splitlines()) == 2
+    assert [monster.id for monster in repository.list()] == ["m-beta", "m-gamma"]
+
+    collection_cache.clear()
+    assert [monster.id for monster in repository.list()] == ["m-beta", "m-gamma"]
+
+    compact_journals()
+    assert not repository.storage.journal_file.exists()
+    on_disk = json.loads(test_settings.data_file.read_text(encoding="utf-8"))
+    assert [record["id"] for record in on_disk] == ["m-beta", "m-gamma"]
+
+
+def test_journal_recovers_from_torn_append(test_settings):
+    journal_file = test_settings.data_file.with_name(test_settings.data_file.name + ".journal")
+    journal_file.write_text(
+        '{"op":"delete","id":"m-alpha"}\n{"op":"upsert","record":{"id":"m-', encoding="utf-8"
+    )
+    repository = MonsterRepository(
+        test_settings.data_file, journal=JournalOptions(max_entries=100, max_age_seconds=60)
+    )
+    assert [monster.id for monster in repository.list()] == ["m-beta"]
+    repository.upsert(
+        MonsterBlueprint(
+            id="m-gamma", name="Gamma", realmTier=3, hp=250, bp=150, specialization="attacker"
+        )
+    )
+
+    collection_cache.clear()
+    assert [monster.id for monster in repository.list()] == ["m-beta", "m-gamma"]
+    assert len(journal_file.read_text(encoding="utf-8").splitlines()) == 2
+
+def test_journal_compacts_after_max_entries(test_settings):
+    repository = MonsterRepository(
+        test_settings.data_file, journal=JournalOptions(max_entries=2, max_age_seconds=60)
+    )
+    repository.delete("m-alpha")
+    repository.delete("m-beta")
+
+    deadline = time.monotonic() + 5
+    while repository.storage.journal_file.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not repository.storage.journal_file.exists()
+    assert json.loads(test_settings.data_file.read_text(encoding="utf-8")) == []
+
+
+def test_sqlite_backend_seeds_from_json_and_exports(test_settings, tmp_path):
+    settings = test_settings.model_copy(
+        update={"storage_backend": "sqlite", "sqlite_file": tmp_path / "editor.db"}
+    )
+    original = settings.data_file.read_text(encoding="utf-8")
+    repository = MonsterRepository.from_settings(settings)
+    assert [monster.id for monster in repository.list()] == ["m-alpha", "m-beta"]
+
+    repository.upsert(
+        MonsterBlueprint(
+            id="m-gamma", name="Gamma", realmTier=3, hp=250, bp=10, specialization="attacker"
+        )
+    )
+    assert settings.data_file.read_text(encoding="utf-8") == original
+
+    collection_cache.clear()
+    fresh = MonsterRepository.from_settings(settings)
+    assert fresh.get("m-gamma").name == "Gamma"
+    assert [monster.id for monster in fresh.list()] == ["m-gamma", "m-alpha", "m-beta"]
+
+    assert fresh.export_json() == settings.data_file
+    on_disk = json.loads(settings.data_file.read_text(encoding="utf-8"))
+    assert [record["id"] for record in on_disk] == ["m-gamma", "m-alpha", "m-beta"]
+
+
+def test_sqlite_storage_is_shared_and_reads_without_write_lock(test_settings, tmp_path):
+    settings = test_settings.model_copy(
+        update={"storage_backend": "sqlite", "sqlite_file": tmp_path / "editor.db"}
+    )
+    storage = MonsterRepository.from_settings(settings).storage
+    assert MonsterRepository.from_settings(settings).storage is storage
+    version = storage.signature()
+
+    writer = sqlite3.connect(settings.sqlite_file, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        # A fresh instance on a seeded database must not need the write lock
+        fresh = SqliteStorage(settings.sqlite_file, "monsters")
+        fresh._local.connection = sqlite3.connect(settings.sqlite_file, timeout=0.1)
+        assert fresh.signature() == version
+        fresh._local.connection.close()
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def _equipment(item_id: str, slot: str, quality: str, tier: int) -> EquipmentItem:
+    return EquipmentItem(
+        id=item_id,
+        name=item_id.title(),
+        slot=slot,
+        base_quality=quality,
+        required_tier=tier,
+        base_main={"type": "ATK", "value": 10},
+    )
+
+
+def test_equipment_filters_follow_incremental_updates(tmp_path):
+    repository = EquipmentRepository(tmp_path / "equipment_items.json")
+    repository.apply_batch(
+        [
+            _equipment("ring-a", "ring", "common", 1),
+            _equipment("ring-b", "ring", "rare", 3),
+            _equipment("helm-a", "helmet", "rare", 2),
+            _equipment("helm-b", "helmet", "rare", 5),
+        ],
+        [],
+    )
+
+    assert [item.id for item in repository.filter(quality="rare")] == [
+        "helm-a",
+        "helm-b",
+        "ring-b",
+    ]
+    assert [item.id for item in repository.filter(slot="helmet", tier_max=4)] == ["helm-a"]
+    assert [item.id for item in repository.filter(tier_min=2, tier_max=3)] == [
+        "helm-a",
+        "ring-b",
+    ]
+
+    repository.upsert(_equipment("helm-a", "ring", "common", 4))
+    repository.delete("ring-b")
+
+    assert [item.id for item in repository.filter(slot="ring")] == ["ring-a", "helm-a"]
+    assert [item.id for item in repository.filter(quality="rare")] == ["helm-b"]
+    assert [item.id for item in repository.filter(tier_min=2, tier_max=4)] == ["helm-a"]
+
+
+def _map_file(tmp_path):
+    path = tmp_path / "map-metadata.json"
+    node = {"label": "Node", "type": "battle", "connections": []}
+    path.write_text(
+        json.dumps(
+            {
+                "defaultMapId": "field",
+                "maps": [
+                    {
+                        "id": "field",
+                        "name": "Field",
+                        "image": "field.webp",
+                        "description": "",
+                        "category": "wild",
+                        "nodes": [
+                            {**node, "id": "a", "position": {"x": 1, "y": 2}},
+                            {**node, "id": "b", "position": {"x": 3, "y": 4}, "custom": 1},
+                        ],
+                    }
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_map_node_patch_touches_only_that_node(tmp_path):
+    repository = MapRepository(_map_file(tmp_path))
+    before = repository.get("field")
+
+    node = repository.patch_member(
+        "field", "nodes", "b", lambda entry: apply_merge_patch(entry, {"position": {"x": 9}})
+    )
+    assert (node.position.x, node.position.y) == (9, 4)
+
+    after = repository.get("field")
+    assert after.nodes[0] is before.nodes[0]
+    on_disk = json.loads(repository.data_file.read_text(encoding="utf-8"))["maps"][0]["nodes"]
+    assert on_disk[1]["position"] == {"x": 9, "y": 4.0}
+    assert on_disk[1]["custom"] == 1
+
+    with pytest.raises(MemberNotFound):
+        repository.patch_member("field", "nodes", "zzz", lambda entry: entry)
+    with pytest.raises(ValidationError):
+        repository.patch_member(
+            "field", "nodes", "a", lambda entry: apply_merge_patch(entry, {"position": None})
+        )
+    assert repository.get("field").nodes[0].position.x == 1
+
+
+def test_map_cursor_survives_deleting_an_earlier_map(tmp_path):
+    repository = MapRepository(_map_file(tmp_path))
+    field = repository.get("field")
+    for map_id in ("cave", "town"):
+        repository.upsert(field.model_copy(update={"id": map_id, "name": map_id}))
+
+    first, cursor = repository.page(limit=2)
+    assert [item.id for item in first] == ["field", "cave"]
+    repository.delete("field")
+    second, _ = repository.page(cursor, limit=2)
+    assert [item.id for item in second] == ["town"]
+
+
+def test_sharded_map_layout_writes_only_the_edited_map(test_settings, tmp_path):
+    map_file = _map_file(tmp_path)
+    data = json.loads(map_file.read_text(encoding="utf-8"))
+    data["maps"].append({**data["maps"][0], "id": "town", "name": "Town", "nodes": None})
+    map_file.write_text(json.dumps(data), encoding="utf-8")
+    settings = test_settings.model_copy(
+        update={
+            "map_metadata_file": map_file,
+            "map_layout": "sharded",
+            "map_shards_dir": tmp_path / "maps",
+        }
+    )
+    repository = MapRepository.from_settings(settings)
+    assert [item.id for item in repository.list()] == ["field", "town"]
+    storage = repository.storage
+    town_before = storage.shard_path("town").stat().st_mtime_ns
+
+    time.sleep(0.01)
+    repository.patch("field", lambda record: apply_merge_patch(record, {"name": "Meadow"}))
+    assert storage.shard_path("town").stat().st_mtime_ns == town_before
+    assert json.loads(storage.shard_path("field").read_text(encoding="utf-8"))["name"] == "Meadow"
+    assert json.loads(map_file.read_text(encoding="utf-8"))["maps"][0]["name"] == "Field"
+
+    repository.delete("town")
+    assert not storage.shard_path("town").exists()
+
+    collection_cache.clear()
+    fresh = MapRepository.from_settings(settings)
+    assert fresh.get("field").name == "Meadow"
+    assert fresh.export_json() == map_file
+    combined = json.loads(map_file.read_text(encoding="utf-8"))
+    assert combined["defaultMapId"] == "field"
+    assert [item["name"] for item in combined["maps"]] == ["Meadow"]
+
+
+def test_map_graph_reports_and_routes_follow_upserts(tmp_path):
+    repository = MapRepository(_map_file(tmp_path))
+    field = repository.get("field")
+    repository.patch_member(
+        "field",
+        "nodes",
+        "a",
+        lambda entry: apply_merge_patch(entry, {"connections": ["b", "ghost"]}),
+    )
+
+    report = repository.graph_report()
+    assert [(ref.nodeId, ref.kind, ref.target) for ref in report.dangling] == [
+        ("a", "connection", "ghost")
+    ]
+    assert [(edge.fromNode, edge.toNode) for edge in report.asymmetric] == [("a", "b")]
+    assert report.unreachable == {}
+
+    town = MapMetadata(
+        **{
+            **field.model_dump(),
+            "id": "town",
+            "defaultNodeId": "t1",
+            "nodes": [
+                {"id": "t1", "label": "T1", "type": "battle", "position": {"x": 0, "y": 0}},
+                {"id": "t2", "label": "T2", "type": "battle", "position": {"x": 0, "y": 0}},
+                {
+                    "id": "gate",
+                    "label": "Gate",
+                    "type": "portal",
+                    "position": {"x": 0, "y": 0},
+                    "connections": ["t1"],
+                    "destination": {"mapId": "field", "nodeId": "b"},
+                },
+            ],
+        }
+    )
+    repository.upsert(town)
+
+    route = repository.route("town", "field", to_node="a")
+    assert [(place.mapId, place.nodeId) for place in route.path] == [
+        ("town", "t1"),
+        ("town", "gate"),
+        ("field", "b"),
+        ("field", "a"),
+    ]
+    assert route.hops == 3
+    assert repository.route("field", "town").reachable is False
+    assert repository.graph_report().unreachable == {"town": ["t2"]}
+    with pytest.raises(KeyError):
+        repository.route("town", "field", to_node="ghost")
+
+    # Editing the town leaves the field's own routing tables in place
+    graph = repository.collection().index("graph")
+    repository.route("field", "field", from_node="b", to_node="a")
+    repository.upsert(town.model_copy(update={"name": "Town"}))
+    repository.graph_report()
+    assert repository.collection().index("graph") is graph
+    assert ("field", "b") in graph._previous and ("town", "t1") not in graph._previous
+
+    # Pointing the gate elsewhere updates routes through it
+    gate = {**town.model_dump()["nodes"][2], "destination": {"mapId": "field", "nodeId": "a"}}
+    repository.patch_member("town", "nodes", "gate", lambda entry: gate)
+    assert repository.route("town", "field", to_node="a").hops == 2
+    repository.delete("field")
+    assert [(ref.nodeId, ref.target) for ref in repository.graph_report().dangling] == [
+        ("gate", "field/a")
+    ]
+    with pytest.raises(KeyError):
+        repository.route("town", "field")
+
+
+def test_map_route_endpoint_reports_unknown_maps(client):
+    response = client.get("/api/maps/graph/route", params={"from_map": "nope", "to_map": "meadow"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Map nope not found"
+    response = client.get(
+        "/api/maps/graph/route",
+        params={"from_map": "meadow", "to_map": "meadow", "to_node": "ghost"},
+    )
+    assert response.json()["detail"] == "Node ghost not found in map meadow"
+
+
+def _alias_odds(table):
+    odds = dict.fromkeys(table.ids, 0.0)
+    for column, kept in enumerate(table.probability):
+        odds[table.ids[column]] += kept / len(table.ids)
+        odds[table.ids[table.alias[column]]] += (1 - kept) / len(table.ids)
+    return odds
+
+
+def test_alias_tables_reproduce_spawn_weights():
+    table = AliasTable.build([("a", 1), ("b", 3), ("none", 0), ("c", 6)])
+    assert table.ids == ("a", "b", "c")
+    assert _alias_odds(table) == pytest.approx({"a": 0.1, "b": 0.3, "c": 0.6})
+    assert AliasTable.build([("a", 0)]) is None
+
+
+def test_spawn_tables_compile_per_map_and_export(tmp_path):
+    repository = MapRepository(_map_file(tmp_path))
+    with pytest.raises(MemberNotFound):
+        repository.spawn_table("field", "a")
+
+    spawn = {
+        "min": 1,
+        "max": 2,
+        "intervalSeconds": 900,
+        "respawnSeconds": 60,
+        "monsters": [{"id": "slime", "weight": 1}, {"id": "wolf", "weight": 3}],
+    }
+    repository.patch_member(
+        "field", "nodes", "a", lambda entry: apply_merge_patch(entry, {"spawn": spawn})
+    )
+    assert _alias_odds(repository.spawn_table("field", "a").table) == pytest.approx(
+        {"slime": 0.25, "wolf": 0.75}
+    )
+    draws = repository.sample_spawns("field", "a", 4000, seed=1)
+    assert draws == repository.sample_spawns("field", "a", 4000, seed=1)
+    assert 0.7 < draws.count("wolf") / len(draws) < 0.8
+
+    field_table = repository.spawn_table("field", "a")
+    town = repository.get("field").model_copy(update={"id": "town"})
+    repository.upsert(town)
+    assert repository.spawn_table("field", "a") is field_table
+    with pytest.raises(KeyError):
+        repository.spawn_table("nowhere", "a")
+
+    path = repository.export_spawn_tables()
+    assert path == tmp_path / "spawn-tables.json"
+    artifact = json.loads(path.read_text(encoding="utf-8"))
+    assert list(artifact["maps"]) == ["field", "town"]
+    compiled = artifact["maps"]["field"]["a"]
+    assert compiled["monsters"] == ["slime", "wolf"]
+    assert (compiled["min"], compiled["max"]) == (1, 2)
+    assert list(artifact["maps"]["field"]) == ["a"]
+
+
+def test_spawn_sample_endpoint(client):
+    response = client.get(
+        "/api/maps/meadow/nodes/meadow-02/spawns/sample", params={"count": 50, "seed": 3}
+    )
+    assert response.status_code == 200
+    sample = response.json()
+    assert len(sample["monsters"]) == 50
+    assert set(sample["counts"]) == {"m-alpha", "m-ghost"}
+    assert sum(sample["counts"].values()) == 50
+
+    missing = client.get("/api/maps/meadow/nodes/nowhere/spawns/sample")
+    assert missing.status_code == 404
+
+
+def test_equipment_references_track_enhance_materials(tmp_path):
+    repository = EquipmentRepository(tmp_path / "equipment_items.json")
+    upgraded = EquipmentItem(
+        **{
+            **_equipment("ring-plus", "ring", "rare", 2).model_dump(),
+            "enhance_materials": [
+                {"target_level": 1, "materials": [{"id": "ring-a", "quantity": 2}]}
+            ],
+        }
+    )
+    repository.apply_batch([_equipment("ring-a", "ring", "common", 1), upgraded], [])
+    references = repository.references("ring-a")
+    assert [(ref.equipment_id, ref.target_level, ref.quantity) for ref in references] == [
+        ("ring-plus", 1, 2)
+    ]
+
+    repository.delete("ring-plus")
+    assert repository.references("ring-a") == []
+
+
+def test_best_in_slot_follows_item_updates(tmp_path):
+    repository = EquipmentRepository(tmp_path / "equipment_items.json")
+
+    def item(item_id, quality, tier, value, **extra):
+        return EquipmentItem(
+            **{
+                **_equipment(item_id, "ring", quality, tier).model_dump(),
+                "base_main": {"type": "ATK", "value": value},
+                **extra,
+            }
+        )
+
+    repository.apply_batch(
+        [
+            item("ring-a", "normal", 1, 10),
+            item("ring-b", "rare", 1, 30, substats=[{"type": "DEF", "value": 5}]),
+            item("ring-c", "epic", 1, 50),
+            item("ring-d", "fine", 4, 40),
+            item("ring-e", "fine", 1, 20, price={"buy": 100}),
+            _equipment("helm-a", "helmet", "normal", 1),
+        ],
+        [],
+    )
+
+    def top(**options):
+        rankings = repository.best_in_slot(2, **options)
+        return {ranking.slot: [entry.item.id for entry in ranking.items] for ranking in rankings}
+
+    assert top() == {"helmet": ["helm-a"], "ring": ["ring-c", "ring-d"]}
+    assert top(tier=2, max_quality=quality_rank("rare"), slot="ring") == {
+        "ring": ["ring-b", "ring-e"]
+    }
+    assert top(weights=ScoreWeights(stat="DEF"), slot="ring")["ring"][0] == "ring-b"
+    (ranking,) = repository.best_in_slot(1, ScoreWeights(price=1.0), slot="ring")
+    assert (ranking.items[0].item.id, ranking.items[0].score) == ("ring-e", 120.0)
+
+    repository.upsert(item("ring-a", "normal", 1, 99))
+    repository.delete("ring-c")
+    assert top(slot="ring") == {"ring": ["ring-a", "ring-d"]}
+
+
+def test_enhance_cost_rollups_follow_item_updates(tmp_path):
+    repository = EquipmentRepository(tmp_path / "equipment_items.json")
+
+    def item(item_id, slot, requirements):
+        return EquipmentItem(
+            **{
+                **_equipment(item_id, slot, "rare", 1).model_dump(),
+                "enhance_materials": [
+                    {"target_level": level, "materials": materials}
+                    for level, materials in requirements
+                ],
+            }
+        )
+
+    repository.apply_batch(
+        [
+            item("ring-a", "ring", [(5, [{"id": "fleece"}]), (10, [{"id": "fleece"}])]),
+            item(
+                "ring-b",
+                "ring",
+                [(3, [{"id": "ore", "quantity": 2}]), (99, [{"id": "fleece", "quantity": 9}])],
+            ),
+            item("helm-a", "helmet", [(10, [{"id": "ore", "quantity": 4}, {"id": "fleece"}])]),
+            _equipment("helm-b", "helmet", "rare", 1),
+        ],
+        [],
+    )
+
+    assert repository.enhance_costs(4, 5, ["ring-a"]).materials == {"fleece": 1}
+    assert repository.enhance_costs(5, 15, ["ring-a"]).materials == {"fleece": 1}
+    rings = repository.enhance_costs(0, 10, ["ring-a", "ring-b"], per_item=True)
+    assert rings.materials == {"fleece": 2, "ore": 2}
+    assert rings.per_item == {"ring-a": {"fleece": 2}, "ring-b": {"ore": 2}}
+    assert repository.enhance_costs(0, 10, per_item=True, slot="ring") == rings
+    assert repository.enhance_costs(0, 10, ["ring-a", "helm-a"], slot="ring").item_count == 1
+    catalogue = repository.enhance_costs()
+    assert (catalogue.item_count, catalogue.materials) == (4, {"fleece": 3, "ore": 6})
+
+    repository.upsert(item("helm-a", "helmet", [(1, [{"id": "gem", "quantity": 1}])]))
+    repository.delete("ring-b")
+    assert repository.enhance_costs().materials == {"fleece": 2, "gem": 1}
+    with pytest.raises(KeyError):
+        repository.enhance_costs(item_ids=["ring-b"])
+    with pytest.raises(ValueError):
+        repository.enhance_costs(6, 5)
+
+
+def test_collection_index_requires_both_hooks():
+    class AddOnly(CollectionIndex):
+        def add(self, record_id, item):
+            pass
+
+    with pytest.raises(TypeError):
+        AddOnly()
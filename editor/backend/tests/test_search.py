@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+
+from app.models import MonsterBlueprint
+from app.repository import MapRepository, MonsterRepository
+from app.search import unified_index
+
+
+def _found(hits):
+    return [(hit.kind, hit.id, hit.match) for hit in hits]
+
+
+def test_search_spans_all_entities(client):
+    response = client.get("/api/search", params={"q": "alpha"})
+    assert response.status_code == 200
+    assert [(hit["kind"], hit["id"], hit["match"]) for hit in response.json()] == [
+        ("monster", "m-alpha", "exact")
+    ]
+
+    nodes = client.get("/api/search", params={"q": "meadow", "kinds": "node,map"}).json()
+    assert [(hit["kind"], hit["id"], hit["mapId"]) for hit in nodes] == [
+        ("map", "meadow", None),
+        ("node", "meadow-01", "meadow"),
+        ("node", "meadow-02", "meadow"),
+    ]
+    assert client.get("/api/search", params={"q": "a", "kinds": "items"}).status_code == 400
+
+
+def test_search_index_follows_writes_and_music_files(test_settings, tmp_path):
+    music_dir = tmp_path / "music"
+    music_dir.mkdir()
+    settings = test_settings.model_copy(update={"assets_dir": music_dir})
+    index = unified_index(settings)
+    assert index.search("Beta") and not index.search("battle theme", kinds=["music"])
+
+    monsters = MonsterRepository.from_settings(settings)
+    monsters.upsert(
+        MonsterBlueprint(
+            id="m-gamma", name="Gamma Wolf", realmTier=1, hp=1, bp=1, specialization="x"
+        )
+    )
+    monsters.delete("m-beta")
+    maps = MapRepository.from_settings(settings)
+    maps.patch_member("meadow", "nodes", "meadow-02", lambda node: {**node, "label": "Lakeside"})
+    (music_dir / "battle theme.mp3").write_bytes(b"")
+    os.utime(music_dir, ns=(0, 0))
+
+    assert unified_index(settings) is index
+    assert _found(index.search("gamma")) == [("monster", "m-gamma", "prefix")]
+    assert index.search("beta", kinds=["monster"]) == []
+    assert _found(index.search("lakeside")) == [("node", "meadow-02", "exact")]
+    assert _found(index.search("battle", kinds=["music"])) == [("music", "battle theme.mp3", "prefix")]
+    assert _found(index.search("gamma wolv")) == [("monster", "m-gamma", "fuzzy")]
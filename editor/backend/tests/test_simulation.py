@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.simulation import SimulationParams, economy_report  # noqa: E402
+
+
+def test_economy_report_follows_spawn_tables(client):
+    response = client.get("/api/simulation/economy", params={"trials": 100, "seed": 7})
+    assert response.status_code == 200
+    report = response.json()
+
+    assert report["missingMonsters"] == ["m-ghost"]
+    nodes = {entry["nodeId"]: entry for entry in report["nodes"]}
+    assert set(nodes) == {"meadow-01", "meadow-02"}
+    assert set(nodes["meadow-01"]["encounters"]) == {"m-alpha"}
+    for entry in nodes.values():
+        # m-alpha is the only monster with a blueprint and pays 25 gold
+        assert entry["goldPerHour"]["mean"] == pytest.approx(25 * entry["killsPerHour"]["mean"])
+        stats = entry["killsPerHour"]
+        assert stats["p10"] <= stats["p50"] <= stats["p90"]
+    # half of meadow-02's batches are the blueprint-less ghost
+    assert nodes["meadow-02"]["killsPerHour"]["mean"] < nodes["meadow-01"]["killsPerHour"]["mean"]
+
+    (meadow,) = report["maps"]
+    assert meadow["mapId"] == "meadow" and meadow["nodes"] == 2
+
+    again = client.get("/api/simulation/economy", params={"trials": 100, "seed": 7})
+    assert again.json() == report
+
+
+def test_economy_report_is_cached_per_data_version(client, test_settings):
+    params = SimulationParams(trials=20)
+    first = economy_report(test_settings, params)
+    assert economy_report(test_settings, params) is first
+
+    response = client.patch("/api/monsters/m-alpha", json={"rewards": {"gold": 50}})
+    assert response.status_code == 200
+    second = economy_report(test_settings, params)
+    assert second is not first
+    assert second.nodes[0].goldPerHour.mean == pytest.approx(2 * first.nodes[0].goldPerHour.mean)
@@ -51,11 +51,32 @@ export async function uploadMonsterMp4(id: string, file: File) {
   return response.data;
 }
 
+export interface ConversionJob {
+  id: string;
+  kind: string;
+  state: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  steps: number;
+  message?: string | null;
+  returnCode?: number | null;
+  stdout: string;
+  stderr: string;
+}
+
+// Conversions run as background jobs; poll until the job is over
+async function waitForJob(job: ConversionJob, intervalMs = 1000) {
+  while (job.state === "queued" || job.state === "running") {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    job = (await api.get<ConversionJob>(`/jobs/${job.id}`)).data;
+  }
+  if (job.state !== "succeeded") {
+    throw new Error(job.stderr || `Conversion ${job.state}`);
+  }
+  return job;
+}
+
 export async function convertMissingWebp() {
-  const response = await api.post<{ succeeded: boolean; stdout?: string }>(
-    "/monsters/assets/convert",
-  );
-  return response.data;
+  const response = await api.post<ConversionJob>("/monsters/assets/convert");
+  return waitForJob(response.data);
 }
 
 // Map APIs
@@ -137,10 +158,8 @@ export async function uploadEquipmentPng(id: string, file: File) {
 }
 
 export async function convertEquipmentImages() {
-  const response = await api.post<{ succeeded: boolean; stdout?: string; stderr?: string }>(
-    "/equipment/convert"
-  );
-  return response.data;
+  const response = await api.post<ConversionJob>("/equipment/convert");
+  return waitForJob(response.data);
 }
 
 export async function deleteEquipmentImage(id: string) {